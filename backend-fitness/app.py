@@ -5,7 +5,7 @@ import jwt
 import datetime
 import random
 from functools import wraps
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import cv2
 import numpy as np
@@ -13,6 +13,9 @@ import base64
 import os
 import uuid
 import io
+import json
+import tempfile
+import threading
 
 # Import all necessary functions from the local auth module
 from auth import (
@@ -25,109 +28,189 @@ from auth import (
     invalidate_session,
     get_user_by_id,
     token_required,
+    authenticate_token,
     get_daily_challenge,
     complete_daily_challenge,
     verify_jwt_token
 )
+from pose_engine import pose_engine, PoseEngineBusy, decode_rgb, dequantize_landmarks, pose_input
+from db import get_connection
+from exercise_log import exercise_logger
+from identity_cache import identity_cache, token_hash
+from revocation import revocations
+from tts_cache import AudioCache, collect_counter_phrases
+from tts_engines import get_synthesizer
+from audio_queue import AudioQueue, READY, FAILED
+from timing import stage, timed_request
+from metrics import (registry, FRAME_SECONDS, DB_WRITE_SECONDS, QUEUE_DEPTH, STALE_FRAMES,
+                     POSE_DETECTIONS, POSE_SECONDS, exercise_label)
+from session_registry import FrameOrder, StaleFrame
+from logs import get_logger
 
 app = Flask(__name__)
 CORS(app)
+logger = get_logger('app')
+
+# WebSocket support is optional so the HTTP endpoints still run without flask-sock.
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except ImportError:
+    sock = None
+    logger.warning("flask-sock not installed - /ws/frames streaming endpoint disabled")
 
 # NEW: Functions to handle database interactions
 def log_exercise_data(user_id, exercise_type, reps_count):
-    """Log the user's exercise data to the database."""
-    conn = None
+    """Insert a one-off log row (e.g. a dance completion) straight away.
+
+    Per-frame workout counts go through exercise_log.exercise_logger instead.
+    """
     try:
-        conn = sqlite3.connect('fitness_tracker.db')
-        cursor = conn.cursor()
-        today = datetime.datetime.utcnow().date()
-        
-        cursor.execute('''
-            INSERT INTO exercise_logs (user_id, exercise_type, reps_count, log_date)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, exercise_type, reps_count, today))
+        with DB_WRITE_SECONDS.time('exercise_log_insert'), get_connection() as conn:
+            today = datetime.datetime.utcnow().date()
+            
+            conn.execute('''
+                INSERT INTO exercise_logs (user_id, exercise_type, reps_count, log_date)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, exercise_type, reps_count, today))
         
-        conn.commit()
-        print("Exercise data logged successfully.")
+        logger.debug("Logged %s x%s for user %s", exercise_type, reps_count, user_id)
         return True
     except sqlite3.Error as e:
-        print(f"Database error logging exercise data: {e}")
+        logger.error("Database error logging exercise data: %s", e)
         return False
-    finally:
-        if conn:
-            conn.close()
 
-def get_user_progress(user_id):
-    """Retrieve summarized daily progress for a user."""
-    conn = None
+PROGRESS_DEFAULT_DAYS = 30
+
+def get_user_progress(user_id, start_date=None, end_date=None, exercise_type=None,
+                      limit=PROGRESS_DEFAULT_DAYS):
+    """Daily rep totals for a user, oldest first, read from the daily_progress rollup.
+
+    Without a date range this returns the latest `limit` days with activity.
+    """
+    clauses = ['user_id = ?']
+    params = [user_id]
+    if start_date:
+        clauses.append('log_date >= ?')
+        params.append(start_date)
+    if end_date:
+        clauses.append('log_date <= ?')
+        params.append(end_date)
+    if exercise_type:
+        clauses.append('exercise_type = ?')
+        params.append(exercise_type)
+    params.append(limit)
+
     try:
-        conn = sqlite3.connect('fitness_tracker.db')
-        cursor = conn.cursor()
-        
-        # This query groups reps by date to get a daily total
-        cursor.execute('''
-            SELECT log_date, SUM(reps_count)
-            FROM exercise_logs
-            WHERE user_id = ?
-            GROUP BY log_date
-            ORDER BY log_date ASC
-            LIMIT 30
-        ''', (user_id,))
-        
-        progress_data = [{'date': row[0], 'count': row[1]} for row in cursor.fetchall()]
+        with get_connection() as conn:
+            # Newest days first so LIMIT keeps the latest ones, then flip for the chart
+            cursor = conn.execute(f'''
+                SELECT log_date, SUM(reps_count)
+                FROM daily_progress
+                WHERE {' AND '.join(clauses)}
+                GROUP BY log_date
+                HAVING SUM(reps_count) > 0
+                ORDER BY log_date DESC
+                LIMIT ?
+            ''', params)
+            
+            progress_data = [{'date': row[0], 'count': row[1]} for row in cursor.fetchall()]
         
+        progress_data.reverse()
         return progress_data
     except sqlite3.Error as e:
-        print(f"Database error getting user progress: {e}")
+        logger.error("Database error getting user progress: %s", e)
         return None
-    finally:
-        if conn:
-            conn.close()
+
+# Counters repeat a small set of phrases, so synthesized clips are cached on
+# disk and in memory keyed by (text, lang, voice).
+audio_cache = AudioCache()
+# Frame responses never wait on TTS: uncached phrases are synthesized in the
+# background and collected through /audio/<ticket_id> (or pushed on /ws/frames).
+audio_queue = AudioQueue(audio_cache)
+AUDIO_WAIT_SECONDS = 5.0
+
+QUEUE_DEPTH.set_function(lambda: audio_queue.stats()['queued'], 'tts')
+QUEUE_DEPTH.set_function(pose_engine.pending, 'pose')
+QUEUE_DEPTH.set_function(lambda: exercise_logger.stats()['pending'], 'exercise_log')
+registry.start()
 
 def generate_audio_simple_gtts(text):
-    """Simple gTTS generation with detailed logging"""
+    """Generate speech for `text` with the configured TTS backend (tts_engines.TTS_BACKEND).
+
+    The name is historical: gTTS is the default backend, but a local engine can
+    be selected instead. Returns base64-encoded audio, or "" on failure.
+    """
     try:
-        print(f"=== AUDIO DEBUG: Starting audio generation ===")
-        print(f"Input text: '{text}'")
-        print(f"Text length: {len(text)}")
-        print(f"Text type: {type(text)}")
-        
-        from gtts import gTTS
-        print("gTTS imported successfully")
-        
-        # Create gTTS object
-        tts = gTTS(text=text, lang='en', slow=False)
-        print("gTTS object created")
-        
-        # Save to BytesIO buffer
-        audio_buffer = io.BytesIO()
-        tts.write_to_fp(audio_buffer)
-        print("Audio written to buffer")
-        
-        audio_buffer.seek(0)
-        audio_bytes = audio_buffer.read()
-        print(f"Audio bytes length: {len(audio_bytes)}")
+        synthesizer = get_synthesizer()
+        audio_bytes = audio_cache.get_or_create(
+            text, lambda: synthesizer.synthesize(text), voice=synthesizer.name
+        )
         
         # Convert to base64
         audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-        print(f"Base64 audio length: {len(audio_base64)}")
-        print("=== AUDIO DEBUG: Audio generation SUCCESS ===")
+        logger.debug("Audio for %r: %d bytes", text, len(audio_bytes))
         
         return audio_base64
         
-    except Exception as e:
-        print(f"=== AUDIO DEBUG: Audio generation FAILED ===")
-        print(f"Error: {e}")
-        print(f"Error type: {type(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Audio generation failed for %r", text)
         return ""
 
+@app.cli.command('warm-tts-cache')
+def warm_tts_cache():
+    """Pre-synthesize every literal phrase in the counter modules.
+
+    Run with: flask --app app warm-tts-cache (uses the TTS_BACKEND engine)
+    """
+    synthesizer = get_synthesizer()
+    phrases = collect_counter_phrases()
+    created = 0
+    for phrase in phrases:
+        if audio_cache.get(phrase, voice=synthesizer.name) is not None:
+            continue
+        try:
+            audio_cache.put(phrase, synthesizer.synthesize(phrase), voice=synthesizer.name)
+            created += 1
+        except Exception as e:
+            print(f"Failed to synthesize '{phrase}': {e}")
+    print(f"Audio cache warm ({synthesizer.name}): {len(phrases)} phrases, {created} newly synthesized")
+
+@app.route('/api/audio_cache_stats', methods=['GET'])
+def audio_cache_stats():
+    """Hit/miss counters for the spoken-feedback cache and the synthesis queue."""
+    return jsonify({**audio_cache.stats(), 'queue': audio_queue.stats()}), 200
+
+@app.route('/audio/<ticket_id>', methods=['GET'])
+def get_audio(ticket_id):
+    """Collect a clip promised by a frame response's audio_ticket.
+
+    Waits up to ?wait= seconds (default AUDIO_WAIT_SECONDS) for synthesis to
+    finish. Returns 200 with the clip, 202 if it is still pending, 404 for
+    unknown or expired tickets and 500 if synthesis failed. Ticket IDs are
+    random 128-bit values, so they double as the access credential.
+    """
+    try:
+        wait = min(float(request.args.get('wait', AUDIO_WAIT_SECONDS)), AUDIO_WAIT_SECONDS)
+    except ValueError:
+        wait = AUDIO_WAIT_SECONDS
+    ticket = audio_queue.get(ticket_id, wait=wait)
+    if ticket is None:
+        return jsonify({'status': 'unknown', 'error': 'Unknown or expired audio ticket'}), 404
+    if ticket.status == READY:
+        return jsonify({
+            'status': ticket.status,
+            'audio': base64.b64encode(ticket.audio).decode('utf-8'),
+            'audio_mime': ticket.mime_type
+        }), 200
+    if ticket.status == FAILED:
+        return jsonify({'status': ticket.status, 'error': ticket.error}), 500
+    return jsonify({'status': ticket.status}), 202
+
 @app.route('/test_audio', methods=['GET'])
 def test_audio():
     """Test endpoint"""
     try:
-        print("\n=== TEST AUDIO ENDPOINT CALLED ===")
         test_message = "This is a test audio message"
         audio_base64 = generate_audio_simple_gtts(test_message)
         
@@ -137,233 +220,810 @@ def test_audio():
             'audio_length': len(audio_base64) if audio_base64 else 0,
             'success': len(audio_base64) > 0
         }
-        print(f"Test result: {result}")
         return jsonify(result)
     except Exception as e:
-        print(f"Error in test_audio: {e}")
+        logger.error("Error in test_audio: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# === FRAME PROCESSING ===
+
+WORKOUT_EXERCISES = ('squats', 'pushups')
+DANCE_EXERCISES = ('araimandi', 'mulumandi', 'mandia_davu')
+
+def decode_frame(image_bytes, reuse_buffer=True):
+    """Decode an encoded image (bytes, bytearray or memoryview) into a pose input frame.
+
+    The frame is RGB and JPEGs are decoded at a reduced scale (see
+    pose_engine.decode_rgb); use decode_bgr for a full-size frame to draw on.
+    """
+    with stage('imdecode'):
+        return decode_rgb(image_bytes, reuse_buffer)
+
+def decode_bgr(image_bytes):
+    """Decode an encoded image into a full-size BGR frame."""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    if nparr.size == 0:
+        return None
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+def decode_data_url(image_data):
+    """Decode a 'data:image/jpeg;base64,...' string sent by the JSON endpoints."""
+    header, encoded = image_data.split(',', 1)
+    with stage('b64decode'):
+        image_bytes = base64.b64decode(encoded)
+    return decode_frame(image_bytes)
+
+def _unable_to_process():
+    return {
+        'feedback': "Unable to process image",
+        'audio_message': "Unable to process image",
+        'should_speak': True
+    }
+
+def _unknown_exercise(exercise_type):
+    return {
+        'feedback': f"Unknown exercise type: {exercise_type}",
+        'audio_message': f"Unknown exercise type: {exercise_type}",
+        'should_speak': True
+    }
+
+def _stale_frame(exercise_type, error):
+    STALE_FRAMES.inc(exercise_label(exercise_type))
+    logger.debug("Stale frame dropped: %s", error)
+    return {"error": str(error), "feedback": "Processing...", "stale": True}
+
+def run_workout_exercise(user_id, session_id, exercise_type, frame, is_challenge=False,
+                         seq=None, capture_ts=None, record=True):
+    """Run a workout frame through the session's counter and record progress.
+
+    `seq` and `capture_ts` (client milliseconds) place the frame in its
+    session's stream; a frame overtaken by a newer one raises StaleFrame.
+    With record=False the counter updates but nothing is logged and no
+    challenge is completed.
+    """
+    from workout import process_squat, process_pushup, workout_sessions
+
+    if frame is None:
+        return _unable_to_process()
+
+    counter = workout_sessions.get_counter(user_id, session_id, exercise_type)
+    order = FrameOrder(workout_sessions.get_session(user_id, session_id), seq, capture_ts)
+    if exercise_type == 'squats':
+        result = process_squat(frame, counter, order)
+    else:
+        result = process_pushup(frame, counter, order)
+    if record:
+        result['audio_message'] += _record_workout_progress(user_id, session_id, exercise_type, counter,
+                                                            is_challenge)
+    return result
+
+def _record_workout_progress(user_id, session_id, exercise_type, counter, is_challenge):
+    """Log the session's rep count; returns text to add to the audio cue."""
+    extra_audio = ''
+    with stage('db'):
+        if is_challenge and counter.counter >= 1:
+            complete_daily_challenge(user_id, exercise_type)
+            extra_audio = " Daily challenge completed! "
+
+        if counter.counter > 0:
+            # Write-behind: the count is upserted in the next batch, not on this frame
+            exercise_logger.record(user_id, session_id, exercise_type, counter.counter)
+    return extra_audio
+
+def run_dance_exercise(user_id, session_id, exercise_type, frame, seq=None, capture_ts=None):
+    """Run a dance frame through the session's counter (`seq`/`capture_ts` as for workouts)."""
+    from dance import process_araimandi, process_mulumandi, process_mandia_davu, dance_sessions
+
+    if frame is None:
+        return _unable_to_process()
+
+    counter = dance_sessions.get_counter(user_id, session_id, exercise_type)
+    order = FrameOrder(dance_sessions.get_session(user_id, session_id), seq, capture_ts)
+    if exercise_type == 'araimandi':
+        return process_araimandi(frame, counter, order)
+    elif exercise_type == 'mulumandi':
+        return process_mulumandi(frame, counter, order)
+    return process_mandia_davu(frame, counter, order)
+
+def process_exercise_frame(user_id, session_id, exercise_type, frame, is_challenge=False,
+                           seq=None, capture_ts=None, record=True):
+    """Dispatch a decoded frame to the workout or dance pipeline.
+
+    record=False keeps the frame out of the exercise log and daily challenges.
+    """
+    if exercise_type in WORKOUT_EXERCISES:
+        return run_workout_exercise(user_id, session_id, exercise_type, frame, is_challenge, seq, capture_ts,
+                                    record)
+    if exercise_type in DANCE_EXERCISES:
+        return run_dance_exercise(user_id, session_id, exercise_type, frame, seq, capture_ts)
+    return _unknown_exercise(exercise_type)
+
+def _frame_number(value, convert):
+    """Parse an optional seq/capture_ts value; anything unparseable is ignored."""
+    if value is None or value == '':
+        return None
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        logger.debug("Ignoring frame metadata %r", value)
+        return None
+
+def build_frame_response(result_data, on_audio_ready=None):
+    """Turn a pipeline result into the JSON payload without waiting on TTS.
+
+    Cached phrases are returned inline in 'audio'; anything else comes back as
+    an 'audio_ticket' to collect from /audio/<ticket_id>. `on_audio_ready`,
+    if given, is called with the ticket once its clip is synthesized.
+    """
+    logger.debug("Result data: %s", result_data)
+
+    audio_base64 = ""
+    audio_ticket = None
+    if result_data.get('should_speak', False) and result_data.get('audio_message'):
+        audio_message = result_data['audio_message'].strip()
+        # Only generate audio for non-empty messages
+        if audio_message and len(audio_message) > 0:
+            logger.debug("Requesting audio for %r", audio_message)
+            with stage('tts'):
+                audio_bytes, audio_ticket = audio_queue.submit(audio_message, on_ready=on_audio_ready)
+            if audio_bytes:
+                audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+
+    final_result = {
+        'feedback': result_data.get('feedback', 'Processing...'),
+        'audio': audio_base64,
+        'audio_length': len(audio_base64) if audio_base64 else 0,
+        'audio_mime': get_synthesizer().mime_type,
+        'audio_ticket': audio_ticket,
+        'should_speak': result_data.get('should_speak', False)
+    }
+
+    logger.debug("Feedback %r, audio %d chars, ticket %s",
+                 final_result['feedback'], final_result['audio_length'], audio_ticket)
+    return final_result
+
+def _decode_json_image(image_data):
+    frame = None
+    if image_data:
+        try:
+            frame = decode_data_url(image_data)
+        except Exception as e:
+            logger.warning("Error decoding image: %s", e)
+            frame = None
+    return frame
+
 @app.route('/process_dance_frame', methods=['POST'])
+@timed_request
 @token_required # NEW: Add this decorator for security
 def process_dance_frame():
     try:
         user_id = request.current_user['user_id']
-        print("\n=== DANCE FRAME ENDPOINT CALLED ===")
         data = request.get_json()
         exercise_type = data.get('exercise')
-        image_data = data.get('image')
-        print(f"Exercise type: {exercise_type}")
-        
-        # Import dance processing functions
-        from dance import process_araimandi, process_mulumandi, process_mandia_davu
-        
-        # Process the image if provided
-        frame = None
-        if image_data:
-            try:
-                # Decode base64 image
-                header, encoded = image_data.split(',', 1)
-                image_bytes = base64.b64decode(encoded)
-                nparr = np.frombuffer(image_bytes, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                print("Image decoded successfully")
-            except Exception as e:
-                print(f"Error decoding image: {e}")
-                frame = None
-        
-        # Process based on exercise type
-        result_data = None
-        if exercise_type == 'araimandi':
-            if frame is not None:
-                result_data = process_araimandi(frame)
-            else:
-                result_data = {
-                    'feedback': "Unable to process image",
-                    'audio_message': "Unable to process image",
-                    'should_speak': True
-                }
-        elif exercise_type == 'mulumandi':
-            if frame is not None:
-                result_data = process_mulumandi(frame)
-            else:
-                result_data = {
-                    'feedback': "Unable to process image", 
-                    'audio_message': "Unable to process image",
-                    'should_speak': True
-                }
-        elif exercise_type == 'mandia_davu':
-            if frame is not None:
-                result_data = process_mandia_davu(frame)
-            else:
-                result_data = {
-                    'feedback': "Unable to process image",
-                    'audio_message': "Unable to process image", 
-                    'should_speak': True
-                }
-        else:
-            result_data = {
-                'feedback': f"Unknown exercise type: {exercise_type}",
-                'audio_message': f"Unknown exercise type: {exercise_type}",
-                'should_speak': True
-            }
-        
-        print(f"=== DANCE PROCESSING RESULT ===")
-        print(f"Result data: {result_data}")
-        
-        # Generate audio if needed
-        audio_base64 = ""
-        if result_data.get('should_speak', False) and result_data.get('audio_message'):
-            audio_message = result_data['audio_message'].strip()
-            # Only generate audio for non-empty messages
-            if audio_message and len(audio_message) > 0:
-                print(f"Generating audio for message: '{audio_message}'")
-                audio_base64 = generate_audio_simple_gtts(audio_message)
+        session_id = data.get('session_id')
+        seq = _frame_number(data.get('seq'), int)
+        capture_ts = _frame_number(data.get('capture_ts'), float)
+        logger.debug("Dance frame: user %s, %s", user_id, exercise_type)
+
+        with FRAME_SECONDS.time('dance', exercise_label(exercise_type)):
+            frame = _decode_json_image(data.get('image'))
+            if exercise_type in DANCE_EXERCISES:
+                result_data = run_dance_exercise(user_id, session_id, exercise_type, frame, seq, capture_ts)
             else:
-                print("Empty audio message - skipping audio generation")
-        else:
-            print("No audio generation needed")
-        
-        final_result = {
-            'feedback': result_data.get('feedback', 'Processing...'),
-            'audio': audio_base64,
-            'audio_length': len(audio_base64) if audio_base64 else 0,
-            'should_speak': result_data.get('should_speak', False)
-        }
-        
-        print(f"=== DANCE ENDPOINT FINAL RESULT ===")
-        print(f"Feedback: {final_result['feedback']}")
-        print(f"Audio length: {final_result['audio_length']}")
-        print(f"Should speak: {final_result['should_speak']}")
-        
-        return jsonify(final_result)
+                result_data = _unknown_exercise(exercise_type)
+            response = build_frame_response(result_data)
+        return jsonify(response)
+
+    except PoseEngineBusy as e:
+        # The pose workers are saturated; drop this frame and let the client send the next one.
+        logger.info("Dance frame skipped: %s", e)
+        return jsonify({"error": str(e), "feedback": "Processing...", "busy": True}), 503
+
+    except StaleFrame as e:
+        return jsonify(_stale_frame(exercise_type, e)), 409
 
     except Exception as e:
-        print(f"=== DANCE ENDPOINT ERROR ===")
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Dance frame failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/process_workout_frame', methods=['POST'])
+@timed_request
 @token_required
 def process_workout_frame():
     """Process workout frames (squats and pushups)"""
     try:
         user_id = request.current_user['user_id']
-        print("\n=== WORKOUT FRAME ENDPOINT CALLED ===")
         data = request.get_json()
         exercise_type = data.get('exercise')
-        image_data = data.get('image')
         is_challenge = data.get('is_challenge', False)
-        print(f"Exercise type: {exercise_type}")
-        
-        from workout import process_squat, process_pushup
-        
-        frame = None
-        if image_data:
-            try:
-                header, encoded = image_data.split(',', 1)
-                image_bytes = base64.b64decode(encoded)
-                nparr = np.frombuffer(image_bytes, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                print("Image decoded successfully")
-            except Exception as e:
-                print(f"Error decoding image: {e}")
-                frame = None
-        
-        result_data = None
-        if exercise_type == 'squats':
-            if frame is not None:
-                feedback_text = process_squat(frame)
-                from workout import squat_counter
-                should_speak = getattr(squat_counter, 'should_speak', False)
-                audio_message = getattr(squat_counter, 'audio_message', '')
-                
-                if is_challenge and squat_counter.count >= 1: 
-                    complete_daily_challenge(user_id, exercise_type)
-                    audio_message += " Daily challenge completed! "
-
-                if squat_counter.count > 0:
-                    log_exercise_data(user_id, exercise_type, squat_counter.count)
-                
-                result_data = {
-                    'feedback': feedback_text,
-                    'audio_message': audio_message,
-                    'should_speak': should_speak
-                }
-            else:
-                result_data = {
-                    'feedback': "Unable to process image",
-                    'audio_message': "Unable to process image",
-                    'should_speak': True
-                }
-        elif exercise_type == 'pushups':
-            if frame is not None:
-                feedback_text = process_pushup(frame)
-                from workout import pushup_counter
-                should_speak = getattr(pushup_counter, 'should_speak', False)
-                audio_message = getattr(pushup_counter, 'audio_message', '')
-                
-                if is_challenge and pushup_counter.count >= 1:
-                    complete_daily_challenge(user_id, exercise_type)
-                    audio_message += " Daily challenge completed! "
-
-                if pushup_counter.count > 0:
-                    log_exercise_data(user_id, exercise_type, pushup_counter.count)
-                
-                result_data = {
-                    'feedback': feedback_text,
-                    'audio_message': audio_message,
-                    'should_speak': should_speak
-                }
+        session_id = data.get('session_id')
+        seq = _frame_number(data.get('seq'), int)
+        capture_ts = _frame_number(data.get('capture_ts'), float)
+        logger.debug("Workout frame: user %s, %s", user_id, exercise_type)
+
+        with FRAME_SECONDS.time('workout', exercise_label(exercise_type)):
+            frame = _decode_json_image(data.get('image'))
+            if exercise_type in WORKOUT_EXERCISES:
+                result_data = run_workout_exercise(user_id, session_id, exercise_type, frame, is_challenge,
+                                                   seq, capture_ts)
             else:
-                result_data = {
-                    'feedback': "Unable to process image",
-                    'audio_message': "Unable to process image",
-                    'should_speak': True
-                }
+                result_data = _unknown_exercise(exercise_type)
+            response = build_frame_response(result_data)
+        return jsonify(response)
+
+    except PoseEngineBusy as e:
+        # The pose workers are saturated; drop this frame and let the client send the next one.
+        logger.info("Workout frame skipped: %s", e)
+        return jsonify({"error": str(e), "feedback": "Processing...", "busy": True}), 503
+
+    except StaleFrame as e:
+        return jsonify(_stale_frame(exercise_type, e)), 409
+
+    except Exception as e:
+        logger.exception("Workout frame failed")
+        return jsonify({"error": str(e)}), 500
+
+def _frame_param(name, header):
+    """Read frame metadata from the query string, falling back to an X- header."""
+    return request.args.get(name) or request.headers.get(header)
+
+@app.route('/process_frame', methods=['POST'])
+@timed_request
+@token_required
+def process_frame():
+    """Process one raw frame for any exercise.
+
+    The body is either the JPEG itself (Content-Type: image/jpeg) or a
+    multipart form with the image in a 'frame' field. Metadata travels in the
+    query string (?exercise=squats&session_id=...&is_challenge=1) or in the
+    X-Exercise, X-Session-Id and X-Is-Challenge headers. The optional seq and
+    capture_ts (X-Frame-Seq, X-Capture-Ts) order the frame within its session;
+    one overtaken by a newer frame gets a 409 with "stale": true.
+    """
+    try:
+        user_id = request.current_user['user_id']
+        exercise_type = _frame_param('exercise', 'X-Exercise')
+        session_id = _frame_param('session_id', 'X-Session-Id')
+        is_challenge = (_frame_param('is_challenge', 'X-Is-Challenge') or '').lower() in ('1', 'true', 'yes')
+        seq = _frame_number(_frame_param('seq', 'X-Frame-Seq'), int)
+        capture_ts = _frame_number(_frame_param('capture_ts', 'X-Capture-Ts'), float)
+
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('frame')
+            image_bytes = upload.read() if upload else b''
         else:
-            result_data = {
-                'feedback': f"Unknown exercise type: {exercise_type}",
-                'audio_message': f"Unknown exercise type: {exercise_type}",
-                'should_speak': True
-            }
-        
-        print(f"=== WORKOUT PROCESSING RESULT ===")
-        print(f"Result data: {result_data}")
-        
-        audio_base64 = ""
-        if result_data.get('should_speak', False) and result_data.get('audio_message'):
-            audio_message = result_data['audio_message'].strip()
-            if audio_message and len(audio_message) > 0:
-                print(f"Generating audio for message: '{audio_message}'")
-                audio_base64 = generate_audio_simple_gtts(audio_message)
-            else:
-                print("Empty audio message - skipping audio generation")
+            image_bytes = request.get_data(cache=False)
+
+        with FRAME_SECONDS.time('frame', exercise_label(exercise_type)):
+            frame = None
+            if image_bytes:
+                try:
+                    frame = decode_frame(image_bytes)
+                except Exception as e:
+                    logger.warning("Error decoding image: %s", e)
+
+            result_data = process_exercise_frame(user_id, session_id, exercise_type, frame, is_challenge,
+                                                 seq, capture_ts)
+            response = build_frame_response(result_data)
+        return jsonify(response)
+
+    except PoseEngineBusy as e:
+        logger.info("Frame skipped: %s", e)
+        return jsonify({"error": str(e), "feedback": "Processing...", "busy": True}), 503
+
+    except StaleFrame as e:
+        return jsonify(_stale_frame(exercise_type, e)), 409
+
+    except Exception as e:
+        logger.exception("Frame failed")
+        return jsonify({"error": str(e)}), 500
+
+# === BURST UPLOADS ===
+# A burst is a short run of frames from one session sent in one request, so
+# auth, setup and the response are paid once, and the frames are tracked
+# frame to frame by a video-mode pose model instead of detected one by one.
+BURST_MAX_FRAMES = int(os.environ.get('BURST_MAX_FRAMES', 30))
+JPEG_START = b'\xff\xd8\xff'  # SOI followed by the first segment marker
+
+def _jpeg_end(data, start):
+    """Offset just past the EOI of the JPEG starting at `start`, or None if it is cut short.
+
+    Segments are skipped by their length, so a thumbnail embedded in an
+    EXIF/JFIF header (a whole JPEG inside APP1) is not mistaken for the end
+    or the next image. After each SOS the entropy-coded data is scanned for
+    the next real marker (not a stuffed FF 00 or a restart marker).
+    """
+    i = start + 2
+    end = len(data)
+    while i + 1 < end:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+        elif marker == 0xD9:  # EOI
+            return i + 2
+        elif 0xD0 <= marker <= 0xD7 or marker == 0x01:  # no length field
+            i += 2
         else:
-            print("No audio generation needed")
-        
-        final_result = {
-            'feedback': result_data.get('feedback', 'Processing...'),
-            'audio': audio_base64,
-            'audio_length': len(audio_base64) if audio_base64 else 0,
-            'should_speak': result_data.get('should_speak', False)
-        }
-        
-        print(f"=== WORKOUT ENDPOINT FINAL RESULT ===")
-        print(f"Feedback: {final_result['feedback']}")
-        print(f"Audio length: {final_result['audio_length']}")
-        print(f"Should speak: {final_result['should_speak']}")
-        
-        return jsonify(final_result)
+            i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+            if marker != 0xDA:  # SOS: entropy-coded data follows its header
+                continue
+            while True:
+                i = data.find(b'\xff', i)
+                if i == -1 or i + 1 >= end:
+                    return None
+                following = data[i + 1]
+                if following == 0x00 or 0xD0 <= following <= 0xD7:
+                    i += 2
+                elif following == 0xFF:
+                    i += 1
+                else:
+                    break
+    return None
+
+def split_mjpeg(data):
+    """Split a Motion-JPEG chunk (JPEG images back to back) into one buffer per image.
+
+    A truncated or corrupt last image is kept as-is, so it fails to decode
+    as one frame rather than disappearing.
+    """
+    view = memoryview(data)
+    images = []
+    start = data.find(JPEG_START)
+    while start != -1:
+        end = _jpeg_end(data, start)
+        if end is None:
+            images.append(view[start:])
+            break
+        images.append(view[start:end])
+        start = data.find(JPEG_START, end)
+    return images
+
+def decode_video(data, max_frames):
+    """Decode a short clip (e.g. WebM from MediaRecorder) into pose input frames.
+
+    Returns (frames, offsets in ms from the first frame). OpenCV's FFmpeg
+    backend only reads from files, so the clip goes through a temp file.
+    """
+    frames, offsets = [], []
+    handle, path = tempfile.mkstemp(suffix='.video')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        with stage('imdecode'):
+            capture = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+            try:
+                while len(frames) <= max_frames:
+                    ok, frame = capture.read()
+                    if not ok:
+                        break
+                    frames.append(pose_input(frame))
+                    offsets.append(capture.get(cv2.CAP_PROP_POS_MSEC))
+            finally:
+                capture.release()
+    finally:
+        os.unlink(path)
+    if offsets:
+        offsets = [offset - offsets[0] for offset in offsets]
+    return frames, offsets
+
+def _burst_timestamps(values, count, offsets):
+    """One capture timestamp (ms) per frame, or None each if none were sent.
+
+    `values` is either a full list or the first frame's timestamp alone, in
+    which case `offsets` (ms from the first frame) supplies the rest.
+    """
+    if len(values) == count:
+        return values
+    if len(values) == 1 and offsets is not None:
+        return [values[0] + offset for offset in offsets]
+    return [None] * count
+
+def _read_burst():
+    """(frames, offsets) from the request body; a frame is None if it failed to decode."""
+    if request.mimetype == 'multipart/form-data':
+        images = [upload.read() for upload in request.files.getlist('frame')]
+    elif request.mimetype.startswith('video/') and request.mimetype != 'video/x-motion-jpeg':
+        return decode_video(request.get_data(cache=False), BURST_MAX_FRAMES)
+    else:
+        images = split_mjpeg(request.get_data(cache=False))
+    if len(images) > BURST_MAX_FRAMES:
+        return images, None
+    frames = []
+    for image in images:
+        try:
+            frames.append(decode_frame(image, reuse_buffer=False))
+        except Exception as e:
+            logger.warning("Error decoding burst frame: %s", e)
+            frames.append(None)
+    return frames, _interval_offsets(len(frames))
+
+def _interval_offsets(count):
+    """Offsets (ms from the first frame) implied by frame_interval_ms, or None."""
+    interval = _frame_number(_frame_param('frame_interval_ms', 'X-Frame-Interval-Ms'), float)
+    return None if interval is None else [i * interval for i in range(count)]
+
+# Placeholder in a burst's landmark list for a frame that could not be decoded.
+_UNDECODED = object()
+
+def _sessions_for(exercise_type):
+    """(session registry, landmark updaters) of the pipeline that handles `exercise_type`."""
+    if exercise_type in WORKOUT_EXERCISES:
+        from workout import workout_sessions, LANDMARK_UPDATERS
+        return workout_sessions, LANDMARK_UPDATERS
+    from dance import dance_sessions, LANDMARK_UPDATERS
+    return dance_sessions, LANDMARK_UPDATERS
+
+def run_burst(user_id, session_id, exercise_type, frames, is_challenge=False, seq=None, capture_ts=None):
+    """Track a burst of decoded frames in order and apply each to the session's counter.
+
+    Returns the same as apply_landmarks.
+    """
+    session = _sessions_for(exercise_type)[0].get_session(user_id, session_id)
+    decoded = [frame for frame in frames if frame is not None]
+    label = exercise_label(exercise_type)
+    detected = iter(())
+    if decoded:
+        try:
+            with stage('pose'), POSE_SECONDS.time(label):
+                detected = iter(pose_engine.detect_burst(decoded, exercise_type, (user_id, session.session_id)))
+        except PoseEngineBusy:
+            POSE_DETECTIONS.inc(label, 'busy', amount=len(decoded))
+            raise
+
+    landmarks = []
+    for frame in frames:
+        if frame is None:
+            landmarks.append(_UNDECODED)
+            continue
+        landmarks.append(next(detected))
+        POSE_DETECTIONS.inc(label, 'detected' if landmarks[-1] else 'no_pose')
+    return apply_landmarks(user_id, session_id, exercise_type, landmarks, is_challenge, seq, capture_ts)
+
+def apply_landmarks(user_id, session_id, exercise_type, frames, is_challenge=False, seq=None, capture_ts=None):
+    """Apply a run of frames' landmarks (None where no body was found) to the session's counter.
+
+    Frame i gets sequence number seq + i and capture time capture_ts[i].
+    Returns (per-frame results, one result for build_frame_response whose
+    audio cue is the last one any frame asked for).
+    """
+    sessions, updaters = _sessions_for(exercise_type)
+    counter = sessions.get_counter(user_id, session_id, exercise_type)
+    session = sessions.get_session(user_id, session_id)
+    capture_ts = capture_ts or [None] * len(frames)
+
+    results = []
+    cue = {'feedback': "Processing...", 'audio_message': '', 'should_speak': False}
+    for i, landmarks in enumerate(frames):
+        frame_seq = None if seq is None else seq + i
+        if landmarks is _UNDECODED:
+            # Same entry and cue as any other frame, as for an undecodable /process_frame upload.
+            result = _unable_to_process()
+        else:
+            try:
+                result = updaters[exercise_type](landmarks, counter, FrameOrder(session, frame_seq, capture_ts[i]))
+            except StaleFrame as e:
+                results.append({'seq': frame_seq, **_stale_frame(exercise_type, e)})
+                continue
+        results.append({'seq': frame_seq, 'feedback': result['feedback']})
+        cue['feedback'] = result['feedback']
+        if result.get('should_speak') and result.get('audio_message'):
+            cue['audio_message'] = result['audio_message']
+            cue['should_speak'] = True
+
+    if exercise_type in WORKOUT_EXERCISES:
+        extra_audio = _record_workout_progress(user_id, session_id, exercise_type, counter, is_challenge)
+        if extra_audio:
+            cue['audio_message'] += extra_audio
+            cue['should_speak'] = True
+    return results, cue
+
+def _burst_params():
+    """(exercise, session_id, is_challenge, seq, capture_ts list) for a multi-frame upload."""
+    exercise_type = _frame_param('exercise', 'X-Exercise')
+    session_id = _frame_param('session_id', 'X-Session-Id')
+    is_challenge = (_frame_param('is_challenge', 'X-Is-Challenge') or '').lower() in ('1', 'true', 'yes')
+    seq = _frame_number(_frame_param('seq', 'X-Frame-Seq'), int)
+    capture_ts = [_frame_number(value, float)
+                  for value in (_frame_param('capture_ts', 'X-Capture-Ts') or '').split(',') if value]
+    if None in capture_ts:
+        capture_ts = []
+    return exercise_type, session_id, is_challenge, seq, capture_ts
+
+@app.route('/process_burst', methods=['POST'])
+@timed_request
+@token_required
+def process_burst():
+    """Process a short run of frames for one exercise in a single request.
+
+    The body is a multipart form with one 'frame' file per JPEG in capture
+    order, a Motion-JPEG chunk (Content-Type: video/x-motion-jpeg, JPEGs back
+    to back), or a short clip such as WebM (Content-Type: video/webm).
+    Metadata is as for /process_frame, except that seq numbers the first
+    frame (the rest follow on), and capture_ts is either one comma-separated
+    timestamp per frame or the first frame's alone, with the rest taken from
+    frame_interval_ms (images) or the clip's own timing (video).
+
+    The response has the usual fields for the burst as a whole (the last
+    frame's feedback and a single audio cue) plus 'frames', the feedback of
+    each frame; frames overtaken by newer ones are marked "stale": true.
+    """
+    try:
+        user_id = request.current_user['user_id']
+        exercise_type, session_id, is_challenge, seq, capture_ts = _burst_params()
+        if exercise_type not in WORKOUT_EXERCISES and exercise_type not in DANCE_EXERCISES:
+            return jsonify(_unknown_exercise(exercise_type)), 400
+
+        with FRAME_SECONDS.time('burst', exercise_label(exercise_type)):
+            frames, offsets = _read_burst()
+            if not frames:
+                return jsonify({"error": "No frames in burst"}), 400
+            if len(frames) > BURST_MAX_FRAMES:
+                return jsonify({"error": f"A burst can have at most {BURST_MAX_FRAMES} frames"}), 413
+            timestamps = _burst_timestamps(capture_ts, len(frames), offsets)
+
+            results, cue = run_burst(user_id, session_id, exercise_type, frames, is_challenge, seq, timestamps)
+            response = build_frame_response(cue)
+        response['frames'] = results
+        return jsonify(response)
+
+    except PoseEngineBusy as e:
+        logger.info("Burst skipped: %s", e)
+        return jsonify({"error": str(e), "feedback": "Processing...", "busy": True}), 503
 
     except Exception as e:
-        print(f"=== WORKOUT ENDPOINT ERROR ===")
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Burst failed")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/process_landmarks', methods=['POST'])
+@timed_request
+@token_required
+def process_landmarks():
+    """Update the session's counter from landmarks the client detected itself.
+
+    For clients with an on-device pose model: the body
+    (application/octet-stream) is one or more frames of quantized landmarks
+    in the format described in pose_engine, so nothing is decoded or
+    inferred here. Metadata and response are as for /process_burst. Clients
+    without a pose model keep uploading JPEGs.
+    """
+    try:
+        user_id = request.current_user['user_id']
+        exercise_type, session_id, is_challenge, seq, capture_ts = _burst_params()
+        if exercise_type not in WORKOUT_EXERCISES and exercise_type not in DANCE_EXERCISES:
+            return jsonify(_unknown_exercise(exercise_type)), 400
+
+        label = exercise_label(exercise_type)
+        with FRAME_SECONDS.time('landmarks', label):
+            try:
+                frames = dequantize_landmarks(request.get_data(cache=False))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if len(frames) > BURST_MAX_FRAMES:
+                return jsonify({"error": f"An upload can have at most {BURST_MAX_FRAMES} frames"}), 413
+            found = sum(1 for landmarks in frames if landmarks)
+            POSE_DETECTIONS.inc(label, 'client', amount=found)
+            if found < len(frames):
+                POSE_DETECTIONS.inc(label, 'client_no_pose', amount=len(frames) - found)
+            timestamps = _burst_timestamps(capture_ts, len(frames), _interval_offsets(len(frames)))
+
+            results, cue = apply_landmarks(user_id, session_id, exercise_type, frames, is_challenge, seq, timestamps)
+            response = build_frame_response(cue)
+        response['frames'] = results
+        return jsonify(response)
+
+    except Exception as e:
+        logger.exception("Landmark upload failed")
+        return jsonify({"error": str(e)}), 500
+
+# The server path only updates counters; drawing their cv2 overlays is opt-in
+# through /debug/render_frame, which is disabled unless DEBUG_RENDER=1.
+DEBUG_RENDER_ENABLED = os.environ.get('DEBUG_RENDER', '0') == '1'
+
+@app.route('/debug/render_frame', methods=['POST'])
+@token_required
+def render_frame():
+    """Process a frame like /process_frame and return it annotated with the counter overlay.
+
+    Takes the same body and metadata as /process_frame and responds with an
+    image/jpeg; the feedback text is in the X-Feedback header.
+    """
+    if not DEBUG_RENDER_ENABLED:
+        return jsonify({"error": "Debug rendering is disabled (set DEBUG_RENDER=1)"}), 404
+
+    try:
+        user_id = request.current_user['user_id']
+        exercise_type = _frame_param('exercise', 'X-Exercise')
+        session_id = _frame_param('session_id', 'X-Session-Id')
+
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('frame')
+            image_bytes = upload.read() if upload else b''
+        else:
+            image_bytes = request.get_data(cache=False)
+
+        frame = decode_bgr(image_bytes) if image_bytes else None
+        if frame is None:
+            return jsonify({"error": "Unable to process image"}), 400
+
+        # Rendering must not count reps on the user's live session, so it
+        # runs against a separate debug session unless one is given, and it
+        # never writes to the exercise log or completes a challenge.
+        session_id = session_id or 'debug-render'
+        if exercise_type in WORKOUT_EXERCISES:
+            from workout import workout_sessions as sessions
+        elif exercise_type in DANCE_EXERCISES:
+            from dance import dance_sessions as sessions
+        else:
+            return jsonify(_unknown_exercise(exercise_type)), 400
+
+        result_data = process_exercise_frame(user_id, session_id, exercise_type, pose_input(frame),
+                                             record=False)
+        sessions.get_counter(user_id, session_id, exercise_type).draw(frame)
+        ok, encoded = cv2.imencode('.jpg', frame)
+        if not ok:
+            return jsonify({"error": "Failed to encode frame"}), 500
+
+        response = Response(encoded.tobytes(), mimetype='image/jpeg')
+        response.headers['X-Feedback'] = result_data.get('feedback', '')
+        return response
+
+    except PoseEngineBusy as e:
+        return jsonify({"error": str(e), "feedback": "Processing...", "busy": True}), 503
+
+    except Exception as e:
+        logger.exception("Debug render failed")
+        return jsonify({"error": str(e)}), 500
+
+
+def _stream_send(ws, message_type, **fields):
+    ws.send(json.dumps({'type': message_type, **fields}))
+
+def frame_stream(ws):
+    """Persistent frame channel: authenticate once, then stream frames and feedback.
+
+    Protocol (text messages are JSON, frames are binary):
+      -> {"type": "auth", "token": "<jwt>"}           <- {"type": "auth_ok", "user": {...}}
+      -> {"type": "start", "exercise": "squats",
+          "session_id": "...", "is_challenge": false}  <- {"type": "started", ...}
+      -> {"type": "frame", "seq": 7, "capture_ts": ...}  (optional, describes the next binary frame)
+      -> <binary JPEG frame>                          <- {"type": "feedback", "feedback": ..., "audio": ...}
+                                                      <- {"type": "stale", ...} if a newer frame was processed
+                                                      <- {"type": "audio", "audio_ticket": ..., "audio": ...}
+      -> {"type": "stop"}                             (server closes the socket)
+    The socket is also closed, after an error message, once the token
+    expires or is logged out.
+    Frames are handled one at a time, so a client that waits for each
+    feedback message before sending the next frame never queues work.
+    Feedback for an uncached phrase carries an audio_ticket; the clip follows
+    as a separate "audio" message once it has been synthesized.
+    """
+    message = ws.receive()
+    try:
+        hello = json.loads(message) if isinstance(message, str) else {}
+    except ValueError:
+        hello = {}
+    token = hello.get('token', '') if hello.get('type') == 'auth' else ''
+    identity = authenticate_token(token) if token else None
+    if not identity:
+        _stream_send(ws, 'error', error='Token is invalid or expired')
+        return
+
+    user, payload = identity
+    user_id = user['user_id']
+    expires_at = payload.get('exp', 0)
+    token_key = token_hash(token)
+    # Audio pushes come from the synthesis threads, so every send after this
+    # point goes through one lock.
+    send_lock = threading.Lock()
+
+    def send(message_type, **fields):
+        with send_lock:
+            _stream_send(ws, message_type, **fields)
+
+    def push_audio(ticket):
+        if ticket.status != READY:
+            return
+        try:
+            send('audio', audio_ticket=ticket.ticket_id, audio_mime=ticket.mime_type,
+                 audio=base64.b64encode(ticket.audio).decode('utf-8'))
+        except Exception as e:
+            # The client disconnected before the clip was ready; it can still poll /audio.
+            logger.info("Audio push failed: %s", e)
+
+    send('auth_ok', user={'id': user_id, 'email': user['email']})
+
+    exercise_type = None
+    session_id = None
+    is_challenge = False
+    frame_meta = {}
+    while True:
+        message = ws.receive()
+        if isinstance(message, str):
+            try:
+                control = json.loads(message)
+            except ValueError:
+                send('error', error='Invalid JSON message')
+                continue
+            if control.get('type') == 'start':
+                exercise_type = control.get('exercise')
+                session_id = control.get('session_id')
+                is_challenge = bool(control.get('is_challenge', False))
+                send('started', exercise=exercise_type, session_id=session_id)
+            elif control.get('type') == 'frame':
+                frame_meta = control
+            elif control.get('type') == 'stop':
+                break
+            continue
+
+        # Binary message: one encoded frame for the current exercise.
+        if datetime.datetime.utcnow().timestamp() >= expires_at:
+            send('error', error='Token expired')
+            break
+        # A logout (here or in another process) ends the stream; the filter
+        # makes this an in-memory check for almost every frame.
+        if revocations.is_revoked(token_key):
+            send('error', error='Token has been revoked')
+            break
+        if not exercise_type:
+            send('error', error='Send a start message before frames')
+            continue
+
+        seq = _frame_number(frame_meta.get('seq'), int)
+        capture_ts = _frame_number(frame_meta.get('capture_ts'), float)
+        frame_meta = {}
+        try:
+            frame = decode_frame(message)
+            result_data = process_exercise_frame(user_id, session_id, exercise_type, frame, is_challenge,
+                                                 seq, capture_ts)
+            send('feedback', **build_frame_response(result_data, on_audio_ready=push_audio))
+        except PoseEngineBusy as e:
+            send('busy', error=str(e), feedback='Processing...')
+        except StaleFrame as e:
+            send('stale', seq=seq, **_stale_frame(exercise_type, e))
+        except Exception as e:
+            logger.exception("Frame stream error")
+            send('error', error=str(e))
+
+if sock is not None:
+    sock.route('/ws/frames')(frame_stream)
+
+@app.route('/api/end_session', methods=['POST'])
+@token_required
+def end_exercise_session():
+    """Release the counters held for one of the user's exercise sessions."""
+    user_id = request.current_user['user_id']
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id')
+
+    from workout import workout_sessions
+    from dance import dance_sessions
+    ended = workout_sessions.end_session(user_id, session_id)
+    ended = dance_sessions.end_session(user_id, session_id) or ended
+    return jsonify({'success': True, 'ended': ended}), 200
+
+@app.route('/api/session_stats', methods=['GET'])
+def session_stats():
+    """Report how many exercise sessions this server process is holding."""
+    from workout import workout_sessions
+    from dance import dance_sessions
+    return jsonify({
+        'workout': workout_sessions.stats(),
+        'dance': dance_sessions.stats(),
+        'exercise_log': exercise_logger.stats(),
+        'identity_cache': identity_cache.stats(),
+        'revocations': revocations.stats()
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (summed across processes when METRICS_DIR is set)."""
+    # Importing the pipelines registers their active-session gauges.
+    import workout  # noqa: F401
+    import dance  # noqa: F401
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 # === AUTHENTICATION ENDPOINTS ===
 
 @app.route('/register', methods=['POST'])
@@ -411,7 +1071,7 @@ def register():
             return jsonify({'success': False, 'error': result['error']}), 400
             
     except Exception as e:
-        print(f"Registration error: {e}")
+        logger.exception("Registration error: %s", e)
         return jsonify({'success': False, 'error': 'Registration failed'}), 500
 
 @app.route('/login', methods=['POST'])
@@ -448,7 +1108,7 @@ def login():
             return jsonify({'success': False, 'error': result['error']}), 401
             
     except Exception as e:
-        print(f"Login error: {e}")
+        logger.exception("Login error: %s", e)
         return jsonify({'success': False, 'error': 'Login failed'}), 500
 
 @app.route('/logout', methods=['POST'])
@@ -467,7 +1127,7 @@ def logout():
         }), 200
         
     except Exception as e:
-        print(f"Logout error: {e}")
+        logger.exception("Logout error: %s", e)
         return jsonify({'success': False, 'error': 'Logout failed'}), 500
 
 @app.route('/profile', methods=['GET'])
@@ -487,7 +1147,7 @@ def get_profile():
             return jsonify({'success': False, 'error': 'User not found'}), 404
             
     except Exception as e:
-        print(f"Profile error: {e}")
+        logger.exception("Profile error: %s", e)
         return jsonify({'success': False, 'error': 'Failed to get profile'}), 500
 
 @app.route('/verify-token', methods=['POST'])
@@ -514,7 +1174,7 @@ def verify_token():
             return jsonify({'valid': False, 'error': 'Invalid token'}), 401
             
     except Exception as e:
-        print(f"Token verification error: {e}")
+        logger.exception("Token verification error: %s", e)
         return jsonify({'valid': False, 'error': 'Token verification failed'}), 500
 
 # NEW: Daily Challenge Endpoints
@@ -548,9 +1208,24 @@ def complete_challenge():
 @app.route('/api/progress', methods=['GET'])
 @token_required
 def get_progress():
-    """Endpoint to retrieve a user's progress data."""
+    """Endpoint to retrieve a user's progress data.
+
+    Optional query parameters: start and end (YYYY-MM-DD, inclusive),
+    exercise (e.g. squats) and days (how many days to return, default 30).
+    """
     user_id = request.current_user['user_id']
-    progress_data = get_user_progress(user_id)
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    try:
+        for value in (start_date, end_date):
+            if value:
+                datetime.date.fromisoformat(value)
+        days = int(request.args.get('days', PROGRESS_DEFAULT_DAYS))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Dates must be YYYY-MM-DD and days a number'}), 400
+    days = max(1, min(days, 366))
+
+    progress_data = get_user_progress(user_id, start_date, end_date, request.args.get('exercise'), days)
     
     if progress_data is not None:
         return jsonify({'success': True, 'progress': progress_data}), 200
@@ -574,11 +1249,9 @@ def log_dance_completion():
         return jsonify({'success': True, 'message': 'Dance logged successfully'}), 200
     
     except Exception as e:
-        print(f"Failed to log dance completion: {e}")
+        logger.exception("Failed to log dance completion: %s", e)
         return jsonify({'success': False, 'error': 'Failed to log dance completion'}), 500
 
 if __name__ == '__main__':
-    print("=== STARTING INTEGRATED SERVER ===")
-    print("This version integrates audio feedback with dance and workout processing")
-    print("Check console for detailed debug information")
+    logger.info("Starting development server on port 5000 (LOG_LEVEL=DEBUG for per-frame detail)")
     app.run(debug=True, port=5000)
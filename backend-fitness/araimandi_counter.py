@@ -1,28 +1,21 @@
 import cv2
-import numpy as np
 import time
 
-def calculate_angle(a, b, c):
-    """Calculates the angle between three points (A, B, C) with B as the vertex."""
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
+from geometry import landmark_angles
+from logs import get_logger
 
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-
-    if angle > 180.0:
-        angle = 360 - angle
-
-    return angle
+logger = get_logger('counters')
 
 class AraimandiCounter:
-    def __init__(self, target_time_seconds=60):
+    def __init__(self, target_time_seconds=60, clock=time.time):
+        # Time source for frames that arrive without a capture timestamp;
+        # self.now is the time of the frame being processed.
+        self.clock = clock
+        self.now = clock()
         self.start_time = None
         self.elapsed_time = 0
         self.is_holding = False
         self.target_time = target_time_seconds
-        print(f"Target time set to {self.target_time} seconds")
         self.feedback = "Get into Araimandi pose"
         self.is_full_body_visible = False
         self.time_in_pose = 0
@@ -41,7 +34,7 @@ class AraimandiCounter:
 
     def set_audio_feedback(self, message):
         """Set audio feedback to be played by frontend"""
-        current_time = time.time()
+        current_time = self.now
         
         # Rate limiting: minimum interval between audio messages
         if current_time - self.last_audio_time < self.min_audio_interval:
@@ -56,11 +49,10 @@ class AraimandiCounter:
             self.last_feedback_spoken = message
             self.last_feedback_time = current_time
             self.last_audio_time = current_time
-            print(f"Audio set: '{message}' at time {current_time}")  # Debug
+            logger.debug("Araimandi audio set: %r at %.2f", message, current_time)
         else:
             self.should_speak = False
             self.audio_message = ""
-            print(f"Audio skipped - duplicate or too soon")  # Debug
 
     def check_form(self, landmarks):
         """Checks if the user's form is valid for the Araimandi Hold."""
@@ -88,8 +80,9 @@ class AraimandiCounter:
                 return False, "Move closer to camera - lower body not fully visible"
             
             # Calculate knee angles for both legs
-            left_knee_angle = calculate_angle(left_hip, left_knee, left_ankle)
-            right_knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
+            angles = landmark_angles(landmarks, ('left_knee', 'right_knee'))
+            left_knee_angle = angles['left_knee']
+            right_knee_angle = angles['right_knee']
             
             # Use the better visible leg's angle
             knee_angle = left_knee_angle if landmarks[25].visibility > landmarks[26].visibility else right_knee_angle
@@ -120,8 +113,13 @@ class AraimandiCounter:
         except (IndexError, TypeError, AttributeError) as e:
             return False, "Adjust your position in frame"
 
-    def process_frame(self, landmarks, frame):
-        """Processes the frame, updates the timer, and displays feedback."""
+    def update(self, landmarks, timestamp=None):
+        """Advance the araimandi hold timer state and feedback for one frame (no drawing).
+
+        `timestamp` is the frame's capture time in seconds; without it the
+        counter's clock is read.
+        """
+        self.now = self.clock() if timestamp is None else timestamp
         
         # Reset audio flag at start of each frame
         self.should_speak = False
@@ -132,10 +130,10 @@ class AraimandiCounter:
         if is_form_valid:
             if not self.is_holding:
                 self.is_holding = True
-                self.start_time = time.time() - self.elapsed_time
+                self.start_time = self.now - self.elapsed_time
                 self.set_audio_feedback("Timer started")
             
-            current_time = time.time()
+            current_time = self.now
             self.elapsed_time = current_time - self.start_time
             self.time_in_pose = self.elapsed_time
             
@@ -162,7 +160,7 @@ class AraimandiCounter:
         else:
             if self.is_holding:
                 self.is_holding = False
-                self.elapsed_time = time.time() - self.start_time if self.start_time else 0
+                self.elapsed_time = self.now - self.start_time if self.start_time else 0
                 self.time_in_pose = self.elapsed_time
                 self.set_audio_feedback("Timer stopped")
             
@@ -170,10 +168,14 @@ class AraimandiCounter:
             self.feedback = form_feedback
             
             # Only give form feedback occasionally to avoid spam
-            current_time = time.time()
+            current_time = self.now
             if current_time - self.last_audio_time > 4.0:  # Only every 4 seconds for form feedback
                 self.set_audio_feedback(self.feedback)
 
+        return self.feedback
+
+    def draw(self, frame):
+        """Draw the overlay for the last update() onto `frame`"""
         # Display information on the frame
         timer_display = f"Time: {int(self.elapsed_time)}s / {self.target_time}s"
         cv2.putText(frame, timer_display, (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2, cv2.LINE_AA)
@@ -181,4 +183,9 @@ class AraimandiCounter:
         feedback_color = (0, 255, 0) if self.is_holding else (0, 0, 255)
         cv2.putText(frame, self.feedback, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, feedback_color, 2, cv2.LINE_AA)
         
-        return frame
\ No newline at end of file
+        return frame
+
+    def process_frame(self, landmarks, frame, timestamp=None):
+        """Processes the frame, updates the timer, and displays feedback."""
+        self.update(landmarks, timestamp)
+        return self.draw(frame)
@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+import uuid
+
+from metrics import TTS_REQUESTS, TTS_SECONDS
+from tts_engines import get_synthesizer
+from logs import get_logger
+
+logger = get_logger('audio')
+
+# Synthesis runs on a couple of background threads so a slow TTS call never
+# holds up a frame response. Tickets are kept long enough for the client to
+# collect the clip, then dropped.
+AUDIO_WORKERS = 2
+AUDIO_TICKET_TTL_SECONDS = 60
+MAX_AUDIO_TICKETS = 500
+
+PENDING = 'pending'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def _timed_synthesize(synthesizer, text):
+    started = time.perf_counter()
+    try:
+        audio_bytes = synthesizer.synthesize(text)
+    except Exception:
+        TTS_SECONDS.observe(time.perf_counter() - started, synthesizer.name, 'error')
+        raise
+    TTS_SECONDS.observe(time.perf_counter() - started, synthesizer.name, 'ok' if audio_bytes else 'error')
+    return audio_bytes
+
+
+class AudioTicket:
+    """One requested clip. `event` is set once the status leaves PENDING."""
+
+    def __init__(self, ticket_id, text, voice, mime_type):
+        self.ticket_id = ticket_id
+        self.text = text
+        self.voice = voice
+        self.mime_type = mime_type
+        self.status = PENDING
+        self.audio = None
+        self.error = None
+        self.created_at = time.time()
+        self.event = threading.Event()
+        self.callbacks = []
+
+
+class AudioQueue:
+    """Background speech synthesis with ticket-based delivery.
+
+    submit() answers from the audio cache when it can; otherwise it hands back
+    a ticket ID and synthesizes the clip on a worker thread. Identical phrases
+    requested while one is still pending share a ticket.
+    """
+
+    def __init__(self, audio_cache, workers=AUDIO_WORKERS, ttl_seconds=AUDIO_TICKET_TTL_SECONDS,
+                 max_tickets=MAX_AUDIO_TICKETS):
+        self.audio_cache = audio_cache
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.max_tickets = max_tickets
+        self._tickets = {}
+        self._pending_by_text = {}
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._threads = []
+        self.synthesized = 0
+        self.failures = 0
+
+    def _start_workers(self):
+        # Started on first use so importing the app does not spawn threads.
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'audio-synth-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _expire(self, now):
+        expired = [tid for tid, t in self._tickets.items()
+                   if t.status != PENDING and now - t.created_at > self.ttl_seconds]
+        for tid in expired:
+            del self._tickets[tid]
+        # Tickets are inserted in creation order, so the oldest finished ones go first.
+        for tid in list(self._tickets):
+            if len(self._tickets) <= self.max_tickets:
+                break
+            if self._tickets[tid].status != PENDING:
+                del self._tickets[tid]
+
+    def submit(self, text, on_ready=None):
+        """Request audio for `text`.
+
+        Returns (audio_bytes, None) on a cache hit, or (None, ticket_id) when
+        the clip is being synthesized. `on_ready(ticket)` is called from the
+        worker thread once the ticket finishes (ready or failed).
+        """
+        synthesizer = get_synthesizer()
+        audio_bytes = self.audio_cache.get(text, voice=synthesizer.name)
+        if audio_bytes is not None:
+            TTS_REQUESTS.inc(synthesizer.name, 'cache_hit')
+            return audio_bytes, None
+
+        with self._lock:
+            self._expire(time.time())
+            ticket = self._pending_by_text.get((synthesizer.name, text))
+            if ticket is None:
+                ticket = AudioTicket(uuid.uuid4().hex, text, synthesizer.name, synthesizer.mime_type)
+                self._tickets[ticket.ticket_id] = ticket
+                self._pending_by_text[(synthesizer.name, text)] = ticket
+                self._start_workers()
+                self._jobs.put(ticket)
+                TTS_REQUESTS.inc(synthesizer.name, 'queued')
+            else:
+                TTS_REQUESTS.inc(synthesizer.name, 'joined')
+            if on_ready is not None:
+                ticket.callbacks.append(on_ready)
+        return None, ticket.ticket_id
+
+    def _work(self):
+        while True:
+            ticket = self._jobs.get()
+            try:
+                synthesizer = get_synthesizer(ticket.voice)
+                audio_bytes = self.audio_cache.get_or_create(
+                    ticket.text, lambda: _timed_synthesize(synthesizer, ticket.text), voice=ticket.voice
+                )
+                if not audio_bytes:
+                    raise RuntimeError("Synthesizer returned no audio")
+                ticket.audio = audio_bytes
+                ticket.status = READY
+            except Exception as e:
+                logger.warning("Audio synthesis failed for %r: %s", ticket.text, e)
+                ticket.error = str(e)
+                ticket.status = FAILED
+
+            with self._lock:
+                self._pending_by_text.pop((ticket.voice, ticket.text), None)
+                if ticket.status == READY:
+                    self.synthesized += 1
+                else:
+                    self.failures += 1
+                callbacks, ticket.callbacks = ticket.callbacks, []
+            ticket.event.set()
+
+            for callback in callbacks:
+                try:
+                    callback(ticket)
+                except Exception as e:
+                    logger.warning("Audio ready callback failed: %s", e)
+
+    def get(self, ticket_id, wait=0):
+        """Return the ticket, waiting up to `wait` seconds for it to finish.
+
+        Returns None for unknown or expired tickets.
+        """
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+        if ticket is not None and wait > 0:
+            ticket.event.wait(wait)
+        return ticket
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tickets': len(self._tickets),
+                'pending': len(self._pending_by_text),
+                'queued': self._jobs.qsize(),
+                'synthesized': self.synthesized,
+                'failures': self.failures,
+            }
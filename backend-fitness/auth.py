@@ -9,6 +9,15 @@ import re
 import os
 import random
 
+from db import get_connection
+from identity_cache import identity_cache, token_hash
+from revocation import revocations
+from timing import stage
+from metrics import AUTH_REQUESTS, DB_WRITE_SECONDS
+from logs import get_logger
+
+logger = get_logger('auth')
+
 # JWT utilities - FIXED SECRET KEY ISSUE
 def get_or_create_secret_key():
     """Get existing secret key or create a persistent one"""
@@ -26,72 +35,241 @@ def get_or_create_secret_key():
 SECRET_KEY = get_or_create_secret_key()
 JWT_EXPIRATION_HOURS = 24
 
-print(f"Using JWT secret key: {SECRET_KEY[:10]}...")  # Debug log
+def _add_column_if_missing(table, column, definition):
+    """Migration step for databases created before `column` was part of CREATE TABLE."""
+    def step(conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return step
+
+def _rebuild_sessions_without_token(conn):
+    """Legacy user_sessions kept a NOT NULL raw token column, which made every
+    insert by create_session fail. SQLite cannot drop a NOT NULL column in
+    place, so the table is rebuilt with the current columns."""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(user_sessions)')]
+    if 'token' not in columns:
+        return
+    conn.execute('''
+        CREATE TABLE user_sessions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            token_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            revoked_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO user_sessions_new (id, user_id, token_hash, created_at, expires_at, is_active, revoked_at)
+        SELECT id, user_id, token_hash, created_at, expires_at, is_active, revoked_at FROM user_sessions
+    ''')
+    conn.execute('DROP TABLE user_sessions')
+    conn.execute('ALTER TABLE user_sessions_new RENAME TO user_sessions')
+    # The old table's indexes went with it.
+    conn.execute('CREATE INDEX idx_user_sessions_token_hash ON user_sessions (token_hash)')
+    conn.execute('''CREATE INDEX idx_user_sessions_revoked_at
+                    ON user_sessions (revoked_at) WHERE revoked_at IS NOT NULL''')
+
+# Schema migrations: each entry upgrades the schema by one version and
+# PRAGMA user_version records the last one applied. Steps are SQL strings or
+# callables taking the connection. Append new entries; never edit one that
+# has already shipped.
+MIGRATIONS = [
+    (1, "Covering index for per-user progress queries", [
+        '''CREATE INDEX IF NOT EXISTS idx_exercise_logs_user_date
+           ON exercise_logs (user_id, log_date, reps_count)''',
+    ]),
+    (2, "Index sessions by token hash", [
+        '''CREATE INDEX IF NOT EXISTS idx_user_sessions_token_hash
+           ON user_sessions (token_hash)''',
+    ]),
+    (3, "One upserted log row per (user, session, exercise, day)", [
+        _add_column_if_missing('exercise_logs', 'session_id', 'TEXT'),
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_exercise_logs_session
+           ON exercise_logs (user_id, session_id, exercise_type, log_date)''',
+    ]),
+    (4, "Daily progress rollup maintained by triggers", [
+        '''CREATE TABLE IF NOT EXISTS daily_progress (
+               user_id INTEGER NOT NULL,
+               log_date DATE NOT NULL,
+               exercise_type TEXT NOT NULL,
+               reps_count INTEGER NOT NULL DEFAULT 0,
+               PRIMARY KEY (user_id, log_date, exercise_type)
+           ) WITHOUT ROWID''',
+        '''CREATE TRIGGER IF NOT EXISTS exercise_logs_rollup_insert
+           AFTER INSERT ON exercise_logs
+           BEGIN
+               INSERT INTO daily_progress (user_id, log_date, exercise_type, reps_count)
+               VALUES (NEW.user_id, NEW.log_date, NEW.exercise_type, NEW.reps_count)
+               ON CONFLICT (user_id, log_date, exercise_type)
+               DO UPDATE SET reps_count = reps_count + excluded.reps_count;
+           END''',
+        # Written as remove-old/add-new so edits that move a row to another
+        # day or exercise land in the right bucket.
+        '''CREATE TRIGGER IF NOT EXISTS exercise_logs_rollup_update
+           AFTER UPDATE OF user_id, log_date, exercise_type, reps_count ON exercise_logs
+           BEGIN
+               UPDATE daily_progress SET reps_count = reps_count - OLD.reps_count
+               WHERE user_id = OLD.user_id AND log_date = OLD.log_date
+                 AND exercise_type = OLD.exercise_type;
+               INSERT INTO daily_progress (user_id, log_date, exercise_type, reps_count)
+               VALUES (NEW.user_id, NEW.log_date, NEW.exercise_type, NEW.reps_count)
+               ON CONFLICT (user_id, log_date, exercise_type)
+               DO UPDATE SET reps_count = reps_count + excluded.reps_count;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS exercise_logs_rollup_delete
+           AFTER DELETE ON exercise_logs
+           BEGIN
+               UPDATE daily_progress SET reps_count = reps_count - OLD.reps_count
+               WHERE user_id = OLD.user_id AND log_date = OLD.log_date
+                 AND exercise_type = OLD.exercise_type;
+           END''',
+        # Backfill from the history logged before the rollup existed.
+        '''INSERT OR REPLACE INTO daily_progress (user_id, log_date, exercise_type, reps_count)
+           SELECT user_id, log_date, exercise_type, SUM(reps_count)
+           FROM exercise_logs
+           GROUP BY user_id, log_date, exercise_type''',
+    ]),
+    (5, "Record when a session was revoked", [
+        _add_column_if_missing('user_sessions', 'revoked_at', 'TIMESTAMP'),
+        '''CREATE INDEX IF NOT EXISTS idx_user_sessions_revoked_at
+           ON user_sessions (revoked_at) WHERE revoked_at IS NOT NULL''',
+    ]),
+    (6, "Drop the legacy raw token column from user_sessions", [
+        _rebuild_sessions_without_token,
+    ]),
+    (7, "Revoked tokens by hash, independent of session rows", [
+        '''CREATE TABLE IF NOT EXISTS revoked_tokens (
+               token_hash TEXT PRIMARY KEY,
+               expires_at TIMESTAMP NOT NULL,
+               revoked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+           ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS idx_revoked_tokens_revoked_at
+           ON revoked_tokens (revoked_at)''',
+        '''INSERT OR IGNORE INTO revoked_tokens (token_hash, expires_at, revoked_at)
+           SELECT token_hash, expires_at, COALESCE(revoked_at, CURRENT_TIMESTAMP)
+           FROM user_sessions
+           WHERE is_active = FALSE AND length(token_hash) > 0''',
+    ]),
+]
+
+def _upgrade_legacy_schema(conn):
+    """Bring tables that predate the CREATE TABLEs in init_db up to the base schema.
+
+    MIGRATIONS assume that base schema. The oldest databases (including the
+    checked-in one) stored the raw token in user_sessions.token instead of
+    its hash, so they get a token_hash column filled from it first.
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(user_sessions)')]
+    if 'token_hash' in columns or 'token' not in columns:
+        return
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(user_sessions)')]
+        if 'token_hash' not in columns:
+            conn.execute("ALTER TABLE user_sessions ADD COLUMN token_hash TEXT NOT NULL DEFAULT ''")
+            rows = conn.execute('SELECT id, token FROM user_sessions').fetchall()
+            conn.executemany('UPDATE user_sessions SET token_hash = ? WHERE id = ?',
+                             [(token_hash(token), row_id) for row_id, token in rows])
+            logger.info("Added token_hash to %d legacy sessions", len(rows))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+def run_migrations(conn):
+    """Apply pending MIGRATIONS in order; returns the resulting schema version."""
+    conn.commit()
+    _upgrade_legacy_schema(conn)
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, description, steps in MIGRATIONS:
+        if target <= version:
+            continue
+        # Each migration is its own transaction. BEGIN IMMEDIATE takes the
+        # write lock before re-reading the version, so two processes starting
+        # together cannot both apply the same migration.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if target > version:
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(f'PRAGMA user_version = {target}')
+                version = target
+                logger.info("Applied migration %d: %s", target, description)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return version
 
 # Database setup
 def init_db():
     """Initialize the database with users and sessions tables"""
-    conn = None
     try:
-        conn = sqlite3.connect('fitness_tracker.db')
-        cursor = conn.cursor()
-        
-        # Create users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                salt TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP
-            )
-        ''')
+        with get_connection() as conn:
+            cursor = conn.cursor()
         
-        # Create a table for user sessions
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                token_hash TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL,
-                is_active BOOLEAN DEFAULT TRUE,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+            # Create users table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email TEXT UNIQUE NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    salt TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_login TIMESTAMP
+                )
+            ''')
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_challenges (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                challenge_date DATE NOT NULL,
-                exercise TEXT NOT NULL,
-                is_completed BOOLEAN DEFAULT FALSE,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                UNIQUE(user_id, challenge_date)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS exercise_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                exercise_type TEXT NOT NULL,
-                reps_count INTEGER NOT NULL,
-                log_date DATE NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        ''')
+            # Create a table for user sessions
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_sessions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    token_hash TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at TIMESTAMP NOT NULL,
+                    is_active BOOLEAN DEFAULT TRUE,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+            ''')
         
-        conn.commit()
-        print("Database initialized successfully")
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS daily_challenges (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    challenge_date DATE NOT NULL,
+                    exercise TEXT NOT NULL,
+                    is_completed BOOLEAN DEFAULT FALSE,
+                    FOREIGN KEY (user_id) REFERENCES users (id),
+                    UNIQUE(user_id, challenge_date)
+                )
+            ''')
+
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS exercise_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    exercise_type TEXT NOT NULL,
+                    reps_count INTEGER NOT NULL,
+                    log_date DATE NOT NULL,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+            ''')
+
+            run_migrations(conn)
+
+        logger.info("Database initialized")
         
     except sqlite3.Error as e:
-        print(f"Error initializing database: {e}")
-    finally:
-        if conn:
-            conn.close()
+        logger.error("Error initializing database: %s", e)
 
 # Password hashing utilities
 def generate_salt():
@@ -115,30 +293,25 @@ def generate_jwt_token(user_id, email):
         'iat': datetime.datetime.utcnow()
     }
     token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
-    print(f"Generated token for user {user_id}: {token[:20]}...")  # Debug log
+    logger.debug("Generated token for user %s", user_id)
     return token
 
 def verify_jwt_token(token):
     """Verify and decode JWT token"""
     try:
-        print(f"Verifying token: {token[:20]}... with secret: {SECRET_KEY[:10]}...")  # Debug log
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        print(f"Token verification successful: {payload}")  # Debug log
-        return payload
+        return jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
-        print("Token expired")  # Debug log
         return None
-    except jwt.InvalidTokenError as e:
-        print(f"Invalid token: {e}")  # Debug log
+    except jwt.InvalidTokenError:
         return None
     except Exception as e:
-        print(f"Token verification error: {e}")  # Debug log
+        logger.warning("Token verification error: %s", e)
         return None
 
 # Database operations
 def create_user(email, password):
     """Create a new user in the database"""
-    with sqlite3.connect('fitness_tracker.db') as conn:
+    with get_connection() as conn:
         try:
             cursor = conn.cursor()
             
@@ -168,7 +341,7 @@ def create_user(email, password):
 
 def authenticate_user(email, password):
     """Authenticate user login"""
-    with sqlite3.connect('fitness_tracker.db') as conn:
+    with get_connection() as conn:
         try:
             cursor = conn.cursor()
             
@@ -205,7 +378,7 @@ def authenticate_user(email, password):
 
 def get_user_by_id(user_id):
     """Get user information by ID"""
-    with sqlite3.connect('fitness_tracker.db') as conn:
+    with get_connection() as conn:
         try:
             cursor = conn.cursor()
             
@@ -226,20 +399,48 @@ def get_user_by_id(user_id):
             return None
             
         except sqlite3.Error as e:
-            print(f"Error getting user by ID: {e}")
+            logger.error("Error getting user by ID: %s", e)
             return None
 
-# ENHANCED Authentication decorator with detailed debugging
+def authenticate_token(token):
+    """Return (user_data, payload) for a valid token, or None.
+
+    Verified identities are cached by token hash, so repeat requests with the
+    same token skip both the JWT decode and the users lookup. Logged-out
+    tokens are rejected from the in-memory revocation filter.
+    """
+    key = token_hash(token)
+    if revocations.is_revoked(key):
+        identity_cache.invalidate(key)
+        AUTH_REQUESTS.inc('revoked')
+        return None
+    cached = identity_cache.get(key)
+    if cached:
+        AUTH_REQUESTS.inc('cached')
+        return cached
+
+    payload = verify_jwt_token(token)
+    if not payload:
+        AUTH_REQUESTS.inc('invalid')
+        return None
+    # Ensure the user still exists
+    user_data = get_user_by_id(payload['user_id'])
+    if not user_data:
+        logger.info("Token for unknown user %s", payload['user_id'])
+        AUTH_REQUESTS.inc('unknown_user')
+        return None
+    identity_cache.put(key, user_data, payload)
+    AUTH_REQUESTS.inc('verified')
+    return user_data, payload
+
+# Authentication decorator
 def token_required(f):
     """Decorator to require authentication for routes"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        print("\n=== TOKEN AUTHENTICATION DEBUG ===")
         auth_header = request.headers.get('Authorization')
-        print(f"1. Auth header received: {auth_header}")
-        
         if not auth_header:
-            print("ERROR: No Authorization header found")
+            AUTH_REQUESTS.inc('missing')
             return jsonify({'error': 'Authorization token is missing'}), 401
         
         try:
@@ -249,34 +450,18 @@ def token_required(f):
             else:
                 token = auth_header
             
-            print(f"2. Extracted token: {token[:20]}...")
-            
-            # Verify the token
-            payload = verify_jwt_token(token)
-            print(f"3. Token payload: {payload}")
-            
-            if not payload:
-                print("ERROR: Token verification failed")
+            with stage('auth'):
+                identity = authenticate_token(token)
+            if not identity:
                 return jsonify({'error': 'Token is invalid or expired'}), 401
             
-            # Get user details to ensure user still exists
-            user_data = get_user_by_id(payload['user_id'])
-            if not user_data:
-                print(f"ERROR: User {payload['user_id']} not found in database")
-                return jsonify({'error': 'User not found'}), 401
-            
             # Add user info to request context
-            request.current_user = user_data
-            print(f"4. SUCCESS: User {user_data['email']} authenticated")
-            print("=== TOKEN AUTHENTICATION SUCCESS ===\n")
+            request.current_user = identity[0]
             
         except IndexError:
-            print("ERROR: Invalid token format")
             return jsonify({'error': 'Token format is invalid. Use "Bearer <token>"'}), 401
         except Exception as e:
-            print(f"ERROR: Token validation exception: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.warning("Token validation error: %s", e)
             return jsonify({'error': 'Token validation failed'}), 401
         
         return f(*args, **kwargs)
@@ -286,45 +471,58 @@ def token_required(f):
 # Session management
 def create_session(user_id, token):
     """Create a user session record with a hashed token"""
-    with sqlite3.connect('fitness_tracker.db') as conn:
+    with DB_WRITE_SECONDS.time('create_session'), get_connection() as conn:
         try:
             cursor = conn.cursor()
             
-            token_hash = hashlib.sha256(token.encode()).hexdigest()
             expires_at = datetime.datetime.utcnow() + datetime.timedelta(hours=JWT_EXPIRATION_HOURS)
             
             cursor.execute('''
                 INSERT INTO user_sessions (user_id, token_hash, expires_at)
                 VALUES (?, ?, ?)
-            ''', (user_id, token_hash, expires_at))
+            ''', (user_id, token_hash(token), expires_at))
             
             conn.commit()
             return True
             
         except sqlite3.Error as e:
-            print(f"Error creating session: {e}")
+            logger.error("Error creating session: %s", e)
             conn.rollback()
             return False
 
 def invalidate_session(token):
-    """Invalidate a user session by hashing the token and marking it inactive"""
-    with sqlite3.connect('fitness_tracker.db') as conn:
+    """Revoke a token and mark its session (if one was recorded) inactive.
+
+    The revocation is stored by token hash until the token would have
+    expired anyway, so it holds even when no session row exists.
+    """
+    key = token_hash(token)
+    revocations.revoke(key)
+    identity_cache.invalidate(key)
+    payload = verify_jwt_token(token)
+    if payload and payload.get('exp'):
+        expires_at = datetime.datetime.utcfromtimestamp(payload['exp'])
+    else:
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(hours=JWT_EXPIRATION_HOURS)
+    with DB_WRITE_SECONDS.time('invalidate_session'), get_connection() as conn:
         try:
             cursor = conn.cursor()
-            
-            token_hash = hashlib.sha256(token.encode()).hexdigest()
-            
+
+            cursor.execute('''
+                INSERT OR REPLACE INTO revoked_tokens (token_hash, expires_at)
+                VALUES (?, ?)
+            ''', (key, expires_at))
             cursor.execute('''
                 UPDATE user_sessions 
-                SET is_active = FALSE 
-                WHERE token_hash = ?
-            ''', (token_hash,))
+                SET is_active = FALSE, revoked_at = CURRENT_TIMESTAMP
+                WHERE token_hash = ? AND is_active = TRUE
+            ''', (key,))
             
             conn.commit()
             return True
             
         except sqlite3.Error as e:
-            print(f"Error invalidating session: {e}")
+            logger.error("Error invalidating session: %s", e)
             conn.rollback()
             return False
 
@@ -342,7 +540,7 @@ def validate_password(password):
 
 def get_daily_challenge(user_id):
     """Retrieve or create today's daily challenge for the user."""
-    with sqlite3.connect('fitness_tracker.db') as conn:
+    with get_connection() as conn:
         try:
             cursor = conn.cursor()
             today = datetime.datetime.utcnow().date()
@@ -379,13 +577,13 @@ def get_daily_challenge(user_id):
                     'is_completed': False
                 }
         except sqlite3.Error as e:
-            print(f"Database error in get_daily_challenge: {e}")
+            logger.error("Database error in get_daily_challenge: %s", e)
             conn.rollback()
             return None
 
 def complete_daily_challenge(user_id, exercise):
     """Mark the daily challenge as completed if the exercise matches."""
-    with sqlite3.connect('fitness_tracker.db') as conn:
+    with DB_WRITE_SECONDS.time('complete_challenge'), get_connection() as conn:
         try:
             cursor = conn.cursor()
             today = datetime.datetime.utcnow().date()
@@ -411,7 +609,7 @@ def complete_daily_challenge(user_id, exercise):
             return {'success': False, 'message': 'No matching pending challenge found'}
             
         except sqlite3.Error as e:
-            print(f"Database error in complete_daily_challenge: {e}")
+            logger.error("Database error in complete_daily_challenge: %s", e)
             conn.rollback()
             return {'success': False, 'message': 'Failed to update challenge status'}
 
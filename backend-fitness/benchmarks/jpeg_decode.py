@@ -0,0 +1,79 @@
+"""Measure what turning an uploaded JPEG into a pose input frame costs.
+
+    python benchmarks/jpeg_decode.py [--repeat N] [--quality Q]
+
+For each common webcam resolution this encodes a synthetic frame and times
+the old path (full-size BGR decode, then a fresh cvtColor to RGB) against
+pose_engine.decode_rgb (reduced-scale decode to RGB, reusing the output
+buffer when the decoder cannot emit RGB itself). It also reports the size of
+the resulting frame, which is what a pose worker has to be sent.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from pose_engine import POSE_DECODE_MIN_SIDE, _IMREAD_RGB, decode_rgb, decode_scale  # noqa: E402
+
+RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+
+
+def synthetic_jpeg(width, height, quality, seed=0):
+    """A camera-like JPEG: smooth shading, a few hard edges and sensor noise."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([128 + 60 * np.sin(x / 90), 100 + 50 * np.cos(y / 70), 90 + 40 * np.sin((x + y) / 150)], -1)
+    for _ in range(12):
+        x0, y0 = rng.integers(0, width), rng.integers(0, height)
+        cv2.rectangle(image, (int(x0), int(y0)), (int(x0) + width // 8, int(y0) + height // 6),
+                      rng.integers(0, 255, 3).tolist(), -1)
+    image += rng.normal(0, 4, image.shape)
+    ok, encoded = cv2.imencode('.jpg', np.clip(image, 0, 255).astype(np.uint8),
+                               [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes()
+
+
+def full_decode(data):
+    bgr = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+
+def best_ms(function, data, repeat):
+    function(data)  # warm-up (and allocate the reused buffer)
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(data)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50, help='timed decodes; the best is reported')
+    parser.add_argument('--quality', type=int, default=80, help='JPEG quality of the test frames')
+    args = parser.parse_args()
+
+    print(f"OpenCV {cv2.__version__}, min side {POSE_DECODE_MIN_SIDE}, "
+          f"{'RGB from the decoder' if _IMREAD_RGB is not None else 'BGR decode + cvtColor into a reused buffer'}")
+    print(f"{'input':>10} {'jpeg KiB':>9} {'full ms':>8} {'reduced ms':>11} {'speedup':>8} "
+          f"{'full KiB':>9} {'output':>10} {'out KiB':>8}")
+    for width, height in RESOLUTIONS:
+        data = synthetic_jpeg(width, height, args.quality)
+        full_ms = best_ms(full_decode, data, args.repeat)
+        reduced_ms = best_ms(decode_rgb, data, args.repeat)
+        frame = decode_rgb(data)
+        assert frame.shape[1] == width // decode_scale(width, height)
+        print(f"{width}x{height:<5} {len(data) / 1024:>8.1f} {full_ms:>8.2f} {reduced_ms:>11.2f} "
+              f"{full_ms / reduced_ms:>7.1f}x {width * height * 3 / 1024:>9.0f} "
+              f"{frame.shape[1]}x{frame.shape[0]:<4} {frame.nbytes / 1024:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Startup time and memory of one shared pose model vs. the old per-module pair.
+
+Each scenario runs in a fresh interpreter so the numbers do not leak into
+each other:
+
+    python benchmarks/pose_model_memory.py
+
+'before' builds the two Pose objects workout.py and dance.py used to create
+at import time; 'after' builds the single model pose_engine shares between
+them. Both run one inference per pipeline so lazily loaded graphs are counted.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def _rss_mb():
+    """Current resident set size in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(name):
+    import numpy as np
+    started = time.perf_counter()
+    import mediapipe as mp
+    imported = time.perf_counter()
+    rss_imported = _rss_mb()
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    if name == 'before':
+        workout_pose = mp.solutions.pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        dance_pose = mp.solutions.pose.Pose(
+            static_image_mode=False, model_complexity=1, smooth_landmarks=True,
+            enable_segmentation=False, smooth_segmentation=True,
+            min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        workout_pose.process(frame)
+        dance_pose.process(frame)
+        models = 2
+    else:
+        from pose_engine import _get_model, pose_options
+        shared = {pose_options(exercise) for exercise in ('squats', 'araimandi')}
+        for options in shared:
+            _get_model(options).process(frame)
+        models = len(shared)
+    ready = time.perf_counter()
+
+    return {
+        'scenario': name,
+        'models': models,
+        'import_s': round(imported - started, 3),
+        'model_startup_s': round(ready - imported, 3),
+        'rss_after_import_mb': round(rss_imported, 1),
+        'rss_ready_mb': round(_rss_mb(), 1),
+        'model_rss_mb': round(_rss_mb() - rss_imported, 1),
+    }
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--scenario':
+        print(json.dumps(run_scenario(sys.argv[2])))
+        return
+
+    results = []
+    for name in ('before', 'after'):
+        out = subprocess.run([sys.executable, __file__, '--scenario', name],
+                             capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'scenario':<8} {'models':>6} {'startup s':>10} {'model MB':>9} {'total MB':>9}")
+    for r in results:
+        print(f"{r['scenario']:<8} {r['models']:>6} {r['model_startup_s']:>10} "
+              f"{r['model_rss_mb']:>9} {r['rss_ready_mb']:>9}")
+    before, after = results
+    print(f"saved: {before['model_startup_s'] - after['model_startup_s']:.3f}s startup, "
+          f"{before['rss_ready_mb'] - after['rss_ready_mb']:.1f} MB per process")
+
+
+if __name__ == '__main__':
+    main()
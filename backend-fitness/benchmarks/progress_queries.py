@@ -0,0 +1,121 @@
+"""How the hot auth/progress queries scale with exercise_logs size, before and after the migrations.
+
+    python benchmarks/progress_queries.py [rows ...]      (default: 10000 100000 1000000 3000000)
+
+For each size a scratch database is filled with log rows for 1000 users over
+a year, then the get_user_progress query and the invalidate_session lookup
+are timed with the original schema and again after auth.run_migrations()
+(indexes, then the daily_progress rollup that /api/progress now reads).
+Everything runs in a temporary directory, so the app database is untouched.
+"""
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+USERS = 1000
+DAYS = 365
+SESSIONS = 50000
+REPEATS = 50
+
+PROGRESS_QUERY = '''
+    SELECT log_date, SUM(reps_count)
+    FROM exercise_logs
+    WHERE user_id = ?
+    GROUP BY log_date
+    ORDER BY log_date ASC
+    LIMIT 30
+'''
+ROLLUP_QUERY = '''
+    SELECT log_date, SUM(reps_count)
+    FROM daily_progress
+    WHERE user_id = ?
+    GROUP BY log_date
+    ORDER BY log_date DESC
+    LIMIT 30
+'''
+SESSION_QUERY = 'SELECT id FROM user_sessions WHERE token_hash = ? AND is_active = TRUE'
+
+
+def build_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=OFF;
+        CREATE TABLE exercise_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            exercise_type TEXT NOT NULL,
+            reps_count INTEGER NOT NULL,
+            log_date DATE NOT NULL
+        );
+        CREATE TABLE user_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            token_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE
+        );
+    ''')
+    rng = random.Random(0)
+    start = datetime.date(2025, 1, 1)
+    conn.executemany(
+        'INSERT INTO exercise_logs (user_id, exercise_type, reps_count, log_date) VALUES (?, ?, ?, ?)',
+        ((rng.randrange(USERS), rng.choice(('squats', 'pushups')), rng.randrange(1, 30),
+          start + datetime.timedelta(days=rng.randrange(DAYS))) for _ in range(rows)),
+    )
+    conn.executemany(
+        'INSERT INTO user_sessions (user_id, token_hash, expires_at) VALUES (?, ?, ?)',
+        ((rng.randrange(USERS), f'{i:064x}', '2030-01-01') for i in range(SESSIONS)),
+    )
+    conn.commit()
+    return conn
+
+
+def time_query(conn, sql, params_list):
+    timings = []
+    for params in params_list:
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000, 3_000_000]
+    workdir = tempfile.mkdtemp(prefix='progress_bench_')
+    # auth initializes its database and JWT key in the working directory on import.
+    os.chdir(workdir)
+    from auth import run_migrations
+
+    rng = random.Random(1)
+    users = [(rng.randrange(USERS),) for _ in range(REPEATS)]
+    tokens = [(f'{rng.randrange(SESSIONS):064x}',) for _ in range(REPEATS)]
+
+    print(f"{'rows':>10} {'progress before':>16} {'progress after':>15} {'rollup':>9} "
+          f"{'session before':>15} {'session after':>14}")
+    for rows in sizes:
+        path = os.path.join(workdir, f'bench_{rows}.db')
+        conn = build_database(path, rows)
+        progress_before = time_query(conn, PROGRESS_QUERY, users)
+        session_before = time_query(conn, SESSION_QUERY, tokens)
+        run_migrations(conn)
+        progress_after = time_query(conn, PROGRESS_QUERY, users)
+        rollup = time_query(conn, ROLLUP_QUERY, users)
+        session_after = time_query(conn, SESSION_QUERY, tokens)
+        conn.close()
+        os.remove(path)
+        print(f"{rows:>10} {progress_before:>14.2f}ms {progress_after:>13.3f}ms {rollup:>7.3f}ms "
+              f"{session_before:>13.2f}ms {session_after:>12.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
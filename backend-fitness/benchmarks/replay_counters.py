@@ -0,0 +1,162 @@
+"""Replay recorded landmark sequences through the rep counters.
+
+    python benchmarks/replay_fixtures.py     # (re)generate the fixtures
+    python benchmarks/replay_counters.py [--repeat N] [name ...]
+
+Pose estimation is skipped entirely: each fixture in benchmarks/fixtures/ is
+a sequence of 33-landmark frames that is fed straight into counter.update(),
+so the numbers isolate the counter state machines (angles, form checks,
+feedback strings, audio rate limiting). For every fixture this reports
+update() throughput, the transient memory one update() allocates at peak,
+how many memory blocks one update() leaves allocated, the memory still held
+after the whole sequence, and whether the final count matches the one the
+fixture was scripted with.
+
+Every update() gets the frame's capture timestamp, so hold timers and audio
+rate limits see the recorded timeline however fast the replay runs, and the
+results are the same on every run.
+"""
+import argparse
+import functools
+import gc
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+FIXTURE_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'fixtures')
+
+from araimandi_counter import AraimandiCounter  # noqa: E402
+from mandia_davu_counter import MandiAdavuCounter  # noqa: E402
+from mulumandi_counter import MulumandiJumpCounter  # noqa: E402
+from pose_engine import Landmark  # noqa: E402
+from pushup_counter import PushupCounter  # noqa: E402
+from squat_counter import SquatCounter  # noqa: E402
+
+# Same construction as the session registries in workout.py and dance.py.
+COUNTERS = {
+    'squats': SquatCounter,
+    'pushups': PushupCounter,
+    'araimandi': functools.partial(AraimandiCounter, target_time_seconds=10),
+    'mulumandi': MulumandiJumpCounter,
+    'mandia_davu': MandiAdavuCounter,
+}
+
+
+def load_fixture(path):
+    """(meta, frames, timestamps), frames already converted to Landmark lists."""
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        landmarks = data['landmarks'].astype(np.float64)
+        timestamps = data['timestamps'].astype(np.float64).tolist()
+    frames = [[Landmark(*point) for point in frame.tolist()] for frame in landmarks]
+    return meta, frames, timestamps
+
+
+def new_counter(factory, timestamps):
+    """A counter whose clock never reads the wall clock."""
+    start = float(timestamps[0])
+    return factory(clock=lambda: start)
+
+
+def replay(counter, frames, timestamps):
+    for landmarks, ts in zip(frames, timestamps):
+        counter.update(landmarks, ts)
+    return counter
+
+
+def _snapshot():
+    # The snapshots themselves are allocated while tracing; leave them out.
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def measure_memory(factory, frames, timestamps):
+    """(mean transient bytes per update, mean blocks left allocated per update,
+    bytes retained after the sequence).
+
+    Blocks are counted from a snapshot diff around each update(): per source
+    line, the blocks allocated minus those freed, summed over the lines that
+    grew. Temporaries freed before update() returns only show up in the
+    transient bytes.
+    """
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    counter = new_counter(factory, timestamps)
+    transient = 0
+    blocks = 0
+    for landmarks, ts in zip(frames, timestamps):
+        snapshot = _snapshot()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        counter.update(landmarks, ts)
+        transient += tracemalloc.get_traced_memory()[1] - before
+        blocks += sum(max(0, diff.count_diff) for diff in _snapshot().compare_to(snapshot, 'lineno'))
+    del snapshot
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return transient / len(frames), blocks / len(frames), retained
+
+
+def run(path, repeat):
+    meta, frames, timestamps = load_fixture(path)
+    name = meta['exercise']
+    factory = COUNTERS[name]
+
+    best = float('inf')
+    for _ in range(repeat):
+        counter = new_counter(factory, timestamps)
+        started = time.perf_counter()
+        replay(counter, frames, timestamps)
+        best = min(best, time.perf_counter() - started)
+    transient, blocks, retained = measure_memory(factory, frames, timestamps)
+
+    got = getattr(counter, meta['metric'])
+    status = 'ok' if abs(got - meta['expected']) <= meta['tolerance'] else 'FAIL'
+    return {
+        'fixture': name,
+        'frames': len(frames),
+        'frames_per_s': round(len(frames) / best),
+        'us_per_frame': round(best / len(frames) * 1e6, 1),
+        'transient_kib': round(transient / 1024, 2),
+        'allocs_per_frame': round(blocks, 2),
+        'retained_kib': round(retained / 1024, 2),
+        'expected': meta['expected'],
+        'got': round(got, 3),
+        'status': status,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', help='fixtures to replay (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed passes; the best is reported')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.npz')))
+    if args.names:
+        paths = [p for p in paths if os.path.splitext(os.path.basename(p))[0] in args.names]
+    if not paths:
+        sys.exit(f"No fixtures in {FIXTURE_DIR}; run benchmarks/replay_fixtures.py first")
+
+    print(f"{'fixture':<12} {'frames':>6} {'frames/s':>9} {'us/frame':>9} "
+          f"{'alloc KiB':>10} {'allocs':>7} {'kept KiB':>9} {'expected':>9} {'got':>8}  status")
+    failed = False
+    for path in paths:
+        r = run(path, args.repeat)
+        failed |= r['status'] == 'FAIL'
+        print(f"{r['fixture']:<12} {r['frames']:>6} {r['frames_per_s']:>9} {r['us_per_frame']:>9} "
+              f"{r['transient_kib']:>10} {r['allocs_per_frame']:>7} {r['retained_kib']:>9} {r['expected']:>9} {r['got']:>8}  {r['status']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Generate the landmark sequences replayed by benchmarks/replay_counters.py.
+
+    python benchmarks/replay_fixtures.py
+
+Each fixture is a scripted movement (joint angles over time) turned into
+Mediapipe's 33-landmark layout by a simple 2D skeleton, with a little seeded
+jitter so consecutive frames are never identical. Every sequence starts with
+the dancer walking into frame (low visibility), then performs a known number
+of reps or a hold of known length. Output is deterministic, so re-running this
+rewrites identical files in benchmarks/fixtures/.
+
+Arrays are stored compressed as float16: (frames, 33, 4) landmarks in
+Landmark field order (x, y, z, visibility) plus float32 capture timestamps.
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FPS = 15
+JITTER = 0.002
+VISIBLE = 0.95
+HIDDEN = 0.3
+
+# Segment lengths (normalized image units) of the side-view skeleton.
+SHIN, THIGH, TORSO, UPPER_ARM, FOREARM = 0.2, 0.2, 0.25, 0.13, 0.13
+
+
+def _polar(origin, length, degrees):
+    """Point `length` away from `origin`; 0 degrees is straight up, positive leans to +x."""
+    radians = math.radians(degrees)
+    return (origin[0] + length * math.sin(radians), origin[1] - length * math.cos(radians))
+
+
+def _frame(points, visibility):
+    """Fill a (33, 4) array from {index: (x, y)}; unlisted landmarks sit at the head."""
+    frame = np.zeros((33, 4), np.float32)
+    head = points.get(0, (0.5, 0.2))
+    frame[:, 0], frame[:, 1] = head
+    for index, (x, y) in points.items():
+        frame[index, 0], frame[index, 1] = x, y
+    frame[:, 3] = visibility
+    return frame
+
+
+def _mirror_left(points, dx=0.01):
+    """Side view: the far-side (left) joints sit just behind the near-side ones."""
+    for right, left in ((12, 11), (14, 13), (16, 15), (24, 23), (26, 25), (28, 27)):
+        x, y = points[right]
+        points[left] = (x - dx, y)
+    return points
+
+
+def side_pose(knee_angle, lift=0.0, shin_lean=None, torso_lean=None, arm=90.0):
+    """Standing/squatting/jumping figure seen from the side, facing +x.
+
+    `knee_angle` is the interior hip-knee-ankle angle; `lift` raises the
+    whole body (a jump). The shin leans forward and the thigh back so the
+    angle between them is `knee_angle`.
+    """
+    bend = 180.0 - knee_angle
+    shin = 0.1 * bend if shin_lean is None else shin_lean
+    thigh = shin - bend
+    torso = 0.1 * bend if torso_lean is None else torso_lean
+    ankle = (0.5, 0.9 - lift)
+    knee = _polar(ankle, SHIN, shin)
+    hip = _polar(knee, THIGH, thigh)
+    shoulder = _polar(hip, TORSO, torso)
+    elbow = _polar(shoulder, UPPER_ARM, arm)
+    wrist = _polar(elbow, FOREARM, arm)
+    head = _polar(shoulder, 0.1, torso)
+    return _mirror_left({0: head, 12: shoulder, 14: elbow, 16: wrist, 24: hip, 26: knee, 28: ankle})
+
+
+def plank_pose(elbow_angle):
+    """Push-up plank seen from the side: a straight body pivoting on the toes,
+    hands on the floor under the shoulders."""
+    floor = 0.85
+    drop = 2 * UPPER_ARM * math.sin(math.radians(elbow_angle) / 2)  # shoulder height above the wrist
+    tilt = math.asin(drop / 0.55)
+    ankle = (0.85, floor)
+    direction = (-math.cos(tilt), -math.sin(tilt))
+    knee = (ankle[0] + 0.15 * direction[0], ankle[1] + 0.15 * direction[1])
+    hip = (ankle[0] + 0.3 * direction[0], ankle[1] + 0.3 * direction[1])
+    shoulder = (ankle[0] + 0.55 * direction[0], ankle[1] + 0.55 * direction[1])
+    wrist = (shoulder[0], floor)
+    bulge = math.sqrt(max(UPPER_ARM ** 2 - (drop / 2) ** 2, 0.0))
+    elbow = (shoulder[0] + bulge, (shoulder[1] + wrist[1]) / 2)
+    head = (shoulder[0] - 0.08, shoulder[1] - 0.02)
+    return _mirror_left({0: head, 12: shoulder, 14: elbow, 16: wrist, 24: hip, 26: knee, 28: ankle})
+
+
+def front_pose(knee_angle):
+    """Araimandi seen from the front: feet apart, knees turned out, shins
+    vertical and the (foreshortened) thighs angled in to the pelvis."""
+    bend = 180.0 - knee_angle
+    points = {0: (0.5, 0.2)}
+    for side, (hip_i, knee_i, ankle_i, shoulder_i) in ((1, (23, 25, 27, 11)), (-1, (24, 26, 28, 12))):
+        ankle = (0.5 + side * 0.14, 0.9)
+        knee = (ankle[0], ankle[1] - 0.18)
+        hip = _polar(knee, 0.08, -side * bend)
+        points.update({ankle_i: ankle, knee_i: knee, hip_i: hip,
+                       shoulder_i: (0.5 + side * 0.1, hip[1] - 0.25)})
+    for shoulder_i, elbow_i, wrist_i, side in ((11, 13, 15, 1), (12, 14, 16, -1)):
+        shoulder = points[shoulder_i]
+        points[elbow_i] = (shoulder[0] + side * 0.13, shoulder[1])
+        points[wrist_i] = (shoulder[0] + side * 0.26, shoulder[1])
+    return points
+
+
+class Script:
+    """Keyframed joint parameters sampled at FPS."""
+
+    def __init__(self, pose, **start):
+        self.pose = pose
+        self.params = dict(start)
+        self.frames = []
+        self.visibility = []
+
+    def hold(self, seconds, visibility=VISIBLE):
+        for _ in range(round(seconds * FPS)):
+            self.frames.append(dict(self.params))
+            self.visibility.append(visibility)
+        return self
+
+    def move(self, seconds, **target):
+        steps = max(1, round(seconds * FPS))
+        start = dict(self.params)
+        for step in range(1, steps + 1):
+            t = step / steps
+            self.params = {k: start[k] + (target.get(k, start[k]) - start[k]) * t for k in start}
+            self.frames.append(dict(self.params))
+            self.visibility.append(VISIBLE)
+        return self
+
+    def render(self, seed):
+        rng = np.random.default_rng(seed)
+        frames = np.stack([_frame(self.pose(**params), visibility)
+                           for params, visibility in zip(self.frames, self.visibility)])
+        frames[:, :, :2] += rng.normal(0, JITTER, frames[:, :, :2].shape)
+        frames[:, :, 3] = np.clip(frames[:, :, 3] + rng.normal(0, 0.01, frames[:, :, 3].shape), 0, 1)
+        timestamps = np.arange(len(frames), dtype=np.float32) / FPS
+        return frames, timestamps
+
+
+def squats(reps=5):
+    script = Script(side_pose, knee_angle=175.0).hold(0.7, visibility=HIDDEN).hold(1.0)
+    for _ in range(reps):
+        script.move(1.0, knee_angle=75).hold(0.3).move(1.0, knee_angle=175).hold(0.5)
+    return script, {'expected': reps}
+
+
+def pushups(reps=5):
+    script = Script(plank_pose, elbow_angle=170.0).hold(0.7, visibility=HIDDEN).hold(1.0)
+    for _ in range(reps):
+        script.move(0.8, elbow_angle=80).hold(0.3).move(0.8, elbow_angle=170).hold(0.5)
+    return script, {'expected': reps}
+
+
+def araimandi(hold_seconds=12.0):
+    script = Script(front_pose, knee_angle=175.0).hold(0.7, visibility=HIDDEN).hold(1.0)
+    script.move(1.0, knee_angle=95)
+    # The counter's timer runs from the first frame in the 70-120 degree band
+    # until the first frame after leaving it.
+    entered = next(i for i, f in enumerate(script.frames) if 70 < f['knee_angle'] < 120)
+    script.hold(hold_seconds).move(1.0, knee_angle=175)
+    left = next(i for i, f in enumerate(script.frames) if i > entered and f['knee_angle'] >= 120)
+    script.hold(1.0)
+    return script, {'expected': round((left - entered) / FPS, 3), 'tolerance': 2 / FPS}
+
+
+def mulumandi(reps=3):
+    script = Script(side_pose, knee_angle=175.0, lift=0.0).hold(0.7, visibility=HIDDEN).hold(0.7)
+    for _ in range(reps):
+        (script.move(0.6, knee_angle=95).hold(1.2)
+         .move(0.4, knee_angle=70)
+         # Take-off: the body leaves the floor before the knees straighten.
+         .move(1 / FPS, lift=0.04).move(0.2, lift=0.1, knee_angle=150).hold(0.1)
+         .move(0.3, lift=0.0, knee_angle=95).hold(0.5)
+         .move(0.6, knee_angle=175).hold(0.5))
+    return script, {'expected': reps}
+
+
+def mandia_davu(reps=3):
+    script = Script(side_pose, knee_angle=175.0, lift=0.0, shin_lean=1.0).hold(0.7, visibility=HIDDEN).hold(0.7)
+    for _ in range(reps):
+        (script.move(0.6, knee_angle=90, shin_lean=9.0).hold(1.6)
+         .move(0.3, knee_angle=72, shin_lean=11.0)
+         .move(1 / FPS, lift=0.05).move(0.2, lift=0.08, knee_angle=150, shin_lean=3.0)
+         # Drop to the knees: the shins fold down until the knee nearly touches the floor.
+         .move(0.4, lift=0.0, knee_angle=60, shin_lean=85.0).hold(0.4)
+         .move(0.6, knee_angle=90, shin_lean=9.0).hold(0.4)
+         .move(0.6, knee_angle=175, shin_lean=1.0).hold(0.5))
+    return script, {'expected': reps}
+
+
+# name -> (builder, counter attribute compared with 'expected')
+FIXTURES = {
+    'squats': (squats, 'counter'),
+    'pushups': (pushups, 'counter'),
+    'araimandi': (araimandi, 'elapsed_time'),
+    'mulumandi': (mulumandi, 'counter'),
+    'mandia_davu': (mandia_davu, 'counter'),
+}
+
+
+def main():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for seed, (name, (builder, metric)) in enumerate(sorted(FIXTURES.items())):
+        script, expectation = builder()
+        landmarks, timestamps = script.render(seed)
+        meta = {'exercise': name, 'fps': FPS, 'metric': metric, 'tolerance': 0, **expectation}
+        path = os.path.join(FIXTURE_DIR, f'{name}.npz')
+        np.savez_compressed(path, landmarks=landmarks.astype(np.float16), timestamps=timestamps,
+                            meta=np.array(json.dumps(meta, sort_keys=True)))
+        print(f"{path}: {len(landmarks)} frames, {os.path.getsize(path)} bytes, {meta}")
+
+
+if __name__ == '__main__':
+    main()
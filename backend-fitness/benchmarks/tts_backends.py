@@ -0,0 +1,82 @@
+"""Synthesis latency of each TTS backend over the phrases the counters speak.
+
+    python benchmarks/tts_backends.py [backend ...]
+
+For every available backend this synthesizes each phrase from
+collect_counter_phrases() once (cold, straight from the engine) and then
+reads it back through an AudioCache in a temporary directory (cached), and
+reports p50/p95 latency for both. Backends that are not installed or cannot
+reach their service are skipped.
+"""
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from tts_cache import AudioCache, collect_counter_phrases  # noqa: E402
+from tts_engines import SYNTHESIZERS, get_synthesizer  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def bench_backend(name, phrases):
+    synthesizer = get_synthesizer(name)
+    if not synthesizer.is_available():
+        return None, "not available"
+
+    cold = []
+    total_bytes = 0
+    with tempfile.TemporaryDirectory() as directory:
+        cache = AudioCache(directory=directory)
+        for phrase in phrases:
+            started = time.perf_counter()
+            try:
+                audio_bytes = synthesizer.synthesize(phrase)
+            except Exception as e:
+                return None, f"synthesis failed: {e}"
+            cold.append((time.perf_counter() - started) * 1000)
+            total_bytes += len(audio_bytes)
+            cache.put(phrase, audio_bytes, voice=synthesizer.name)
+
+        # Fresh cache object on the same directory: first pass reads disk,
+        # second pass is served from memory.
+        cache = AudioCache(directory=directory)
+        disk, memory = [], []
+        for timings in (disk, memory):
+            for phrase in phrases:
+                started = time.perf_counter()
+                cache.get(phrase, voice=synthesizer.name)
+                timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'cold_p50_ms': percentile(cold, 50),
+        'cold_p95_ms': percentile(cold, 95),
+        'disk_p50_ms': percentile(disk, 50),
+        'memory_p50_ms': percentile(memory, 50),
+        'avg_kb': total_bytes / len(phrases) / 1024,
+    }, None
+
+
+def main():
+    names = sys.argv[1:] or list(SYNTHESIZERS)
+    phrases = collect_counter_phrases()
+    print(f"{len(phrases)} phrases")
+    print(f"{'backend':<10}{'cold p50':>10}{'cold p95':>10}{'disk p50':>10}{'mem p50':>10}{'avg KB':>8}")
+    for name in names:
+        result, reason = bench_backend(name, phrases)
+        if result is None:
+            print(f"{name:<10}skipped ({reason})")
+            continue
+        print(f"{name:<10}{result['cold_p50_ms']:>9.1f}ms{result['cold_p95_ms']:>8.1f}ms"
+              f"{result['disk_p50_ms']:>8.3f}ms{result['memory_p50_ms']:>8.4f}ms{result['avg_kb']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
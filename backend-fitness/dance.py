@@ -1,135 +1,150 @@
-import cv2
-import mediapipe as mp
 from araimandi_counter import AraimandiCounter
 from mulumandi_counter import MulumandiJumpCounter
 from mandia_davu_counter import MandiAdavuCounter
+from session_registry import SessionRegistry, FrameOrder
+from pose_engine import pose_engine, PoseEngineBusy
+from timing import stage
+from metrics import ACTIVE_SESSIONS, POSE_DETECTIONS, POSE_SECONDS
+from logs import get_logger
+
+logger = get_logger('dance')
 
 # --- Global Initializations ---
-# Initialize Mediapipe Pose once to avoid re-creating it for every request.
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    smooth_landmarks=True,
-    enable_segmentation=False,
-    smooth_segmentation=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+# Pose estimation uses the shared model in pose_engine.py; per-exercise
+# settings live in pose_engine.POSE_PROFILES.
 
-# Initialize counter instances once. This maintains their state (counts, timers)
-# across different frames sent from the frontend.
-araimandi_counter = AraimandiCounter(target_time_seconds=10)
-mulumandi_counter = MulumandiJumpCounter()
-mandi_adavu_counter = MandiAdavuCounter()
+# Counter instances are kept per (user, session) so their state (counts, timers)
+# carries across frames from the same dancer without leaking between users.
+dance_sessions = SessionRegistry({
+    'araimandi': lambda: AraimandiCounter(target_time_seconds=10),
+    'mulumandi': MulumandiJumpCounter,
+    'mandia_davu': MandiAdavuCounter,
+})
+ACTIVE_SESSIONS.set_function(dance_sessions.size, 'dance')
 
-def _get_landmarks(frame):
+def _get_landmarks(frame, exercise):
     """Helper function to process a frame with Mediapipe and return landmarks."""
     try:
-        # Recolor image to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-        
-        # Make detection
-        results = pose.process(image)
-        
-        # Recolor back to BGR  
-        image.flags.writeable = True
-        
-        # Check if landmarks were detected
-        if results.pose_landmarks:
-            return results.pose_landmarks.landmark
-        else:
-            return None
-            
+        with stage('pose'), POSE_SECONDS.time(exercise):
+            landmarks = pose_engine.detect(frame, exercise)
+    except PoseEngineBusy:
+        POSE_DETECTIONS.inc(exercise, 'busy')
+        raise
     except Exception as e:
-        print(f"Error in _get_landmarks: {e}")
+        POSE_DETECTIONS.inc(exercise, 'error')
+        logger.error("Pose detection failed for %s: %s", exercise, e)
         return None
+    POSE_DETECTIONS.inc(exercise, 'detected' if landmarks else 'no_pose')
+    return landmarks
 
 # --- Main Processing Functions for the API ---
 
-def process_araimandi(frame):
-    """Processes a single frame for the Araimandi exercise."""
-    landmarks = _get_landmarks(frame)
-    if landmarks:
-        # Process the frame with the counter
-        _ = araimandi_counter.process_frame(landmarks, frame)
+def process_araimandi(frame, araimandi_counter, order=None):
+    """Processes a single frame for the Araimandi exercise.
+
+    `order` (a FrameOrder) serializes the counter update, and the reads of the
+    counter's state that follow it, with the session's other frames.
+    """
+    return update_araimandi(_get_landmarks(frame, 'araimandi'), araimandi_counter, order)
+
+def update_araimandi(landmarks, araimandi_counter, order=None):
+    """Apply one frame's landmarks (None if no body was found) to the Araimandi counter."""
+    order = order or FrameOrder()
+    with order:
+        if landmarks:
+            # Update the counter state (no overlay drawing on the server path)
+            with stage('counter'):
+                araimandi_counter.update(landmarks, order.timestamp)
         
-        # Return feedback and audio info
-        feedback_text = ""
-        if araimandi_counter.is_holding:
-            feedback_text = f"Holding pose: {araimandi_counter.elapsed_time:.1f}s - {araimandi_counter.feedback}"
-        else:
-            feedback_text = araimandi_counter.feedback
+            # Return feedback and audio info
+            feedback_text = ""
+            if araimandi_counter.is_holding:
+                feedback_text = f"Holding pose: {araimandi_counter.elapsed_time:.1f}s - {araimandi_counter.feedback}"
+            else:
+                feedback_text = araimandi_counter.feedback
         
-        # Get audio info - with safe attribute access
-        audio_message = getattr(araimandi_counter, 'audio_message', '')
-        should_speak = getattr(araimandi_counter, 'should_speak', False)
+            # Get audio info - with safe attribute access
+            audio_message = getattr(araimandi_counter, 'audio_message', '')
+            should_speak = getattr(araimandi_counter, 'should_speak', False)
         
-        print(f"Araimandi - Counter feedback: {feedback_text}")  # Debug
-        print(f"Araimandi - Should speak: {should_speak}, Audio message: '{audio_message}'")  # Debug
+            logger.debug("Araimandi: %r, speak=%s %r", feedback_text, should_speak, audio_message)
         
-        # Return both feedback and audio message for the frontend
-        return {
-            'feedback': feedback_text,
-            'audio_message': audio_message if should_speak else '',
-            'should_speak': should_speak
-        }
-    else:
-        return {
-            'feedback': "Step back and make sure your full body is visible in the camera",
-            'audio_message': "Step back and make sure your full body is visible in the camera",
-            'should_speak': True
-        }
+            # Return both feedback and audio message for the frontend
+            return {
+                'feedback': feedback_text,
+                'audio_message': audio_message if should_speak else '',
+                'should_speak': should_speak
+            }
+        else:
+            return {
+                'feedback': "Step back and make sure your full body is visible in the camera",
+                'audio_message': "Step back and make sure your full body is visible in the camera",
+                'should_speak': True
+            }
+
+def process_mulumandi(frame, mulumandi_counter, order=None):
+    """Processes a single frame for the Mulumandi Jump exercise; `order` as in process_araimandi."""
+    return update_mulumandi(_get_landmarks(frame, 'mulumandi'), mulumandi_counter, order)
 
-def process_mulumandi(frame):
-    """Processes a single frame for the Mulumandi Jump exercise."""
-    landmarks = _get_landmarks(frame)
-    if landmarks:
-        _ = mulumandi_counter.process_frame(landmarks, frame)
-        count = getattr(mulumandi_counter, 'count', 0)
-        feedback = getattr(mulumandi_counter, 'feedback', 'Keep jumping!')
-        feedback_text = f"Jumps: {count} - {feedback}"
+def update_mulumandi(landmarks, mulumandi_counter, order=None):
+    """Apply one frame's landmarks (None if no body was found) to the Mulumandi Jump counter."""
+    order = order or FrameOrder()
+    with order:
+        if landmarks:
+            with stage('counter'):
+                mulumandi_counter.update(landmarks, order.timestamp)
+            count = getattr(mulumandi_counter, 'count', 0)
+            feedback = getattr(mulumandi_counter, 'feedback', 'Keep jumping!')
+            feedback_text = f"Jumps: {count} - {feedback}"
         
-        print(f"Mulumandi - Feedback: {feedback_text}")  # Debug
+            logger.debug("Mulumandi: %r", feedback_text)
         
-        # Check if mulumandi counter has audio system like araimandi
-        audio_message = getattr(mulumandi_counter, 'audio_message', feedback)
-        should_speak = getattr(mulumandi_counter, 'should_speak', count > 0)  # Speak when there's progress
+            # Check if mulumandi counter has audio system like araimandi
+            audio_message = getattr(mulumandi_counter, 'audio_message', feedback)
+            should_speak = getattr(mulumandi_counter, 'should_speak', count > 0)  # Speak when there's progress
         
+            return {
+                'feedback': feedback_text,
+                'audio_message': audio_message if should_speak else '',
+                'should_speak': should_speak
+            }
         return {
-            'feedback': feedback_text,
-            'audio_message': audio_message if should_speak else '',
-            'should_speak': should_speak
+            'feedback': "Step back and make sure your full body is visible in the camera",
+            'audio_message': "Step back and make sure your full body is visible in the camera",
+            'should_speak': True
         }
-    return {
-        'feedback': "Step back and make sure your full body is visible in the camera",
-        'audio_message': "Step back and make sure your full body is visible in the camera",
-        'should_speak': True
-    }
     
-def process_mandia_davu(frame):
-    """Processes a single frame for the Mandi Adavu exercise."""
-    landmarks = _get_landmarks(frame)
-    if landmarks:
-        _ = mandi_adavu_counter.process_frame(landmarks, frame)
-        count = getattr(mandi_adavu_counter, 'count', 0)
-        feedback = getattr(mandi_adavu_counter, 'feedback', 'Keep going!')
-        feedback_text = f"Reps: {count} - {feedback}"
+def process_mandia_davu(frame, mandi_adavu_counter, order=None):
+    """Processes a single frame for the Mandi Adavu exercise; `order` as in process_araimandi."""
+    return update_mandia_davu(_get_landmarks(frame, 'mandia_davu'), mandi_adavu_counter, order)
+
+def update_mandia_davu(landmarks, mandi_adavu_counter, order=None):
+    """Apply one frame's landmarks (None if no body was found) to the Mandi Adavu counter."""
+    order = order or FrameOrder()
+    with order:
+        if landmarks:
+            with stage('counter'):
+                mandi_adavu_counter.update(landmarks, order.timestamp)
+            count = getattr(mandi_adavu_counter, 'count', 0)
+            feedback = getattr(mandi_adavu_counter, 'feedback', 'Keep going!')
+            feedback_text = f"Reps: {count} - {feedback}"
         
-        print(f"Mandi Adavu - Feedback: {feedback_text}")  # Debug
+            logger.debug("Mandi Adavu: %r", feedback_text)
         
-        # Check if mandi adavu counter has audio system like araimandi
-        audio_message = getattr(mandi_adavu_counter, 'audio_message', feedback)
-        should_speak = getattr(mandi_adavu_counter, 'should_speak', count > 0)  # Speak when there's progress
+            # Check if mandi adavu counter has audio system like araimandi
+            audio_message = getattr(mandi_adavu_counter, 'audio_message', feedback)
+            should_speak = getattr(mandi_adavu_counter, 'should_speak', count > 0)  # Speak when there's progress
         
+            return {
+                'feedback': feedback_text,
+                'audio_message': audio_message if should_speak else '',
+                'should_speak': should_speak
+            }
         return {
-            'feedback': feedback_text,
-            'audio_message': audio_message if should_speak else '',
-            'should_speak': should_speak
+            'feedback': "Step back and make sure your full body is visible in the camera",
+            'audio_message': "Step back and make sure your full body is visible in the camera", 
+            'should_speak': True
         }
-    return {
-        'feedback': "Step back and make sure your full body is visible in the camera",
-        'audio_message': "Step back and make sure your full body is visible in the camera", 
-        'should_speak': True
-    }
\ No newline at end of file
+
+# Used by burst uploads, which detect a whole batch of frames before updating.
+LANDMARK_UPDATERS = {'araimandi': update_araimandi, 'mulumandi': update_mulumandi, 'mandia_davu': update_mandia_davu}
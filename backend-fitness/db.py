@@ -0,0 +1,116 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# --- Database configuration ---
+DB_PATH = 'fitness_tracker.db'
+# Connections kept open for reuse; requests beyond this wait for one to free up.
+DB_POOL_SIZE = 8
+DB_POOL_TIMEOUT_SECONDS = 10.0
+# How long a writer waits on SQLite's lock before raising "database is locked".
+DB_BUSY_TIMEOUT_MS = 5000
+# Compiled statements cached per connection (sqlite3's default is 128).
+DB_CACHED_STATEMENTS = 256
+
+# Applied to every new connection. WAL lets readers run alongside a writer,
+# and synchronous=NORMAL is durable across application crashes in WAL mode
+# (only an OS crash can lose the last commits).
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
+)
+
+
+class ConnectionPool:
+    """A fixed-size pool of SQLite connections shared by all request threads.
+
+    Each connection is used by one thread at a time, so check_same_thread is
+    turned off. Reusing connections also reuses their prepared-statement
+    caches, which a fresh sqlite3.connect() per call throws away.
+    """
+
+    def __init__(self, path=DB_PATH, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT_SECONDS):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_CACHED_STATEMENTS,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection: commits on success, rolls back on error.
+
+        This matches `with sqlite3.connect(...) as conn`, except that the
+        connection goes back to the pool instead of being left to the GC.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close_all(self):
+        """Close idle connections (used at shutdown and by tests)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+pool = ConnectionPool()
+
+
+def get_connection():
+    """Context manager yielding a pooled connection to the app database."""
+    return pool.connection()
@@ -0,0 +1,132 @@
+import atexit
+import datetime
+import sqlite3
+import threading
+
+from db import get_connection
+from metrics import DB_WRITE_SECONDS
+from session_registry import DEFAULT_SESSION_ID
+from logs import get_logger
+
+logger = get_logger('exercise_log')
+
+# Pending counts are written at most this often; a session that ends (or is
+# evicted) and process shutdown flush immediately.
+LOG_FLUSH_INTERVAL_SECONDS = 5.0
+
+# One row per (user, session, exercise, day). Flushes carry the reps added
+# since the previous flush, so a session id reused by a fresh counter (after
+# end_session, eviction, or the 'default' id) adds to the row instead of
+# being masked by the earlier total.
+UPSERT_SQL = '''
+    INSERT INTO exercise_logs (user_id, session_id, exercise_type, reps_count, log_date)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, session_id, exercise_type, log_date)
+    DO UPDATE SET reps_count = reps_count + excluded.reps_count
+'''
+
+
+class ExerciseLogWriter:
+    """Write-behind exercise logging.
+
+    record() only updates an in-memory dict, so the frame path never touches
+    the database. A background thread flushes the reps each active (user,
+    session, exercise) added since the last flush as one batched upsert.
+
+    Counters report cumulative totals; record() turns them into the reps
+    added since the previous call and credits those to the current day.
+    """
+
+    def __init__(self, interval=LOG_FLUSH_INTERVAL_SECONDS):
+        self.interval = interval
+        # (user, session, exercise, day) -> reps not yet written
+        self._pending = {}
+        # (user, session, exercise) -> last cumulative count seen
+        self._last_count = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def _start(self):
+        # Started on first use so importing the app does not spawn threads.
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='exercise-log-writer', daemon=True)
+            self._thread.start()
+
+    def record(self, user_id, session_id, exercise_type, reps_count, today=None):
+        """Note the session's cumulative rep count for an exercise."""
+        session_id = session_id or DEFAULT_SESSION_ID
+        today = today or datetime.datetime.utcnow().date()
+        session_key = (user_id, session_id, exercise_type)
+        with self._lock:
+            last_count = self._last_count.get(session_key, 0)
+            # A count below the last one means a fresh counter started from zero.
+            added = reps_count - last_count if reps_count >= last_count else reps_count
+            self._last_count[session_key] = reps_count
+            if added:
+                # Reps are credited to the day they were seen, so a session
+                # crossing midnight is split between the days.
+                key = session_key + (today,)
+                self._pending[key] = self._pending.get(key, 0) + added
+                self._start()
+
+    def flush(self):
+        """Write every pending count in one transaction. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            rows = [(user_id, session_id, exercise_type, reps, day)
+                    for (user_id, session_id, exercise_type, day), reps in batch.items()]
+            try:
+                with DB_WRITE_SECONDS.time('exercise_log_flush'), get_connection() as conn:
+                    conn.executemany(UPSERT_SQL, rows)
+            except sqlite3.Error as e:
+                logger.error("Database error flushing exercise logs: %s", e)
+                # Put the batch back, adding any reps recorded meanwhile.
+                with self._lock:
+                    for key, reps in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + reps
+                return 0
+            self.flushes += 1
+            self.rows_written += len(rows)
+            return len(rows)
+
+    def end_session(self, user_id, session_id):
+        """Flush now and forget the session's last counts."""
+        session_id = session_id or DEFAULT_SESSION_ID
+        with self._lock:
+            for key in [k for k in self._last_count if k[:2] == (user_id, session_id)]:
+                del self._last_count[key]
+        self.flush()
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the timer thread and write anything still pending."""
+        self._stopped = True
+        self._wake.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'interval_seconds': self.interval,
+        }
+
+
+exercise_logger = ExerciseLogWriter()
+atexit.register(exercise_logger.close)
@@ -0,0 +1,74 @@
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+
+LANDMARK_COUNT = 33
+
+# Joint angles the counters use, as (A, vertex, C) Mediapipe landmark indices.
+JOINT_ANGLES = {
+    'right_knee': (24, 26, 28),   # hip - knee - ankle
+    'left_knee': (23, 25, 27),
+    'right_elbow': (12, 14, 16),  # shoulder - elbow - wrist
+    'right_body': (12, 24, 28),   # shoulder - hip - ankle
+    'right_hip': (12, 24, 26),    # shoulder - hip - knee
+}
+
+
+def landmarks_to_array(landmarks):
+    """Pack landmarks into a float32 array of (x, y, z, visibility) rows.
+
+    Accepts a sequence of 33 landmarks (pose_engine.Landmark tuples or
+    Mediapipe protobufs) and returns shape (33, 4). Arrays of shape (33, 4)
+    or (N, 33, 4) pass through unchanged apart from the dtype.
+    """
+    if isinstance(landmarks, np.ndarray):
+        points = landmarks.astype(np.float32, copy=False)
+    else:
+        if len(landmarks) != LANDMARK_COUNT:
+            raise IndexError(f"Expected {LANDMARK_COUNT} landmarks, got {len(landmarks)}")
+        # np.fromiter over flat values is several times faster than
+        # np.array(list_of_tuples) for a list this small.
+        if isinstance(landmarks[0], tuple):
+            values = chain.from_iterable(landmarks)
+        else:
+            values = (v for lm in landmarks for v in (lm.x, lm.y, lm.z, lm.visibility))
+        points = np.fromiter(values, dtype=np.float32, count=LANDMARK_COUNT * 4).reshape(LANDMARK_COUNT, 4)
+
+    if points.shape[-2:] != (LANDMARK_COUNT, 4):
+        raise IndexError(f"Expected {LANDMARK_COUNT} landmarks with 4 values, got shape {points.shape}")
+    return points
+
+
+@lru_cache(maxsize=32)
+def _angle_indices(names):
+    """Gather indices for both arms of every joint: (ends, vertices), each 2*J long."""
+    a, b, c = np.array([JOINT_ANGLES[name] for name in names]).T
+    return np.concatenate([c, a]), np.concatenate([b, b])
+
+
+def joint_angles(points, names=None):
+    """Angles in degrees (0-180) at each joint's vertex, in the image (x, y) plane.
+
+    `points` is a (33, 4) or (N, 33, 4) array from landmarks_to_array. Returns
+    {name: angle}, with floats for a single frame and (N,) arrays for a batch.
+    """
+    names = tuple(JOINT_ANGLES) if names is None else tuple(names)
+    ends, vertices = _angle_indices(names)
+
+    # One arctan2 over both arms of every joint, then split: [C arms | A arms].
+    xy = points[..., :2]
+    arms = xy[..., ends, :] - xy[..., vertices, :]
+    theta = np.arctan2(arms[..., 1], arms[..., 0])
+    count = len(names)
+    angles = np.abs(np.degrees(theta[..., :count] - theta[..., count:]))
+    angles = np.minimum(angles, 360.0 - angles)
+
+    if angles.ndim == 1:
+        return dict(zip(names, angles.tolist()))
+    return {name: angles[:, i] for i, name in enumerate(names)}
+
+
+def landmark_angles(landmarks, names=None):
+    """joint_angles() straight from a frame's landmark list."""
+    return joint_angles(landmarks_to_array(landmarks), names)
@@ -0,0 +1,87 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# A frame request authenticates on every call, so a verified token's user row
+# is kept for a short while. Entries never outlive the token's own `exp`.
+IDENTITY_CACHE_ENTRIES = 4096
+IDENTITY_CACHE_TTL_SECONDS = 60
+
+
+def token_hash(token):
+    """The same digest user_sessions and revoked_tokens store, so cache and DB agree on keys."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class IdentityCache:
+    """Bounded LRU of token hash -> (user data, JWT payload, expiry).
+
+    The cache is per process: logout invalidates the local
+    copy immediately, other workers pick the change up within the TTL.
+    """
+
+    def __init__(self, max_entries=IDENTITY_CACHE_ENTRIES, ttl=IDENTITY_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, now=None):
+        """Return (user_data, payload) for a cached token hash, or None."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user_data, payload, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return user_data, payload
+
+    def put(self, key, user_data, payload, now=None):
+        now = time.time() if now is None else now
+        expires_at = now + self.ttl
+        if payload.get('exp'):
+            expires_at = min(expires_at, payload['exp'])
+        if expires_at <= now:
+            return
+        with self._lock:
+            self._entries[key] = (user_data, payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            'entries': size,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+identity_cache = IdentityCache()
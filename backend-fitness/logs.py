@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+# LOG_LEVEL=DEBUG brings back the per-frame detail (counter decisions, audio
+# requests). At the default INFO level those calls return before formatting
+# anything, so the frame path does no string work and no I/O.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# 'text' for humans, 'json' for one object per line.
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+# At most LOG_RATE_LIMIT records per message template per interval; the next
+# record let through after a burst says how many were dropped.
+LOG_RATE_LIMIT = int(os.environ.get('LOG_RATE_LIMIT', 10))
+LOG_RATE_INTERVAL_SECONDS = 60.0
+
+ROOT_LOGGER = 'fitness'
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_FIELDS and key not in ('rate_limit', 'suppressed')}
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops repeats of the same message template beyond `limit` per `interval`.
+
+    Keyed on the unformatted template (record.msg), so "Error in %s: %s" is one
+    stream however many distinct arguments it is logged with. Records logged
+    with extra={'rate_limit': False} always pass.
+    """
+
+    def __init__(self, limit=LOG_RATE_LIMIT, interval=LOG_RATE_INTERVAL_SECONDS):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.limit <= 0 or not getattr(record, 'rate_limit', True):
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            started, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.interval:
+                started, count = now, 0
+            if count >= self.limit:
+                self._windows[key] = (started, count, suppressed + 1)
+                return False
+            self._windows[key] = (started, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            text += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if getattr(record, 'suppressed', 0):
+            text += f' ({record.suppressed} similar messages suppressed)'
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Install the app's handler on the 'fitness' logger (idempotent)."""
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level)
+    if not any(getattr(h, '_fitness_handler', False) for h in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler._fitness_handler = True
+        handler.addFilter(RateLimitFilter())
+        logger.addHandler(handler)
+        # Flask and werkzeug log through the root logger; keep the two apart.
+        logger.propagate = False
+    for handler in logger.handlers:
+        if getattr(handler, '_fitness_handler', False):
+            handler.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    return logger
+
+
+def get_logger(name):
+    """Logger for a backend module, e.g. get_logger('auth') -> 'fitness.auth'."""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+configure()
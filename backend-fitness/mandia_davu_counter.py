@@ -1,23 +1,17 @@
 import cv2
-import numpy as np
 import time
 
-def calculate_angle(a, b, c):
-    """Calculates the angle between three points (A, B, C) with B as the vertex."""
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
+from geometry import landmark_angles
+from logs import get_logger
 
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-
-    if angle > 180.0:
-        angle = 360 - angle
-
-    return angle
+logger = get_logger('counters')
 
 class MandiAdavuCounter:
-    def __init__(self):
+    def __init__(self, clock=time.time):
+        # Time source for frames that arrive without a capture timestamp;
+        # self.now is the time of the frame being processed.
+        self.clock = clock
+        self.now = clock()
         self.counter = 0
         self.state = "start"  # States: "start", "araimandi_ready", "dip", "jump", "mandi_contact", "araimandi_landed"
         self.previous_ankle_y = None
@@ -29,7 +23,7 @@ class MandiAdavuCounter:
         self.last_feedback_time = 0
         self.should_speak = False  # Flag to indicate when audio should be played
         self.audio_message = ""    # The message that should be spoken
-        self.state_entry_time = time.time()
+        self.state_entry_time = None  # Set by the first frame
         
         # Audio rate limiting
         self.last_audio_time = 0
@@ -37,7 +31,7 @@ class MandiAdavuCounter:
 
     def set_audio_feedback(self, message):
         """Set audio feedback to be played by frontend"""
-        current_time = time.time()
+        current_time = self.now
         
         # Rate limiting: minimum interval between audio messages
         if current_time - self.last_audio_time < self.min_audio_interval:
@@ -52,11 +46,10 @@ class MandiAdavuCounter:
             self.last_feedback_spoken = message
             self.last_feedback_time = current_time
             self.last_audio_time = current_time
-            print(f"Mandi Adavu Audio set: '{message}' at time {current_time}")  # Debug
+            logger.debug("Mandi Adavu audio set: %r at %.2f", message, current_time)
         else:
             self.should_speak = False
             self.audio_message = ""
-            print(f"Mandi Adavu Audio skipped - duplicate or too soon")  # Debug
 
     def check_form_and_give_feedback(self, landmarks):
         """Check form and provide specific correction feedback"""
@@ -67,8 +60,10 @@ class MandiAdavuCounter:
             shoulder = [landmarks[12].x, landmarks[12].y]
             
             current_ankle_y = landmarks[28].y
+            # Take-off is detected against the ankle height of the previous frame
+            previous_ankle_y, self.previous_ankle_y = self.previous_ankle_y, current_ankle_y
             current_knee_y = landmarks[26].y
-            knee_angle = calculate_angle(hip, knee, ankle)
+            knee_angle = landmark_angles(landmarks, ('right_knee',))['right_knee']
             
             # Check if back is straight
             back_alignment = abs(shoulder[0] - hip[0])
@@ -85,13 +80,13 @@ class MandiAdavuCounter:
                     return "Bend down more to reach araimandi"
                 elif 80 < knee_angle < 100:
                     self.state = "araimandi_ready"
-                    self.state_entry_time = time.time()
+                    self.state_entry_time = self.now
                     return "Perfect araimandi! Ready to perform mandi adavu"
                 else:
                     return "Too deep! Rise up slightly to araimandi"
             
             elif self.state == "araimandi_ready":
-                current_time = time.time()
+                current_time = self.now
                 hold_time = current_time - self.state_entry_time
                 
                 if knee_angle < 80:
@@ -111,7 +106,7 @@ class MandiAdavuCounter:
                     return "Hold araimandi steady, then dip and jump"
             
             elif self.state == "dip":
-                if self.previous_ankle_y is not None and current_ankle_y < self.previous_ankle_y - 0.02:
+                if previous_ankle_y is not None and current_ankle_y < previous_ankle_y - 0.02:
                     self.state = "jump"
                     return "Excellent jump! Now drop to mandi position"
                 elif knee_angle > 90:
@@ -153,16 +148,20 @@ class MandiAdavuCounter:
                 else:
                     return "Great landing! Continue or stand to reset"
             
-            # Store ankle position for next frame
-            self.previous_ankle_y = current_ankle_y
-            
             return "Continue the movement sequence"
             
         except (IndexError, TypeError):
             return "Adjust position so I can see all your landmarks"
 
-    def process_frame(self, landmarks, frame):
-        """Process frame with audio feedback for web integration"""
+    def update(self, landmarks, timestamp=None):
+        """Advance the mandi adavu state and feedback for one frame (no drawing).
+
+        `timestamp` is the frame's capture time in seconds; without it the
+        counter's clock is read.
+        """
+        self.now = self.clock() if timestamp is None else timestamp
+        if self.state_entry_time is None:
+            self.state_entry_time = self.now
         
         # Reset audio flag at start of each frame
         self.should_speak = False
@@ -172,9 +171,9 @@ class MandiAdavuCounter:
         required_landmarks = [24, 26, 28, 12, 14, 16]
         self.is_full_body_visible = all(landmarks[i].visibility > 0.7 for i in required_landmarks)
 
+        current_time = self.now
         if not self.is_full_body_visible:
             self.feedback = "Ensure your entire body is visible"
-            current_time = time.time()
             # Only give body visibility feedback occasionally
             if current_time - self.last_audio_time > 4.0:
                 self.set_audio_feedback("Move back so I can see your full body")
@@ -191,6 +190,10 @@ class MandiAdavuCounter:
             elif current_time - self.last_audio_time > 3.0:  # Form corrections every 3 seconds
                 self.set_audio_feedback(form_feedback)
 
+        return self.feedback
+
+    def draw(self, frame):
+        """Draw the overlay for the last update() onto `frame`"""
         # Display information on the frame
         cv2.putText(frame, f'Reps: {self.counter}', (10, 70), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2, cv2.LINE_AA)
         cv2.putText(frame, f'State: {self.state}', (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
@@ -235,4 +238,9 @@ class MandiAdavuCounter:
         if technique_tip:
             cv2.putText(frame, technique_tip, (10, 190), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1, cv2.LINE_AA)
 
-        return frame
\ No newline at end of file
+        return frame
+
+    def process_frame(self, landmarks, frame, timestamp=None):
+        """Process frame with audio feedback for web integration"""
+        self.update(landmarks, timestamp)
+        return self.draw(frame)
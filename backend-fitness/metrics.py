@@ -0,0 +1,427 @@
+import atexit
+import bisect
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from logs import get_logger
+
+# Archiving dead processes' snapshots needs a file lock; without fcntl
+# (Windows) their files are simply kept and summed.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = get_logger('metrics')
+
+# In-process counters, histograms and gauges, rendered in the Prometheus text
+# format by /metrics. Recording a sample is a dict update under a lock; gauges
+# are read from callbacks at scrape time, so they cost nothing per request.
+#
+# With several server processes on one host, point METRICS_DIR at a directory
+# they share. Each process writes its samples to metrics-<pid>-<start>.json
+# every METRICS_SNAPSHOT_SECONDS (and at exit), and /metrics sums all the
+# files, using live numbers for the process that serves the scrape. At
+# startup, the snapshots of processes that have exited are folded into
+# metrics-archive.json, so their counters keep counting without one file
+# per dead worker piling up.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_SNAPSHOT_SECONDS = 5.0
+# Gauges from a snapshot older than this belong to a process that died
+# without writing its final snapshot, so they are ignored.
+METRICS_STALE_SECONDS = 3 * METRICS_SNAPSHOT_SECONDS
+METRICS_ARCHIVE_FILE = 'metrics-archive.json'
+METRICS_LOCK_FILE = 'metrics.lock'
+# metrics-<pid>.json is the name older versions wrote.
+_SNAPSHOT_NAME = re.compile(r'metrics-(\d+)(?:-\d+)?\.json')
+
+# Latency buckets in seconds: sub-millisecond DB writes up to multi-second TTS calls.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        return False
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+    def samples(self):
+        """{label values: value} for this process, as JSON-friendly data."""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def render(self, samples):
+        lines = []
+        for labels, value in sorted(samples.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """A value read from `function(*labels)` at collection time."""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set_function(self, function, *labels):
+        self._check(labels)
+        with self._lock:
+            self._functions[labels] = function
+
+    def samples(self):
+        with self._lock:
+            functions = dict(self._functions)
+        values = {}
+        for labels, function in functions.items():
+            try:
+                values[labels] = function()
+            except Exception as e:
+                logger.warning("Error reading gauge %s: %s", self.name, e)
+        return values
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        self._check(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (not cumulative) counts, then sum and count.
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, *labels):
+        """Context manager observing the duration of its block in seconds."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            return {labels: [list(state[0]), state[1], state[2]] for labels, state in self._values.items()}
+
+    @staticmethod
+    def merge(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def render(self, samples):
+        lines = []
+        bounds = self.buckets + (math.inf,)
+        for labels, (counts, total, count) in sorted(samples.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """Every metric of the process, plus the cross-process snapshot files."""
+
+    def __init__(self, directory=METRICS_DIR, snapshot_seconds=METRICS_SNAPSHOT_SECONDS):
+        self.directory = directory
+        self.snapshot_seconds = snapshot_seconds
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._identity = None
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    # --- Multi-process support ---
+    def _snapshot_path(self):
+        # The start time keeps a recycled pid from overwriting (and so
+        # lowering) the counters of the dead process that had it. It is taken
+        # per pid, so forked workers do not share the parent's.
+        pid = os.getpid()
+        if self._identity is None or self._identity[0] != pid:
+            self._identity = (pid, int(time.time() * 1000))
+        return os.path.join(self.directory, f'metrics-{pid}-{self._identity[1]}.json')
+
+    def _local_samples(self, include_gauges=True):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.samples() for metric in metrics
+                if include_gauges or metric.type != 'gauge'}
+
+    @staticmethod
+    def _write_file(path, samples):
+        data = {name: [[list(labels), value] for labels, value in values.items()]
+                for name, values in samples.items()}
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _merge_file(self, merged, path, include_gauges=True):
+        """Add one snapshot file's samples to `merged`; False if it is unreadable."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        for name, samples in data.items():
+            metric = self._metrics.get(name)
+            if metric is None or (not include_gauges and metric.type == 'gauge'):
+                continue
+            target = merged.setdefault(name, {})
+            for labels, value in samples:
+                labels = tuple(labels)
+                target[labels] = metric.merge(target[labels], value) if labels in target else value
+        return True
+
+    def _lock_directory(self, exclusive):
+        """The snapshot directory's lock file, flocked; None where unavailable.
+
+        Archiving holds it exclusively and scrapes shared, so a scrape never
+        sees a snapshot both archived and still in place (or in neither).
+        Closing the file releases the lock.
+        """
+        if fcntl is None:
+            return None
+        try:
+            lock = open(os.path.join(self.directory, METRICS_LOCK_FILE), 'a')
+        except OSError:
+            return None
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    def write_snapshot(self, final=False):
+        """Write this process's samples for the others to collect.
+
+        The final snapshot (at exit) leaves gauges out, since a stopped
+        process no longer has sessions or queues.
+        """
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_file(self._snapshot_path(), self._local_samples(include_gauges=not final))
+        except OSError as e:
+            logger.warning("Error writing metrics snapshot: %s", e)
+
+    def archive_dead_snapshots(self):
+        """Fold the snapshots of exited processes into the archive file.
+
+        Their counters and histograms keep adding to the totals; their gauges
+        are dropped. A snapshot counts as dead once it is stale and its pid
+        is gone. Returns the number of files archived.
+        """
+        if not self.directory:
+            return 0
+        lock = self._lock_directory(exclusive=True)
+        if lock is None:
+            return 0
+        try:
+            now = time.time()
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                match = _SNAPSHOT_NAME.fullmatch(os.path.basename(path))
+                try:
+                    stale = now - os.path.getmtime(path) > METRICS_STALE_SECONDS
+                except OSError:
+                    continue
+                if match and stale and not _process_alive(int(match.group(1))):
+                    dead.append(path)
+            if not dead:
+                return 0
+            archive_path = os.path.join(self.directory, METRICS_ARCHIVE_FILE)
+            archived = {}
+            self._merge_file(archived, archive_path, include_gauges=False)
+            for path in dead:
+                self._merge_file(archived, path, include_gauges=False)
+            self._write_file(archive_path, archived)
+            for path in dead:
+                os.remove(path)
+            logger.info("Archived metrics snapshots of %d exited processes", len(dead))
+            return len(dead)
+        except OSError as e:
+            logger.warning("Error archiving metrics snapshots: %s", e)
+            return 0
+        finally:
+            lock.close()
+
+    def _run(self):
+        while True:
+            time.sleep(self.snapshot_seconds)
+            self.write_snapshot()
+
+    def start(self):
+        """Archive dead processes' snapshots and begin periodic snapshots.
+
+        A no-op without METRICS_DIR.
+        """
+        if not self.directory or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+            self._thread.start()
+        self.archive_dead_snapshots()
+        atexit.register(self.write_snapshot, final=True)
+
+    def _collect(self):
+        merged = self._local_samples()
+        if not self.directory:
+            return merged
+        own_path = self._snapshot_path()
+        now = time.time()
+        lock = self._lock_directory(exclusive=False)
+        try:
+            for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+                if path == own_path:
+                    continue
+                try:
+                    stale = now - os.path.getmtime(path) > METRICS_STALE_SECONDS
+                except OSError:
+                    continue
+                self._merge_file(merged, path, include_gauges=not stale)
+        finally:
+            if lock is not None:
+                lock.close()
+        return merged
+
+    def render(self):
+        """All metrics in the Prometheus text format (version 0.0.4)."""
+        samples = self._collect()
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render(samples.get(metric.name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# --- Metrics shared across modules ---
+FRAME_SECONDS = registry.histogram(
+    'fitness_frame_duration_seconds', 'Time to handle one frame request.', ['endpoint', 'exercise'])
+POSE_DETECTIONS = registry.counter(
+    'fitness_pose_detections_total', 'Pose estimation attempts by outcome.', ['exercise', 'result'])
+POSE_SECONDS = registry.histogram(
+    'fitness_pose_duration_seconds', 'Pose estimation time including the worker round trip.', ['exercise'])
+TTS_REQUESTS = registry.counter(
+    'fitness_tts_requests_total', 'Spoken feedback requests by how they were served.', ['backend', 'result'])
+TTS_SECONDS = registry.histogram(
+    'fitness_tts_synthesis_duration_seconds', 'Speech synthesis calls (cache misses only).', ['backend', 'result'])
+DB_WRITE_SECONDS = registry.histogram(
+    'fitness_db_write_duration_seconds', 'Database write transactions.', ['operation'])
+AUTH_REQUESTS = registry.counter(
+    'fitness_auth_requests_total', 'Token checks by outcome.', ['result'])
+STALE_FRAMES = registry.counter(
+    'fitness_stale_frames_total', 'Frames dropped for arriving after a newer frame of their session.', ['exercise'])
+ACTIVE_SESSIONS = registry.gauge(
+    'fitness_active_sessions', 'Exercise sessions held in memory.', ['kind'])
+QUEUE_DEPTH = registry.gauge(
+    'fitness_queue_depth', 'Work waiting in background queues.', ['queue'])
+
+EXERCISE_LABELS = ('squats', 'pushups', 'araimandi', 'mulumandi', 'mandia_davu')
+
+
+def exercise_label(exercise_type):
+    """Client-supplied names are bucketed so bad input cannot create new series."""
+    return exercise_type if exercise_type in EXERCISE_LABELS else 'unknown'
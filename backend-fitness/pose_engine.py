@@ -0,0 +1,363 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+
+# --- Engine configuration ---
+# One worker per spare core by default; POSE_WORKERS=0 runs inference in the
+# server process instead (handy for debugging and single-core machines).
+POSE_WORKERS = int(os.environ.get('POSE_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+# Frames allowed in flight (queued or running) before new ones are rejected.
+POSE_QUEUE_SIZE = int(os.environ.get('POSE_QUEUE_SIZE', max(2, POSE_WORKERS * 2)))
+POSE_TIMEOUT_SECONDS = float(os.environ.get('POSE_TIMEOUT_SECONDS', 2.0))
+# A new worker spends a second or two importing Mediapipe and building its
+# graph. Until every worker has warmed up, calls may wait this long instead.
+POSE_WARMUP_TIMEOUT_SECONDS = float(os.environ.get('POSE_WARMUP_TIMEOUT_SECONDS', 30.0))
+
+# --- Pose profiles ---
+# Every exercise shares one Mediapipe Pose model per process. Profiles only
+# list what differs from BASE_POSE_OPTIONS; exercises whose options resolve to
+# the same values share the same model instance.
+BASE_POSE_OPTIONS = dict(
+    static_image_mode=False,
+    model_complexity=1,
+    smooth_landmarks=True,
+    enable_segmentation=False,
+    smooth_segmentation=True,
+    min_detection_confidence=0.5,
+    min_tracking_confidence=0.5,
+)
+POSE_PROFILES = {
+    'squats': {},
+    'pushups': {},
+    'araimandi': {},
+    'mulumandi': {},
+    'mandia_davu': {},
+}
+
+
+# The single-frame model in each worker serves every user's frames in turn,
+# so it must not carry tracking or smoothing state from one call to the next:
+# that would blend one user's pose into another's. It runs in static image
+# mode (a fresh detection per frame). Only bursts, which are one session's
+# frames in order, use the tracking options above.
+SINGLE_FRAME_OPTIONS = dict(static_image_mode=True, smooth_landmarks=False)
+
+
+def pose_options(exercise):
+    """Resolve an exercise's profile to the hashable option tuple used to key models."""
+    options = dict(BASE_POSE_OPTIONS)
+    options.update(POSE_PROFILES.get(exercise, {}))
+    return tuple(sorted(options.items()))
+
+
+# Plain, picklable stand-in for Mediapipe's landmark protobufs. The counters
+# only read .x, .y, .z and .visibility, so they work with either.
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+
+# --- Client-side landmarks ---
+# Clients that run pose estimation themselves upload landmarks instead of
+# images: int16 little-endian, four per landmark in Landmark field order,
+# scaled by LANDMARK_SCALE (1e-4 precision over +-3.27, which covers points
+# slightly outside the frame). A frame is 33 * 4 * 2 = 264 bytes, and an
+# all-zero frame means no body was found.
+LANDMARK_COUNT = 33
+LANDMARK_SCALE = 10000
+LANDMARK_FRAME_BYTES = LANDMARK_COUNT * 4 * 2
+
+
+def dequantize_landmarks(data):
+    """Unpack uploaded frames into Landmark lists (None for a frame with no body).
+
+    Raises ValueError unless `data` holds a whole number of frames.
+    """
+    if not data or len(data) % LANDMARK_FRAME_BYTES:
+        raise ValueError(f"Landmark data must be a non-empty multiple of {LANDMARK_FRAME_BYTES} bytes")
+    quantized = np.frombuffer(data, '<i2').reshape(-1, LANDMARK_COUNT, 4)
+    present = quantized.any(axis=(1, 2)).tolist()
+    values = (quantized / LANDMARK_SCALE).tolist()
+    return [[Landmark(*point) for point in frame] if found else None
+            for frame, found in zip(values, present)]
+
+
+# --- Frame decoding ---
+# The pose detector looks at a 224x224 image (the landmark model at a 256x256
+# crop of it), so a 720p or 1080p webcam frame is mostly detail the model
+# throws away. JPEGs are decoded at 1/2, 1/4 or 1/8 scale straight out of the
+# IDCT (libjpeg does much less work at a reduced scale), picking the strongest
+# reduction whose short side stays at or above POSE_DECODE_MIN_SIDE. Landmarks are
+# normalized to the image, so the scale never changes their coordinates.
+POSE_DECODE_MIN_SIDE = int(os.environ.get('POSE_DECODE_MIN_SIDE', 224))
+_REDUCED_DECODES = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+# OpenCV 4.10+ can emit RGB from the decoder itself; older builds decode BGR
+# and convert into a per-thread buffer that is reused from frame to frame.
+_IMREAD_RGB = getattr(cv2, 'IMREAD_COLOR_RGB', None)
+_rgb_buffers = threading.local()
+# Start-of-frame markers carrying the image size (all SOFn but DHT, JPG and DAC).
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG's frame header, or None if `data` is not a JPEG."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[i + 5:i + 7], 'big')
+            width = int.from_bytes(data[i + 7:i + 9], 'big')
+            return width, height
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+
+def decode_scale(width, height, min_side=POSE_DECODE_MIN_SIDE):
+    """Largest of 8, 4, 2 that keeps min(width, height) / scale >= min_side, else 1."""
+    for scale, _ in _REDUCED_DECODES:
+        if min(width, height) // scale >= min_side:
+            return scale
+    return 1
+
+
+def _to_rgb(bgr, reuse_buffer):
+    if not reuse_buffer:
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+    buffer = getattr(_rgb_buffers, 'image', None)
+    if buffer is None or buffer.shape != bgr.shape:
+        buffer = _rgb_buffers.image = np.empty_like(bgr)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=buffer)
+
+
+def decode_rgb(image_bytes, reuse_buffer=True):
+    """Decode an encoded image into the RGB frame pose estimation takes, or None.
+
+    JPEGs come out reduced as described above; other formats are decoded at
+    full size. With `reuse_buffer` the result may share memory with the
+    previous call's result on this thread, so pass False when several frames
+    must stay alive together (a burst).
+    """
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    if nparr.size == 0:
+        return None
+    size = jpeg_size(nparr)
+    scale = decode_scale(*size) if size else 1
+    flags = dict(_REDUCED_DECODES).get(scale, cv2.IMREAD_COLOR)
+    if _IMREAD_RGB is not None:
+        return cv2.imdecode(nparr, flags | _IMREAD_RGB)
+    bgr = cv2.imdecode(nparr, flags)
+    return None if bgr is None else _to_rgb(bgr, reuse_buffer)
+
+
+def pose_input(bgr):
+    """Shrink and convert an already decoded BGR frame (e.g. from a video) like decode_rgb."""
+    height, width = bgr.shape[:2]
+    scale = decode_scale(width, height)
+    if scale > 1:
+        bgr = cv2.resize(bgr, (width // scale, height // scale), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+
+class PoseEngineBusy(RuntimeError):
+    """Raised when a frame cannot be processed in time (queue full or timeout)."""
+
+
+# --- Worker side ---
+# Each worker process keeps its own Mediapipe models, keyed by resolved
+# options, so with the default profiles a worker loads exactly one model.
+_worker_models = {}
+
+
+def _get_model(options):
+    model = _worker_models.get(options)
+    if model is None:
+        import mediapipe as mp
+        model = mp.solutions.pose.Pose(**dict(options, **SINGLE_FRAME_OPTIONS))
+        _worker_models[options] = model
+    return model
+
+
+def _warm_worker(all_options):
+    """Pool initializer: build each single-frame model and run it once."""
+    blank = np.zeros((POSE_DECODE_MIN_SIDE, POSE_DECODE_MIN_SIDE, 3), np.uint8)
+    for options in all_options:
+        _landmarks(_get_model(options), blank)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _landmarks(model, frame):
+    # A read-only view lets Mediapipe skip its copy without locking the
+    # caller's (possibly reused) buffer.
+    image = frame.view()
+    image.flags.writeable = False
+    results = model.process(image)
+    if not results.pose_landmarks:
+        return None
+    return [Landmark(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark]
+
+
+def _detect(frame, options):
+    """Run pose estimation on an RGB frame (see decode_rgb) and return a list of Landmarks (or None)."""
+    return _landmarks(_get_model(options), frame)
+
+
+# Bursts go through a second model per options, so their video-mode tracking
+# is not disturbed by single-frame traffic. It remembers whose burst it saw
+# last and is reset when another session's burst arrives, so tracking state
+# never carries over from one dancer to the next. The pool hands each burst
+# to whichever worker is free, so tracking only continues into a session's
+# next burst when that lands on the same worker; otherwise the burst starts
+# with a fresh detection, as the first burst of a session does.
+_burst_trackers = {}
+
+
+def _detect_burst(frames, options, track_key):
+    """Landmarks (or None) for each frame of a burst, tracked frame to frame in order."""
+    tracker = _burst_trackers.get(options)
+    if tracker is None:
+        import mediapipe as mp
+        model = mp.solutions.pose.Pose(**dict(options))
+    else:
+        last_key, model = tracker
+        if last_key != track_key:
+            model.reset()
+    _burst_trackers[options] = (track_key, model)
+    return [_landmarks(model, frame) for frame in frames]
+
+
+# --- Server side ---
+class PoseEngine:
+    """Pose estimation backed by a pool of worker processes.
+
+    Submissions are bounded by `queue_size`; once that many frames are in
+    flight, new frames are rejected with PoseEngineBusy instead of piling up
+    behind a slow pool. Each call waits at most `timeout` seconds.
+    """
+
+    def __init__(self, workers=POSE_WORKERS, queue_size=POSE_QUEUE_SIZE,
+                 timeout=POSE_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Mediapipe graphs are not thread-safe, so in-process mode is serialized.
+        self._inline_lock = threading.Lock()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._warmups = []
+
+    def _get_executor(self):
+        # Started lazily so importing this module (or Flask's reloader) does
+        # not spawn processes.
+        with self._executor_lock:
+            if self._executor is None:
+                # 'spawn' matches Windows behaviour and avoids forking a
+                # threaded server process.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_worker,
+                    initargs=(sorted({pose_options(e) for e in POSE_PROFILES}),),
+                )
+                # One no-op per worker makes the pool start (and warm) all of
+                # them now rather than one at a time as traffic grows.
+                self._warmups = [self._executor.submit(_ready) for _ in range(self.workers)]
+            return self._executor
+
+    def warming(self):
+        """True while a worker of the current pool is still starting up."""
+        return not all(future.done() for future in self._warmups)
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            raise PoseEngineBusy("Pose engine queue is full")
+        with self._pending_lock:
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._pending_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def pending(self):
+        """Number of frames queued or being processed."""
+        return self._pending
+
+    def detect(self, frame, exercise, timeout=None):
+        """Return the landmarks for RGB `frame` using the model for `exercise`'s profile."""
+        timeout = self.timeout if timeout is None else timeout
+        return self._run(_detect, (frame, pose_options(exercise)), timeout)
+
+    def detect_burst(self, frames, exercise, track_key, timeout=None):
+        """Return the landmarks of each of `frames`, tracked in order as one video clip.
+
+        The whole burst is one task on one worker and takes one queue slot.
+        `track_key` identifies the session, so a worker that sees the same
+        session's bursts back to back keeps tracking across them (see
+        _burst_trackers); the default timeout allows `timeout` per frame.
+        """
+        timeout = self.timeout * max(1, len(frames)) if timeout is None else timeout
+        return self._run(_detect_burst, (frames, pose_options(exercise), track_key), timeout)
+
+    def _run(self, function, args, timeout):
+        self._acquire()
+        if self.workers <= 0:
+            try:
+                if not self._inline_lock.acquire(timeout=timeout):
+                    raise PoseEngineBusy("Timed out waiting for the pose model")
+                try:
+                    return function(*args)
+                finally:
+                    self._inline_lock.release()
+            finally:
+                self._release()
+
+        try:
+            future = self._get_executor().submit(function, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        if self.warming():
+            timeout = max(timeout, POSE_WARMUP_TIMEOUT_SECONDS)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise PoseEngineBusy(f"Pose estimation took longer than {timeout}s")
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time.
+            self.shutdown()
+            raise PoseEngineBusy("Pose worker crashed, restarting pool")
+
+    def shutdown(self):
+        """Stop the worker processes; a later detect() starts a new pool."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# Shared by the workout and dance pipelines.
+pose_engine = PoseEngine()
+atexit.register(pose_engine.shutdown)
@@ -1,30 +1,26 @@
 import cv2
-import numpy as np
 import time
 
-def calculate_angle(a, b, c):
-    """Calculates the angle between three points (A, B, C) with B as the vertex."""
-    a = np.array(a)  # First point
-    b = np.array(b)  # Middle point (vertex)
-    c = np.array(c)  # End point
+from geometry import landmark_angles
+from logs import get_logger
 
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-
-    if angle > 180.0:
-        angle = 360 - angle
-
-    return angle
+logger = get_logger('counters')
 
 class PushupCounter:
-    def __init__(self):
+    def __init__(self, clock=time.time):
+        # Time source for frames that arrive without a capture timestamp;
+        # self.now is the time of the frame being processed.
+        self.clock = clock
+        self.now = clock()
         self.counter = 0
         self.stage = "up"  # "up" or "down"
         self.feedback = "Get in position"
         self.is_side_view = False
         self.is_full_body_visible = False
         self.count_announced = False
-        self.stage_entry_time = time.time()
+        self.stage_entry_time = None  # Set by the first frame
+        self.elbow_angle = 0
+        self.body_angle = 0
         
         # Audio feedback tracking (for frontend)
         self.should_speak = False  # Flag to indicate when audio should be played
@@ -38,7 +34,7 @@ class PushupCounter:
 
     def set_audio_feedback(self, message):
         """Set audio feedback to be played by frontend"""
-        current_time = time.time()
+        current_time = self.now
         
         # Rate limiting: minimum interval between audio messages
         if current_time - self.last_audio_time < self.min_audio_interval:
@@ -53,12 +49,12 @@ class PushupCounter:
             self.last_feedback_spoken = message
             self.last_feedback_time = current_time
             self.last_audio_time = current_time
-            print(f"Audio set: '{message}' at time {current_time}")
+            logger.debug("Push-up audio set: %r at %.2f", message, current_time)
         else:
             self.should_speak = False
             self.audio_message = ""
 
-    def check_form_and_give_feedback(self, landmarks):
+    def check_form_and_give_feedback(self, landmarks, angles):
         """Analyze push-up form and provide specific feedback"""
         try:
             # Use right side landmarks
@@ -70,11 +66,11 @@ class PushupCounter:
             ankle = [landmarks[28].x, landmarks[28].y]
 
             # Calculate angles
-            elbow_angle = calculate_angle(shoulder, elbow, wrist)
-            body_angle = calculate_angle(shoulder, hip, ankle)
-            hip_angle = calculate_angle(shoulder, hip, knee)
+            elbow_angle = angles['right_elbow']
+            body_angle = angles['right_body']
+            hip_angle = angles['right_hip']
             
-            current_time = time.time()
+            current_time = self.now
             
             # Check body alignment
             body_straight = body_angle > 165
@@ -169,8 +165,22 @@ class PushupCounter:
         except (IndexError, TypeError):
             return "Adjust your position so I can see all landmarks clearly"
 
-    def process_frame(self, landmarks, frame):
-        """Process frame with comprehensive feedback"""
+    def update(self, landmarks, timestamp=None):
+        """Advance the push-up state machine and feedback for one frame (no drawing).
+
+        `timestamp` is the frame's capture time in seconds; without it the
+        counter's clock is read.
+        """
+        self.now = self.clock() if timestamp is None else timestamp
+        if self.stage_entry_time is None:
+            self.stage_entry_time = self.now
+
+        # Joint angles are computed once and shared by the analysis and the overlay
+        try:
+            angles = landmark_angles(landmarks, ('right_elbow', 'right_body', 'right_hip'))
+        except (IndexError, TypeError, AttributeError):
+            angles = None
+
         # Check for full body visibility
         required_landmarks = [12, 14, 16, 24, 26, 28]  # Right shoulder, elbow, wrist, hip, knee, ankle
         self.is_full_body_visible = all(landmarks[i].visibility > 0.7 for i in required_landmarks)
@@ -180,22 +190,22 @@ class PushupCounter:
             self.set_audio_feedback("Move back so I can see your full body")
         else:
             # Get detailed form feedback
-            self.feedback = self.check_form_and_give_feedback(landmarks)
+            self.feedback = self.check_form_and_give_feedback(landmarks, angles)
 
-        # Calculate angles for display
-        try:
-            shoulder = [landmarks[12].x, landmarks[12].y]
-            elbow = [landmarks[14].x, landmarks[14].y]
-            wrist = [landmarks[16].x, landmarks[16].y]
-            hip = [landmarks[24].x, landmarks[24].y]
-            ankle = [landmarks[28].x, landmarks[28].y]
-            
-            elbow_angle = calculate_angle(shoulder, elbow, wrist)
-            body_angle = calculate_angle(shoulder, hip, ankle)
-            
-        except (IndexError, TypeError):
-            elbow_angle = 0
-            body_angle = 0
+        # Remember the angles the overlay shows
+        if angles is not None:
+            self.elbow_angle = angles['right_elbow']
+            self.body_angle = angles['right_body']
+        else:
+            self.elbow_angle = 0
+            self.body_angle = 0
+
+        return self.feedback
+
+    def draw(self, frame):
+        """Draw the coaching overlay for the last update() onto `frame`"""
+        elbow_angle = self.elbow_angle
+        body_angle = self.body_angle
 
         # Color-code feedback based on content
         feedback_color = (0, 255, 0)  # Green for good
@@ -234,4 +244,9 @@ class PushupCounter:
         cv2.putText(frame, f'Elbow: {int(elbow_angle)}°', (10, 220), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1, cv2.LINE_AA)
         cv2.putText(frame, f'Body: {int(body_angle)}°', (150, 220), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1, cv2.LINE_AA)
 
-        return frame
\ No newline at end of file
+        return frame
+
+    def process_frame(self, landmarks, frame, timestamp=None):
+        """Process frame with comprehensive feedback"""
+        self.update(landmarks, timestamp)
+        return self.draw(frame)
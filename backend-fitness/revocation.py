@@ -0,0 +1,200 @@
+import datetime
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from db import get_connection
+from logs import get_logger
+
+logger = get_logger('revocation')
+
+# Sized for the revoked-but-unexpired tokens of a busy day; the filter is
+# rebuilt from the database once more than this many have been added.
+REVOCATION_FILTER_CAPACITY = 100_000
+REVOCATION_FALSE_POSITIVE_RATE = 0.001
+# Logouts handled by other worker processes are picked up this often.
+REVOCATION_REFRESH_SECONDS = 15
+# revoked_at is stamped when the INSERT runs, not when it commits, so a
+# logout that waited on the database lock can become visible with a
+# timestamp older than the previous refresh. Each refresh re-reads this far
+# back, comfortably more than the connection busy timeout.
+REVOCATION_REFRESH_OVERLAP_SECONDS = 30
+# Database answers for filter hits, so a false positive costs one query per token.
+REVOCATION_CONFIRMED_ENTRIES = 1024
+
+
+class BloomFilter:
+    """Bit-array membership test over token hashes.
+
+    Keys are hex SHA-256 digests, which are already uniformly distributed, so
+    the probe positions come straight from the digest (double hashing)
+    instead of hashing again.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.probes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        h1 = int(key[:16], 16)
+        h2 = int(key[16:32], 16) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.probes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationList:
+    """Which token hashes have been logged out.
+
+    Revocations live in the revoked_tokens table, keyed by token hash, so a
+    logout holds whether or not a session row was ever written for the token.
+    A negative filter answer is final, and is the common case. A positive one
+    is confirmed against revoked_tokens and the answer kept, so only the first
+    request with a given false positive pays for the query. The filter is loaded on
+    first use and refreshed incrementally from revoked_at.
+    """
+
+    def __init__(self, capacity=REVOCATION_FILTER_CAPACITY,
+                 error_rate=REVOCATION_FALSE_POSITIVE_RATE,
+                 refresh_seconds=REVOCATION_REFRESH_SECONDS):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_seconds = refresh_seconds
+        self._filter = None
+        self._confirmed = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._since = None
+        self.lookups = 0
+        self.filter_hits = 0
+        self.db_checks = 0
+        self.refreshes = 0
+
+    def load(self):
+        """Rebuild the filter from every revoked, unexpired token."""
+        now = datetime.datetime.utcnow()
+        with get_connection() as conn:
+            rows = conn.execute('''
+                SELECT token_hash FROM revoked_tokens
+                WHERE expires_at > ?
+            ''', (now,)).fetchall()
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for (key,) in rows:
+            bloom.add(key)
+        with self._lock:
+            self._filter = bloom
+            self._confirmed.clear()
+            self._since = self._watermark(now)
+            self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    def refresh(self):
+        """Add tokens revoked (by any process) since the last load or refresh."""
+        if self._filter is None or self._filter.count > self._filter.capacity:
+            self.load()
+            return
+        now = datetime.datetime.utcnow()
+        with get_connection() as conn:
+            # The window overlaps the previous one; keys already in the filter
+            # are skipped so its count stays a count of distinct tokens.
+            rows = conn.execute('''
+                SELECT token_hash FROM revoked_tokens
+                WHERE revoked_at >= ?
+            ''', (self._since,)).fetchall()
+        with self._lock:
+            for (key,) in rows:
+                if key not in self._filter:
+                    self._filter.add(key)
+                if self._confirmed.get(key) is False:
+                    del self._confirmed[key]
+            self._since = self._watermark(now)
+            self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    @staticmethod
+    def _watermark(now):
+        since = now - datetime.timedelta(seconds=REVOCATION_REFRESH_OVERLAP_SECONDS)
+        return since.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _maybe_refresh(self):
+        if self._filter is not None and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+        # One request thread refreshes; the rest keep using the current filter.
+        if not self._refresh_lock.acquire(blocking=self._filter is None):
+            return
+        try:
+            if self._filter is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+                self.refresh()
+        except sqlite3.Error as e:
+            logger.error("Error refreshing revoked tokens: %s", e)
+        finally:
+            self._refresh_lock.release()
+
+    def revoke(self, key):
+        """Record a logout handled by this process."""
+        self._maybe_refresh()
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(key)
+            self._remember(key, True)
+
+    def _remember(self, key, revoked):
+        self._confirmed[key] = revoked
+        self._confirmed.move_to_end(key)
+        while len(self._confirmed) > REVOCATION_CONFIRMED_ENTRIES:
+            self._confirmed.popitem(last=False)
+
+    def is_revoked(self, key):
+        self._maybe_refresh()
+        self.lookups += 1
+        with self._lock:
+            if self._filter is None or key not in self._filter:
+                return False
+            self.filter_hits += 1
+            confirmed = self._confirmed.get(key)
+        if confirmed is not None:
+            return confirmed
+
+        self.db_checks += 1
+        try:
+            with get_connection() as conn:
+                row = conn.execute('''
+                    SELECT 1 FROM revoked_tokens
+                    WHERE token_hash = ?
+                ''', (key,)).fetchone()
+        except sqlite3.Error as e:
+            # The filter said revoked; without a database answer, believe it.
+            logger.error("Error checking revoked token: %s", e)
+            return True
+        with self._lock:
+            self._remember(key, row is not None)
+        return row is not None
+
+    def stats(self):
+        with self._lock:
+            bloom = self._filter
+            return {
+                'revoked_tokens': bloom.count if bloom else 0,
+                'filter_bits': bloom.size if bloom else 0,
+                'filter_probes': bloom.probes if bloom else 0,
+                'lookups': self.lookups,
+                'filter_hits': self.filter_hits,
+                'db_checks': self.db_checks,
+                'refreshes': self.refreshes,
+            }
+
+
+revocations = RevocationList()
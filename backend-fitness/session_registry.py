@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import OrderedDict
+
+from logs import get_logger
+
+logger = get_logger('sessions')
+
+# Defaults sized for a single server process with a few hundred active users.
+# Each counter is a handful of Python attributes, so the session cap is what
+# bounds memory; idle sessions are dropped after the TTL even below the cap.
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_SESSION_TTL_SECONDS = 30 * 60
+DEFAULT_SESSION_ID = 'default'
+# A frame that overtakes its predecessor (seq - 1) waits this long for it
+# before running anyway; the predecessor is then dropped when it arrives.
+REORDER_WAIT_SECONDS = 0.25
+
+
+class StaleFrame(Exception):
+    """A frame older than one its session has already processed."""
+
+
+class ExerciseSession:
+    """State for one user's workout session: counters are created on first use."""
+
+    def __init__(self, user_id, session_id):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.counters = {}
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+        # Counter updates for one session run one at a time, in frame order.
+        self.frame_lock = threading.Condition()
+        self.last_seq = None
+        self.last_frame_time = None
+        self.capture_offset = None
+        self.stale_frames = 0
+
+    def frame_time(self, capture_ts):
+        """Map a client capture timestamp (milliseconds) onto the server clock.
+
+        The offset is fixed by the session's first timestamped frame, so the
+        client clock only has to be steady, not in sync with the server.
+        """
+        if capture_ts is None:
+            return None
+        seconds = capture_ts / 1000.0
+        if self.capture_offset is None:
+            self.capture_offset = time.time() - seconds
+        return seconds + self.capture_offset
+
+
+class FrameOrder:
+    """Context manager holding a session's frame lock around one counter update.
+
+    Frames carrying a sequence number run in order: one that arrives ahead of
+    seq - 1 waits up to REORDER_WAIT_SECONDS for it, and one at or below the
+    last processed seq raises StaleFrame. Without a seq, a capture timestamp
+    older than the last one is stale. Inside the block, `timestamp` is the
+    frame's capture time in server seconds (None to use the counter's clock).
+    With no session there is nothing to order and the lock is skipped.
+    """
+
+    def __init__(self, session=None, seq=None, capture_ts=None, wait=REORDER_WAIT_SECONDS):
+        self.session = session
+        self.seq = seq
+        self.capture_ts = capture_ts
+        self.wait = wait
+        self.timestamp = None
+
+    def __enter__(self):
+        session = self.session
+        if session is None:
+            return self
+        session.frame_lock.acquire()
+        try:
+            self._check(session)
+            self.timestamp = session.frame_time(self.capture_ts)
+            if (self.seq is None and self.timestamp is not None
+                    and session.last_frame_time is not None and self.timestamp < session.last_frame_time):
+                session.stale_frames += 1
+                raise StaleFrame(f"Frame captured before the last processed frame of session {session.session_id}")
+        except BaseException:
+            session.frame_lock.release()
+            raise
+        return self
+
+    def _check(self, session):
+        if self.seq is None or session.last_seq is None:
+            return
+        deadline = time.monotonic() + self.wait
+        while self.seq > session.last_seq + 1:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            session.frame_lock.wait(remaining)
+        if self.seq <= session.last_seq:
+            session.stale_frames += 1
+            raise StaleFrame(f"Frame {self.seq} is older than frame {session.last_seq}")
+
+    def __exit__(self, exc_type, exc, tb):
+        session = self.session
+        if session is None:
+            return False
+        if self.seq is not None:
+            session.last_seq = self.seq
+        if self.timestamp is not None:
+            session.last_frame_time = max(self.timestamp, session.last_frame_time or self.timestamp)
+        session.frame_lock.notify_all()
+        session.frame_lock.release()
+        return False
+
+
+class SessionRegistry:
+    """Per-(user, session) counter store with LRU + TTL eviction.
+
+    `factories` maps an exercise name to a zero-argument callable that builds a
+    fresh counter, e.g. {'squats': SquatCounter}. `on_end`, if given, is
+    called with each session that is evicted or ended, outside the lock.
+    """
+
+    def __init__(self, factories, max_sessions=DEFAULT_MAX_SESSIONS,
+                 ttl_seconds=DEFAULT_SESSION_TTL_SECONDS, on_end=None):
+        self.factories = dict(factories)
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.on_end = on_end
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _evict_expired(self, now, ended):
+        """Drop sessions idle longer than the TTL (oldest are at the front)."""
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.ttl_seconds:
+                break
+            del self._sessions[key]
+            self.evictions += 1
+            ended.append(session)
+
+    def _notify(self, ended):
+        if self.on_end is None:
+            return
+        for session in ended:
+            try:
+                self.on_end(session)
+            except Exception as e:
+                logger.error("Session end hook failed: %s", e)
+
+    def get_session(self, user_id, session_id=None):
+        """Return the session for (user_id, session_id), creating it if needed."""
+        key = (user_id, session_id or DEFAULT_SESSION_ID)
+        now = time.time()
+        ended = []
+        with self._lock:
+            self._evict_expired(now, ended)
+            session = self._sessions.get(key)
+            if session is None:
+                session = ExerciseSession(*key)
+                self._sessions[key] = session
+                while len(self._sessions) > self.max_sessions:
+                    ended.append(self._sessions.popitem(last=False)[1])
+                    self.evictions += 1
+            else:
+                self._sessions.move_to_end(key)
+            session.last_seen = now
+        self._notify(ended)
+        return session
+
+    def get_counter(self, user_id, session_id, exercise):
+        """Return the counter for an exercise within a session, creating it lazily."""
+        factory = self.factories.get(exercise)
+        if factory is None:
+            raise KeyError(f"Unknown exercise type: {exercise}")
+        session = self.get_session(user_id, session_id)
+        counter = session.counters.get(exercise)
+        if counter is None:
+            counter = session.counters.setdefault(exercise, factory())
+        return counter
+
+    def end_session(self, user_id, session_id=None):
+        """Forget a session explicitly (e.g. when the user leaves the page)."""
+        with self._lock:
+            session = self._sessions.pop((user_id, session_id or DEFAULT_SESSION_ID), None)
+        if session is None:
+            return False
+        self._notify([session])
+        return True
+
+    def size(self):
+        """Number of live sessions after expiring idle ones."""
+        ended = []
+        with self._lock:
+            self._evict_expired(time.time(), ended)
+            size = len(self._sessions)
+        self._notify(ended)
+        return size
+
+    def stats(self):
+        """Summary used by the /api/session_stats endpoint."""
+        ended = []
+        with self._lock:
+            self._evict_expired(time.time(), ended)
+            stats = {
+                'sessions': len(self._sessions),
+                'counters': sum(len(s.counters) for s in self._sessions.values()),
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl_seconds,
+                'evictions': self.evictions,
+                'stale_frames': sum(s.stale_frames for s in self._sessions.values()),
+            }
+        self._notify(ended)
+        return stats
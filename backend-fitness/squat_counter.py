@@ -1,27 +1,23 @@
 import cv2
-import numpy as np
 import time
 
-def calculate_angle(a, b, c):
-    """Calculates the angle between three points (A, B, C) with B as the vertex."""
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
+from geometry import landmark_angles
+from logs import get_logger
 
-    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-    angle = np.abs(radians * 180.0 / np.pi)
-
-    if angle > 180.0:
-        angle = 360 - angle
-
-    return angle
+logger = get_logger('counters')
 
 class SquatCounter:
-    def __init__(self):
+    def __init__(self, clock=time.time):
+        # Time source for frames that arrive without a capture timestamp;
+        # self.now is the time of the frame being processed.
+        self.clock = clock
+        self.now = clock()
         self.counter = 0
         self.stage = "up"
         self.feedback = "Stand straight to start"
-        self.stage_entry_time = time.time()
+        self.stage_entry_time = None  # Set by the first frame
+        self.knee_angle = 0
+        self.is_hip_below_knee = False
         
         # Audio feedback tracking (for frontend)
         self.should_speak = False  # Flag to indicate when audio should be played
@@ -35,7 +31,7 @@ class SquatCounter:
 
     def set_audio_feedback(self, message):
         """Set audio feedback to be played by frontend"""
-        current_time = time.time()
+        current_time = self.now
         
         # Rate limiting: minimum interval between audio messages
         if current_time - self.last_audio_time < self.min_audio_interval:
@@ -50,12 +46,12 @@ class SquatCounter:
             self.last_feedback_spoken = message
             self.last_feedback_time = current_time
             self.last_audio_time = current_time
-            print(f"Audio set: '{message}' at time {current_time}")
+            logger.debug("Squat audio set: %r at %.2f", message, current_time)
         else:
             self.should_speak = False
             self.audio_message = ""
 
-    def analyze_squat_form(self, landmarks):
+    def analyze_squat_form(self, landmarks, angles):
         """Comprehensive squat form analysis with specific feedback"""
         try:
             # Use right side landmarks (more commonly visible)
@@ -65,14 +61,14 @@ class SquatCounter:
             shoulder = [landmarks[12].x, landmarks[12].y]
             
             # Calculate key angles and positions
-            knee_angle = calculate_angle(hip, knee, ankle)
+            knee_angle = angles['right_knee']
             is_hip_below_knee = hip[1] > knee[1]
             
             # Check body alignment
             knee_alignment = abs(knee[0] - ankle[0])  # Knees over toes
             back_straight = abs(shoulder[0] - hip[0]) < 0.1  # Back alignment
             
-            current_time = time.time()
+            current_time = self.now
             stage_time = current_time - self.stage_entry_time
             
             # Reset audio flag at start of each frame
@@ -161,8 +157,22 @@ class SquatCounter:
         except (IndexError, TypeError):
             return "Adjust your position so I can see all landmarks"
 
-    def process_frame(self, landmarks, frame):
-        """Process frame with comprehensive squat coaching"""
+    def update(self, landmarks, timestamp=None):
+        """Advance the squat state machine and feedback for one frame (no drawing).
+
+        `timestamp` is the frame's capture time in seconds; without it the
+        counter's clock is read.
+        """
+        self.now = self.clock() if timestamp is None else timestamp
+        if self.stage_entry_time is None:
+            self.stage_entry_time = self.now
+
+        # Joint angles are computed once and shared by the analysis and the overlay
+        try:
+            angles = landmark_angles(landmarks, ('right_knee',))
+        except (IndexError, TypeError, AttributeError):
+            angles = None
+
         # Check full body visibility
         required_landmarks = [24, 26, 28, 12, 14, 16] 
         is_full_body_visible = all(landmarks[i].visibility > 0.7 for i in required_landmarks)
@@ -172,20 +182,22 @@ class SquatCounter:
             self.set_audio_feedback(self.feedback)
         else:
             # Get detailed form analysis
-            self.feedback = self.analyze_squat_form(landmarks)
+            self.feedback = self.analyze_squat_form(landmarks, angles)
 
-        # Calculate angles for display
-        try:
-            hip = [landmarks[24].x, landmarks[24].y]
-            knee = [landmarks[26].x, landmarks[26].y]
-            ankle = [landmarks[28].x, landmarks[28].y]
-            
-            knee_angle = calculate_angle(hip, knee, ankle)
-            is_hip_below_knee = hip[1] > knee[1]
-            
-        except (IndexError, TypeError):
-            knee_angle = 0
-            is_hip_below_knee = False
+        # Remember the metrics the overlay shows
+        if angles is not None:
+            self.knee_angle = angles['right_knee']
+            self.is_hip_below_knee = landmarks[24].y > landmarks[26].y
+        else:
+            self.knee_angle = 0
+            self.is_hip_below_knee = False
+
+        return self.feedback
+
+    def draw(self, frame):
+        """Draw the coaching overlay for the last update() onto `frame`"""
+        knee_angle = self.knee_angle
+        is_hip_below_knee = self.is_hip_below_knee
 
         # Color-code feedback based on content
         feedback_color = (0, 255, 0)  # Green for good
@@ -228,4 +240,9 @@ class SquatCounter:
             depth_progress = max(0, min(100, int((160 - knee_angle) / 60 * 100)))
             cv2.putText(frame, f'Depth: {depth_progress}%', (200, 220), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1, cv2.LINE_AA)
 
-        return frame
\ No newline at end of file
+        return frame
+
+    def process_frame(self, landmarks, frame, timestamp=None):
+        """Process frame with comprehensive squat coaching"""
+        self.update(landmarks, timestamp)
+        return self.draw(frame)
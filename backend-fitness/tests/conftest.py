@@ -0,0 +1,42 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The database in the tree is the oldest schema the migrations must handle.
+CHECKED_IN_DB = os.path.join(BACKEND_DIR, 'fitness_tracker.db')
+
+# auth creates its JWT key file and the default database in the working
+# directory on import, so tests run from a scratch one.
+os.chdir(tempfile.mkdtemp(prefix='fitness-tests-'))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A migrated copy of the checked-in database behind db.get_connection()."""
+    import auth
+    from identity_cache import IdentityCache
+    from revocation import RevocationList
+
+    path = tmp_path / 'fitness_tracker.db'
+    shutil.copy(CHECKED_IN_DB, path)
+    pool = db.ConnectionPool(str(path))
+    monkeypatch.setattr(db, 'pool', pool)
+    # Fresh per-process state, in every module that imported it by name.
+    cache, revocations = IdentityCache(), RevocationList()
+    for name in ('identity_cache', 'revocation', 'auth', 'app'):
+        module = sys.modules.get(name)
+        if hasattr(module, 'identity_cache'):
+            monkeypatch.setattr(module, 'identity_cache', cache)
+        if hasattr(module, 'revocations'):
+            monkeypatch.setattr(module, 'revocations', revocations)
+    auth.init_db()
+    yield path
+    pool.close_all()
@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+import pytest
+
+app = pytest.importorskip('app')
+
+
+def _jpeg(width, height, value, **params):
+    image = np.full((height, width, 3), value, np.uint8)
+    cv2.circle(image, (width // 2, height // 2), min(width, height) // 3, (255 - value, 40, 90), -1)
+    flags = [cv2.IMWRITE_JPEG_PROGRESSIVE, 1] if params.get('progressive') else []
+    return cv2.imencode('.jpg', image, flags)[1].tobytes()
+
+
+def _with_exif_thumbnail(jpeg, thumbnail):
+    """Insert an APP1 segment holding a whole JPEG, as cameras do for EXIF thumbnails."""
+    payload = b'Exif\x00\x00' + thumbnail
+    app1 = b'\xff\xe1' + (len(payload) + 2).to_bytes(2, 'big') + payload
+    return jpeg[:2] + app1 + jpeg[2:]
+
+
+def test_split_mjpeg_keeps_embedded_thumbnails_inside_their_frame():
+    frames = [_with_exif_thumbnail(_jpeg(320, 240, v), _jpeg(32, 24, 255 - v)) for v in (40, 120, 200)]
+    images = app.split_mjpeg(b''.join(frames))
+    assert [bytes(image) for image in images] == frames
+    assert all(cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR).shape == (240, 320, 3)
+               for image in images)
+
+
+def test_split_mjpeg_handles_progressive_and_truncated_frames():
+    progressive = _jpeg(320, 240, 90, progressive=True)
+    last = _jpeg(320, 240, 160)
+    images = app.split_mjpeg(progressive + last[:len(last) // 2])
+    assert len(images) == 2
+    assert bytes(images[0]) == progressive
+    assert bytes(images[1]) == last[:len(last) // 2]
+
+
+def test_undecodable_burst_frames_reach_the_cue(database):
+    results, cue = app.apply_landmarks(1, 'burst', 'araimandi', [app._UNDECODED], seq=1)
+    assert results == [{'seq': 1, 'feedback': "Unable to process image"}]
+    assert cue == app._unable_to_process()
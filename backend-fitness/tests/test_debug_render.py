@@ -0,0 +1,31 @@
+import cv2
+import numpy as np
+import pytest
+
+import auth
+
+app = pytest.importorskip('app')
+
+
+def test_debug_render_never_records_progress(database, monkeypatch):
+    from pose_engine import pose_engine
+    from workout import workout_sessions
+
+    user = auth.create_user('render@example.com', 'secret123')
+    token = auth.generate_jwt_token(user['user_id'], 'render@example.com')
+    calls = []
+    monkeypatch.setattr(app, 'DEBUG_RENDER_ENABLED', True)
+    monkeypatch.setattr(pose_engine, 'detect', lambda frame, exercise, timeout=None: None)
+    monkeypatch.setattr(app.exercise_logger, 'record', lambda *args: calls.append(('record', args)))
+    monkeypatch.setattr(app, 'complete_daily_challenge', lambda *args: calls.append(('challenge', args)))
+    # Reps already on the debug session would be logged by a recording frame.
+    workout_sessions.get_counter(user['user_id'], 'debug-render', 'squats').counter = 3
+
+    image = cv2.imencode('.jpg', np.full((240, 320, 3), 127, np.uint8))[1].tobytes()
+    response = app.app.test_client().post(
+        '/debug/render_frame?exercise=squats&is_challenge=true', data=image,
+        headers={'Authorization': f'Bearer {token}', 'Content-Type': 'image/jpeg'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+    assert calls == []
@@ -0,0 +1,85 @@
+import datetime
+
+import pytest
+
+import db
+from exercise_log import ExerciseLogWriter
+
+MONDAY = datetime.date(2026, 3, 2)
+TUESDAY = MONDAY + datetime.timedelta(days=1)
+
+
+@pytest.fixture
+def writer(database):
+    # The timer thread never fires during a test; flushes are explicit.
+    writer = ExerciseLogWriter(interval=3600)
+    yield writer
+    writer.close()
+
+
+def _logs():
+    with db.get_connection() as conn:
+        return conn.execute('''
+            SELECT session_id, exercise_type, log_date, reps_count FROM exercise_logs
+            ORDER BY log_date, session_id
+        ''').fetchall()
+
+
+def _progress():
+    with db.get_connection() as conn:
+        return conn.execute('''
+            SELECT log_date, exercise_type, reps_count FROM daily_progress ORDER BY log_date
+        ''').fetchall()
+
+
+def test_one_row_per_session_holding_the_latest_count(writer):
+    for reps in (1, 2, 3):
+        writer.record(1, 'a', 'squats', reps, today=MONDAY)
+    assert writer.flush() == 1
+    writer.record(1, 'a', 'squats', 5, today=MONDAY)
+    writer.record(1, 'b', 'squats', 2, today=MONDAY)
+    writer.flush()
+    assert _logs() == [('a', 'squats', '2026-03-02', 5), ('b', 'squats', '2026-03-02', 2)]
+    assert _progress() == [('2026-03-02', 'squats', 7)]
+
+
+def test_a_session_crossing_midnight_is_split_between_the_days(writer):
+    writer.record(1, 'a', 'squats', 4, today=MONDAY)
+    writer.record(1, 'a', 'squats', 6, today=MONDAY)
+    writer.record(1, 'a', 'squats', 9, today=TUESDAY)
+    writer.flush()
+    assert _logs() == [('a', 'squats', '2026-03-02', 6), ('a', 'squats', '2026-03-03', 3)]
+    assert _progress() == [('2026-03-02', 'squats', 6), ('2026-03-03', 'squats', 3)]
+
+
+def test_the_day_split_survives_a_flush_before_midnight(writer):
+    writer.record(1, 'a', 'pushups', 6, today=MONDAY)
+    writer.flush()
+    writer.record(1, 'a', 'pushups', 10, today=TUESDAY)
+    writer.flush()
+    assert _logs() == [('a', 'pushups', '2026-03-02', 6), ('a', 'pushups', '2026-03-03', 4)]
+
+
+def test_a_resumed_session_adds_to_its_row(writer):
+    writer.record(1, 'a', 'squats', 20, today=MONDAY)
+    writer.flush()
+    # A fresh counter for the same session id (after end_session or eviction) starts at zero.
+    writer.end_session(1, 'a')
+    writer.record(1, 'a', 'squats', 15, today=MONDAY)
+    writer.flush()
+    assert _logs() == [('a', 'squats', '2026-03-02', 35)]
+    assert _progress() == [('2026-03-02', 'squats', 35)]
+
+
+def test_a_counter_reset_without_end_session_is_not_lost(writer):
+    writer.record(1, None, 'squats', 8, today=MONDAY)
+    writer.flush()
+    writer.record(1, None, 'squats', 3, today=MONDAY)
+    writer.flush()
+    assert _logs() == [('default', 'squats', '2026-03-02', 11)]
+
+
+def test_missing_session_id_is_logged_under_the_default_session(writer):
+    writer.record(1, None, 'squats', 2, today=MONDAY)
+    writer.flush()
+    assert _logs() == [('default', 'squats', '2026-03-02', 2)]
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from session_registry import ExerciseSession, FrameOrder, StaleFrame
+
+
+def _run(session, seq=None, capture_ts=None, wait=1.0, log=None):
+    with FrameOrder(session, seq, capture_ts, wait=wait) as order:
+        if log is not None:
+            log.append(seq)
+        return order.timestamp
+
+
+def test_frames_in_order_pass_through():
+    session = ExerciseSession(1, 's')
+    for seq in (1, 2, 3):
+        _run(session, seq)
+    assert session.last_seq == 3
+    assert session.stale_frames == 0
+
+
+def test_a_frame_older_than_the_last_one_is_stale():
+    session = ExerciseSession(1, 's')
+    _run(session, 5)
+    for seq in (5, 4):
+        with pytest.raises(StaleFrame):
+            _run(session, seq)
+    assert session.stale_frames == 2
+    assert session.last_seq == 5
+
+
+def test_a_frame_that_overtakes_its_predecessor_waits_for_it():
+    session = ExerciseSession(1, 's')
+    _run(session, 1)
+    log = []
+    late = threading.Thread(target=_run, args=(session, 3), kwargs={'log': log})
+    late.start()
+    time.sleep(0.05)
+    _run(session, 2, log=log)
+    late.join()
+    assert log == [2, 3]
+
+
+def test_a_missing_predecessor_is_given_up_on():
+    session = ExerciseSession(1, 's')
+    _run(session, 1)
+    started = time.monotonic()
+    _run(session, 3, wait=0.05)
+    assert time.monotonic() - started < 1.0
+    with pytest.raises(StaleFrame):
+        _run(session, 2)
+
+
+def test_capture_timestamps_order_frames_without_seq():
+    session = ExerciseSession(1, 's')
+    first = _run(session, capture_ts=10_000)
+    second = _run(session, capture_ts=10_500)
+    assert second - first == pytest.approx(0.5)
+    with pytest.raises(StaleFrame):
+        _run(session, capture_ts=10_200)
+    assert session.stale_frames == 1
+
+
+def test_an_error_inside_the_block_releases_the_session():
+    session = ExerciseSession(1, 's')
+    with pytest.raises(ValueError):
+        with FrameOrder(session, 1):
+            raise ValueError
+    assert session.last_seq == 1
+    _run(session, 2, wait=0.05)
+    assert session.last_seq == 2
+
+
+def test_without_a_session_there_is_nothing_to_order():
+    with FrameOrder(seq=7, capture_ts=123) as order:
+        assert order.timestamp is None
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+import auth
+
+app = pytest.importorskip('app')
+
+
+class FakeSocket:
+    """Plays scripted client messages; a callable is called to produce its message."""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    def receive(self):
+        message = self.messages.pop(0)
+        if callable(message):
+            message = message()
+        return message
+
+    def send(self, text):
+        self.sent.append(json.loads(text))
+
+
+@pytest.fixture
+def token(database):
+    user = auth.create_user('stream@example.com', 'secret123')
+    token = auth.generate_jwt_token(user['user_id'], 'stream@example.com')
+    auth.create_session(user['user_id'], token)
+    return token
+
+
+def test_logout_closes_an_open_stream(token):
+    def logout_then_frame():
+        auth.invalidate_session(token)
+        return b'\xff\xd8\xff'
+
+    ws = FakeSocket([
+        json.dumps({'type': 'auth', 'token': token}),
+        json.dumps({'type': 'start', 'exercise': 'squats', 'session_id': 's'}),
+        logout_then_frame,
+    ])
+    app.frame_stream(ws)
+    assert [m['type'] for m in ws.sent] == ['auth_ok', 'started', 'error']
+    assert ws.sent[-1]['error'] == 'Token has been revoked'
+    assert not ws.messages
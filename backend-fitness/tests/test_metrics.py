@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from metrics import METRICS_ARCHIVE_FILE, METRICS_STALE_SECONDS, Registry
+
+
+def _registry(directory):
+    registry = Registry(directory=str(directory))
+    registry.counter('demo_requests_total', 'Requests.', ['result'])
+    registry.gauge('demo_sessions', 'Sessions.')
+    return registry
+
+
+def _write(directory, name, requests, sessions=None, age=0):
+    data = {'demo_requests_total': [[['ok'], requests]]}
+    if sessions is not None:
+        data['demo_sessions'] = [[[], sessions]]
+    path = directory / name
+    path.write_text(json.dumps(data))
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_a_recycled_pid_does_not_overwrite_the_dead_process_counters(tmp_path):
+    first = _registry(tmp_path)
+    first._metrics['demo_requests_total'].inc('ok', amount=5)
+    first.write_snapshot()
+    time.sleep(0.01)
+    # A later process that was given the same pid.
+    second = _registry(tmp_path)
+    second._metrics['demo_requests_total'].inc('ok', amount=2)
+    second.write_snapshot()
+
+    assert first._snapshot_path() != second._snapshot_path()
+    assert 'demo_requests_total{result="ok"} 7' in second.render()
+
+
+def test_dead_snapshots_are_folded_into_the_archive(tmp_path):
+    stale = METRICS_STALE_SECONDS + 60
+    _write(tmp_path, METRICS_ARCHIVE_FILE, 3, age=3600)
+    dead = _write(tmp_path, f'metrics-{_dead_pid()}-1.json', 4, sessions=9, age=stale)
+    legacy = _write(tmp_path, f'metrics-{_dead_pid()}.json', 1, age=stale)
+    # Stale but still running (e.g. stalled), so left alone.
+    alive = _write(tmp_path, f'metrics-{os.getpid()}-1.json', 10, age=stale)
+    fresh = _write(tmp_path, f'metrics-{_dead_pid()}-2.json', 20, sessions=1)
+
+    registry = _registry(tmp_path)
+    assert registry.archive_dead_snapshots() == 2
+    assert not dead.exists() and not legacy.exists()
+    assert alive.exists() and fresh.exists()
+    archive = json.loads((tmp_path / METRICS_ARCHIVE_FILE).read_text())
+    assert archive == {'demo_requests_total': [[['ok'], 8]]}
+
+    text = registry.render()
+    assert 'demo_requests_total{result="ok"} 38' in text
+    assert 'demo_sessions 1' in text
+    assert registry.archive_dead_snapshots() == 0
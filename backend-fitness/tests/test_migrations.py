@@ -0,0 +1,76 @@
+import shutil
+import sqlite3
+
+import pytest
+
+import auth
+import db
+from conftest import CHECKED_IN_DB
+from identity_cache import token_hash
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _indexes(conn):
+    return {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%'")}
+
+
+@pytest.fixture
+def checked_in(tmp_path):
+    path = tmp_path / 'checked_in.db'
+    shutil.copy(CHECKED_IN_DB, path)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+def test_checked_in_database_migrates_to_the_latest_version(checked_in):
+    assert auth.run_migrations(checked_in) == auth.MIGRATIONS[-1][0]
+    assert 'token' not in _columns(checked_in, 'user_sessions')
+    assert {'token_hash', 'revoked_at'} <= set(_columns(checked_in, 'user_sessions'))
+    assert _columns(checked_in, 'revoked_tokens') == ['token_hash', 'expires_at', 'revoked_at']
+    assert {'idx_exercise_logs_user_date', 'idx_user_sessions_token_hash', 'idx_exercise_logs_session',
+            'idx_user_sessions_revoked_at', 'idx_revoked_tokens_revoked_at'} <= _indexes(checked_in)
+
+
+def test_migrations_are_idempotent(checked_in):
+    version = auth.run_migrations(checked_in)
+    schema = checked_in.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall()
+    assert auth.run_migrations(checked_in) == version
+    assert checked_in.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall() == schema
+
+
+def test_new_and_upgraded_databases_end_up_alike(checked_in, tmp_path, monkeypatch):
+    auth.run_migrations(checked_in)
+    monkeypatch.setattr(db, 'pool', db.ConnectionPool(str(tmp_path / 'new.db')))
+    auth.init_db()
+    with db.get_connection() as new:
+        assert new.execute('PRAGMA user_version').fetchone()[0] == auth.MIGRATIONS[-1][0]
+        assert _columns(new, 'user_sessions') == _columns(checked_in, 'user_sessions')
+        assert _indexes(new) == _indexes(checked_in)
+    db.pool.close_all()
+
+
+def test_legacy_sessions_keep_their_rows(checked_in):
+    checked_in.execute('''
+        INSERT INTO user_sessions (user_id, token, expires_at, is_active)
+        VALUES (1, 'live', '2999-01-01', TRUE), (1, 'gone', '2999-01-01', FALSE)
+    ''')
+    checked_in.commit()
+    auth.run_migrations(checked_in)
+    rows = checked_in.execute('SELECT token_hash, is_active FROM user_sessions ORDER BY id').fetchall()
+    assert rows == [(token_hash('live'), 1), (token_hash('gone'), 0)]
+    # Sessions logged out before revoked_tokens existed are carried over.
+    assert checked_in.execute('SELECT token_hash FROM revoked_tokens').fetchall() == [(token_hash('gone'),)]
+
+
+def test_logins_write_sessions_on_the_checked_in_database(database):
+    user = auth.create_user('legacy@example.com', 'secret123')
+    token = auth.generate_jwt_token(user['user_id'], 'legacy@example.com')
+    assert auth.create_session(user['user_id'], token)
+    with db.get_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM user_sessions WHERE token_hash = ?',
+                            (token_hash(token),)).fetchone()[0] == 1
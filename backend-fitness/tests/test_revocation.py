@@ -0,0 +1,92 @@
+import datetime
+
+import pytest
+
+import auth
+import db
+from identity_cache import token_hash
+from revocation import BloomFilter, RevocationList
+
+
+def _login(email='dancer@example.com'):
+    """What /register and /login do: a user, a token and its session row."""
+    user = auth.create_user(email, 'secret123')
+    token = auth.generate_jwt_token(user['user_id'], email)
+    auth.create_session(user['user_id'], token)
+    return token
+
+
+def test_logout_rejects_the_token(database):
+    token = _login()
+    assert auth.authenticate_token(token)
+    auth.invalidate_session(token)
+    assert auth.authenticate_token(token) is None
+
+
+def test_logout_survives_a_filter_rebuild(database):
+    token = _login()
+    auth.invalidate_session(token)
+    auth.revocations.load()
+    assert auth.authenticate_token(token) is None
+
+
+def test_logout_is_seen_by_another_process(database):
+    token = _login()
+    auth.invalidate_session(token)
+    assert RevocationList().is_revoked(token_hash(token))
+
+
+def test_logout_without_a_session_row(database):
+    user = auth.create_user('nosession@example.com', 'secret123')
+    token = auth.generate_jwt_token(user['user_id'], 'nosession@example.com')
+    auth.invalidate_session(token)
+    assert RevocationList().is_revoked(token_hash(token))
+
+
+def test_other_tokens_stay_valid(database):
+    token = _login()
+    other = _login('other@example.com')
+    auth.invalidate_session(token)
+    auth.revocations.load()
+    assert auth.authenticate_token(other)
+
+
+def test_refresh_sees_a_revocation_committed_after_its_timestamp(database):
+    token = _login()
+    revocations = RevocationList()
+    revocations.refresh()
+    assert not revocations.is_revoked(token_hash(token))
+
+    # Another process stamped revoked_at before this refresh but committed after it.
+    stamped = datetime.datetime.utcnow() - datetime.timedelta(seconds=5)
+    with db.get_connection() as conn:
+        conn.execute('INSERT INTO revoked_tokens (token_hash, expires_at, revoked_at) VALUES (?, ?, ?)',
+                     (token_hash(token), stamped + datetime.timedelta(hours=1),
+                      stamped.strftime('%Y-%m-%d %H:%M:%S')))
+        conn.commit()
+    revocations.refresh()
+    assert revocations.is_revoked(token_hash(token))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    keys = [token_hash(str(i)) for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    misses = sum(token_hash(f'x{i}') in bloom for i in range(10000))
+    assert misses < 300
+
+
+def test_logout_round_trip_over_http(database):
+    app = pytest.importorskip('app')
+    client = app.app.test_client()
+    response = client.post('/register', json={'email': 'http@example.com', 'password': 'secret123',
+                                              're_password': 'secret123'})
+    headers = {'Authorization': f"Bearer {response.get_json()['token']}"}
+    assert client.get('/profile', headers=headers).status_code == 200
+
+    assert client.post('/logout', headers=headers).status_code == 200
+    assert client.get('/profile', headers=headers).status_code == 401
+    auth.revocations.load()
+    assert client.get('/profile', headers=headers).status_code == 401
@@ -0,0 +1,81 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import session_registry
+from session_registry import SessionRegistry
+
+
+class Counter:
+    def __init__(self):
+        self.counter = 0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Wall clock for the registry that only moves when a test says so."""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(session_registry, 'time',
+                        SimpleNamespace(time=lambda: now.value, monotonic=time.monotonic))
+    return now
+
+
+def test_counters_are_per_session_and_lazy():
+    registry = SessionRegistry({'squats': Counter, 'pushups': Counter})
+    a = registry.get_counter(1, 'a', 'squats')
+    assert registry.get_counter(1, 'a', 'squats') is a
+    assert registry.get_counter(1, 'b', 'squats') is not a
+    assert registry.get_counter(2, 'a', 'squats') is not a
+    assert registry.get_session(1, 'a').counters == {'squats': a}
+    with pytest.raises(KeyError):
+        registry.get_counter(1, 'a', 'lunges')
+
+
+def test_missing_session_id_uses_the_default_session():
+    registry = SessionRegistry({'squats': Counter})
+    assert registry.get_counter(1, None, 'squats') is registry.get_counter(1, 'default', 'squats')
+
+
+def test_least_recently_used_session_is_evicted(clock):
+    ended = []
+    registry = SessionRegistry({'squats': Counter}, max_sessions=2, on_end=ended.append)
+    first = registry.get_session(1, 'a')
+    registry.get_session(1, 'b')
+    registry.get_session(1, 'a')  # 'b' is now the least recently used
+    registry.get_session(1, 'c')
+    assert [s.session_id for s in ended] == ['b']
+    assert registry.get_session(1, 'a') is first
+    assert registry.stats()['evictions'] == 1
+
+
+def test_idle_sessions_expire_after_the_ttl(clock):
+    ended = []
+    registry = SessionRegistry({'squats': Counter}, ttl_seconds=60, on_end=ended.append)
+    registry.get_session(1, 'idle')
+    clock.value += 30
+    registry.get_session(1, 'active')
+    clock.value += 45
+    assert registry.size() == 1
+    assert [s.session_id for s in ended] == ['idle']
+    clock.value += 61
+    assert registry.stats()['sessions'] == 0
+
+
+def test_end_session_runs_the_hook_once():
+    ended = []
+    registry = SessionRegistry({'squats': Counter}, on_end=ended.append)
+    registry.get_session(1, 'a')
+    assert registry.end_session(1, 'a')
+    assert not registry.end_session(1, 'a')
+    assert len(ended) == 1
+
+
+def test_a_failing_hook_does_not_break_the_registry():
+    def on_end(session):
+        raise RuntimeError('boom')
+
+    registry = SessionRegistry({'squats': Counter}, max_sessions=1, on_end=on_end)
+    registry.get_session(1, 'a')
+    registry.get_session(1, 'b')
+    assert registry.size() == 1
@@ -0,0 +1,56 @@
+import threading
+
+from session_registry import ExerciseSession, FrameOrder
+import workout
+
+
+class ScriptedCounter:
+    """Speaks 'cue <n>' on every frame it is updated with."""
+
+    def __init__(self):
+        self.counter = 0
+        self.feedback = ''
+        self.should_speak = False
+        self.audio_message = ''
+
+    def update(self, landmarks, timestamp=None):
+        self.counter += 1
+        self.feedback = f'frame {self.counter}'
+        self.should_speak = True
+        self.audio_message = f'cue {self.counter}'
+
+
+def test_cue_is_read_with_its_own_frame():
+    session = ExerciseSession(1, 's')
+    counter = ScriptedCounter()
+    first = workout.update_squat(['pose'], counter, FrameOrder(session, seq=1))
+    workout.update_squat(['pose'], counter, FrameOrder(session, seq=2))
+    assert first == {'feedback': 'Squats: 1 - frame 1', 'audio_message': 'cue 1', 'should_speak': True}
+
+
+def test_concurrent_frames_keep_their_own_cues():
+    session = ExerciseSession(1, 's')
+    counter = ScriptedCounter()
+    results = {}
+
+    def send(seq):
+        results[seq] = workout.update_pushup(['pose'], counter, FrameOrder(session, seq=seq))
+
+    threads = [threading.Thread(target=send, args=(seq,)) for seq in range(1, 21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for result in results.values():
+        # Whatever order the frames ran in, each response carries the cue
+        # of the update that produced its feedback.
+        n = result['feedback'].split()[-1]
+        assert result['audio_message'] == f'cue {n}'
+
+
+def test_no_body_does_not_repeat_the_last_cue():
+    counter = ScriptedCounter()
+    workout.update_squat(['pose'], counter)
+    result = workout.update_squat(None, counter)
+    assert result['should_speak'] is False
+    assert result['audio_message'] == ''
@@ -0,0 +1,125 @@
+import contextvars
+import os
+import time
+from functools import wraps
+
+from flask import make_response
+
+from logs import get_logger
+
+logger = get_logger('timing')
+
+# SERVER_TIMING=1 adds the per-stage header; TIMING_LOG=1 logs one line per
+# request (JSON with LOG_FORMAT=json). With both off (the default) the frame
+# endpoints are left undecorated. The stages show auth and cache behaviour,
+# so the header is off unless asked for, and other origins can only read it
+# from the Resource Timing API if listed in SERVER_TIMING_ORIGIN (e.g. the
+# frontend's dev server origin).
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING', '0') == '1'
+SERVER_TIMING_ORIGIN = os.environ.get('SERVER_TIMING_ORIGIN')
+TIMING_LOG_ENABLED = os.environ.get('TIMING_LOG', '0') == '1'
+
+# The timer of the request being handled on this thread, or None.
+_current_timer = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Milliseconds spent per named stage within one request.
+
+    A stage entered more than once (e.g. two DB writes) accumulates.
+    """
+
+    __slots__ = ('route', 'started', 'stages')
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, name, ms):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms):
+        """Format the stages as a Server-Timing header value."""
+        parts = [f"{name};dur={ms:.2f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ', '.join(parts)
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'started')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.add(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """Time a block as `name` if the current request is being timed.
+
+    Outside a timed request (the WebSocket stream, CLI commands, a disabled
+    build) this returns a shared no-op context manager.
+    """
+    timer = _current_timer.get()
+    if timer is None:
+        return _NULL_STAGE
+    return _Stage(timer, name)
+
+
+def timed_request(view):
+    """Decorator for frame endpoints: adds a Server-Timing header to the response.
+
+    Apply it above @token_required so authentication is included in the total.
+    """
+    if not (SERVER_TIMING_ENABLED or TIMING_LOG_ENABLED):
+        return view
+
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        timer = RequestTimer(view.__name__)
+        reset_token = _current_timer.set(timer)
+        try:
+            response = make_response(view(*args, **kwargs))
+        finally:
+            _current_timer.reset(reset_token)
+        total_ms = timer.elapsed_ms()
+        if SERVER_TIMING_ENABLED:
+            response.headers['Server-Timing'] = timer.server_timing(total_ms)
+            if SERVER_TIMING_ORIGIN:
+                response.headers['Timing-Allow-Origin'] = SERVER_TIMING_ORIGIN
+        if TIMING_LOG_ENABLED:
+            # One line per request by design, so it bypasses the rate limiter.
+            logger.info("request timing", extra={
+                'route': timer.route,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'stages': {name: round(ms, 2) for name, ms in timer.stages.items()},
+                'rate_limit': False,
+            })
+        return response
+
+    return decorated
@@ -0,0 +1,209 @@
+import ast
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from logs import get_logger
+
+logger = get_logger('tts_cache')
+
+# Spoken cues are short clips (~5-20 KB mp3, somewhat more as wav), so these
+# limits hold every phrase the counters use several times over.
+AUDIO_CACHE_DIR = 'audio_cache'
+MEMORY_CACHE_ENTRIES = 256
+DISK_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Modules whose string literals are spoken to the user.
+COUNTER_MODULES = [
+    'squat_counter.py',
+    'pushup_counter.py',
+    'araimandi_counter.py',
+    'mulumandi_counter.py',
+    'mandia_davu_counter.py',
+    'dance.py',
+]
+
+
+def cache_key(text, lang, voice):
+    """Content address for a clip: the same (text, lang, voice) always maps to one file."""
+    return hashlib.sha256(f"{voice}\0{lang}\0{text}".encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """Two-tier (memory LRU + disk) cache of synthesized speech.
+
+    Disk entries are evicted oldest-access-first once the directory grows
+    past `max_disk_bytes`; reads refresh a file's mtime to mark it as used.
+    """
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_memory_entries=MEMORY_CACHE_ENTRIES,
+                 max_disk_bytes=DISK_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.clip")
+
+    def _remember(self, key, audio_bytes):
+        self._memory[key] = audio_bytes
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, text, lang='en', voice='gtts'):
+        """Return cached audio bytes, or None on a miss."""
+        key = cache_key(text, lang, voice)
+        with self._lock:
+            audio_bytes = self._memory.get(key)
+            if audio_bytes is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                return audio_bytes
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                audio_bytes = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._remember(key, audio_bytes)
+            self.hits += 1
+            self.disk_hits += 1
+        return audio_bytes
+
+    def put(self, text, audio_bytes, lang='en', voice='gtts'):
+        """Store a clip in both tiers."""
+        key = cache_key(text, lang, voice)
+        with self._lock:
+            self._remember(key, audio_bytes)
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial clip.
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(audio_bytes)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning("Audio cache write failed: %s", e)
+            return
+
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(audio_bytes)
+        self._evict_disk()
+
+    def get_or_create(self, text, synthesize, lang='en', voice='gtts'):
+        """Return cached audio, calling synthesize() and caching its bytes on a miss."""
+        audio_bytes = self.get(text, lang, voice)
+        if audio_bytes is None:
+            audio_bytes = synthesize()
+            if audio_bytes:
+                self.put(text, audio_bytes, lang, voice)
+        return audio_bytes
+
+    def _disk_entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith('.clip'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _evict_disk(self):
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+            entries = sorted(self._disk_entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in entries:
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+def _spoken_literals(tree):
+    """Yield string literals that can end up spoken: set_audio_feedback(...)
+    arguments, message/feedback assignments, 'audio_message' dict values and
+    returned feedback strings (including the text half of (ok, text) tuples).
+    f-strings are skipped since their text depends on the count."""
+    def strings(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            yield node.value
+        elif isinstance(node, ast.Tuple):
+            for elt in node.elts:
+                yield from strings(elt)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', '')
+            if name == 'set_audio_feedback':
+                for arg in node.args:
+                    yield from strings(arg)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                name = target.attr if isinstance(target, ast.Attribute) else getattr(target, 'id', '')
+                if name in ('message', 'feedback', 'audio_message'):
+                    yield from strings(node.value)
+        elif isinstance(node, ast.Dict):
+            for key, value in zip(node.keys, node.values):
+                if isinstance(key, ast.Constant) and key.value == 'audio_message':
+                    yield from strings(value)
+        elif isinstance(node, ast.Return) and node.value is not None:
+            yield from strings(node.value)
+
+
+def collect_counter_phrases(base_dir=None):
+    """Every literal phrase in the counter modules, in a stable order."""
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+    phrases = set()
+    for module in COUNTER_MODULES:
+        with open(os.path.join(base_dir, module), encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=module)
+        phrases.update(p.strip() for p in _spoken_literals(tree) if p.strip())
+    return sorted(phrases)
@@ -0,0 +1,145 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Which synthesizer generate_audio_simple_gtts uses: 'gtts' (network),
+# 'pyttsx3' (local SAPI5/NSSpeech/eSpeak driver) or 'espeak' (local CLI).
+TTS_BACKEND = os.environ.get('TTS_BACKEND', 'gtts')
+LOCAL_TTS_TIMEOUT_SECONDS = 5.0
+
+
+class Synthesizer:
+    """Turns text into encoded audio bytes.
+
+    `name` (plus the voice, if any) becomes part of the audio cache key, so
+    switching backends never serves clips recorded by another engine.
+    """
+    name = 'base'
+    mime_type = 'audio/mpeg'
+
+    def synthesize(self, text, lang='en'):
+        raise NotImplementedError
+
+    def is_available(self):
+        return True
+
+
+class GTTSSynthesizer(Synthesizer):
+    """Google Translate TTS; needs network access."""
+    name = 'gtts'
+    mime_type = 'audio/mpeg'
+
+    def synthesize(self, text, lang='en'):
+        from gtts import gTTS
+
+        tts = gTTS(text=text, lang=lang, slow=False)
+        audio_buffer = io.BytesIO()
+        tts.write_to_fp(audio_buffer)
+        return audio_buffer.getvalue()
+
+    def is_available(self):
+        try:
+            import gtts  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+class Pyttsx3Synthesizer(Synthesizer):
+    """Offline synthesis through pyttsx3 (the engine test_speech.py uses).
+
+    pyttsx3 engines are bound to the thread that created them and are not
+    thread-safe, so every call runs on one dedicated worker thread.
+    """
+    name = 'pyttsx3'
+    mime_type = 'audio/wav'
+
+    def __init__(self, rate_delta=-40, voice_index=0):
+        self.rate_delta = rate_delta
+        self.voice_index = voice_index
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pyttsx3')
+        self._engine = None
+
+    def _get_engine(self):
+        if self._engine is None:
+            import pyttsx3
+            engine = pyttsx3.init()
+            voices = engine.getProperty('voices')
+            if voices:
+                engine.setProperty('voice', voices[min(self.voice_index, len(voices) - 1)].id)
+            engine.setProperty('rate', engine.getProperty('rate') + self.rate_delta)
+            self._engine = engine
+        return self._engine
+
+    def _synthesize_on_worker(self, text):
+        engine = self._get_engine()
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        try:
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+            with open(path, 'rb') as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    def synthesize(self, text, lang='en'):
+        future = self._executor.submit(self._synthesize_on_worker, text)
+        return future.result(timeout=LOCAL_TTS_TIMEOUT_SECONDS)
+
+    def is_available(self):
+        try:
+            self._executor.submit(self._get_engine).result(timeout=LOCAL_TTS_TIMEOUT_SECONDS)
+            return True
+        except Exception:
+            return False
+
+
+class EspeakSynthesizer(Synthesizer):
+    """Offline synthesis by running the espeak-ng (or espeak) CLI in a subprocess."""
+    name = 'espeak'
+    mime_type = 'audio/wav'
+
+    def __init__(self, voice='en', speed=150):
+        self.voice = voice
+        self.speed = speed
+        self.binary = shutil.which('espeak-ng') or shutil.which('espeak')
+
+    def synthesize(self, text, lang='en'):
+        if not self.binary:
+            raise RuntimeError("espeak-ng/espeak is not installed")
+        result = subprocess.run(
+            [self.binary, '-v', self.voice or lang, '-s', str(self.speed), '--stdout', text],
+            capture_output=True, timeout=LOCAL_TTS_TIMEOUT_SECONDS, check=True,
+        )
+        return result.stdout
+
+    def is_available(self):
+        return self.binary is not None
+
+
+SYNTHESIZERS = {
+    'gtts': GTTSSynthesizer,
+    'pyttsx3': Pyttsx3Synthesizer,
+    'espeak': EspeakSynthesizer,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_synthesizer(name=None):
+    """Return the shared synthesizer instance for `name` (default: TTS_BACKEND)."""
+    name = name or TTS_BACKEND
+    with _instances_lock:
+        synthesizer = _instances.get(name)
+        if synthesizer is None:
+            if name not in SYNTHESIZERS:
+                raise ValueError(f"Unknown TTS backend: {name}")
+            synthesizer = SYNTHESIZERS[name]()
+            _instances[name] = synthesizer
+        return synthesizer
@@ -1,74 +1,113 @@
-import cv2
-import mediapipe as mp
-import time
 # Import the modified counter classes
 from squat_counter import SquatCounter
 from pushup_counter import PushupCounter
+from session_registry import SessionRegistry, FrameOrder
+from pose_engine import pose_engine, PoseEngineBusy
+from timing import stage
+from metrics import ACTIVE_SESSIONS, POSE_DETECTIONS, POSE_SECONDS
+from exercise_log import exercise_logger
+from logs import get_logger
+
+logger = get_logger('workout')
 
 # --- Global Initializations ---
-# These objects are created only once when the server starts.
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+# Pose estimation uses the shared model in pose_engine.py; per-exercise
+# settings live in pose_engine.POSE_PROFILES.
 
-# Global instances to maintain state (rep counts, etc.)
-squat_counter = SquatCounter()
-pushup_counter = PushupCounter()
+# Counters hold per-user state (rep counts, etc.), so each (user, session)
+# gets its own instances, created the first time that exercise is used.
+# Ending (or evicting) a session writes its pending exercise log rows.
+workout_sessions = SessionRegistry({
+    'squats': SquatCounter,
+    'pushups': PushupCounter,
+}, on_end=lambda session: exercise_logger.end_session(session.user_id, session.session_id))
+ACTIVE_SESSIONS.set_function(workout_sessions.size, 'workout')
 
-def _get_landmarks(frame):
+def _get_landmarks(frame, exercise):
     """Helper function to process a frame and extract landmarks."""
     try:
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-        results = pose.process(image)
-        image.flags.writeable = True
-        if results.pose_landmarks:
-            return results.pose_landmarks.landmark
-        else:
-            return None
+        with stage('pose'), POSE_SECONDS.time(exercise):
+            landmarks = pose_engine.detect(frame, exercise)
+    except PoseEngineBusy:
+        POSE_DETECTIONS.inc(exercise, 'busy')
+        raise
     except Exception as e:
-        print(f"Error in _get_landmarks: {e}")
+        POSE_DETECTIONS.inc(exercise, 'error')
+        logger.error("Pose detection failed for %s: %s", exercise, e)
         return None
+    POSE_DETECTIONS.inc(exercise, 'detected' if landmarks else 'no_pose')
+    return landmarks
+
+def _result(feedback_text, counter=None):
+    """Feedback plus the counter's audio cue; call it inside the frame's FrameOrder
+    so the cue belongs to this frame and not to one processed after it."""
+    should_speak = bool(counter is not None and getattr(counter, 'should_speak', False))
+    return {
+        'feedback': feedback_text,
+        'audio_message': getattr(counter, 'audio_message', '') if should_speak else '',
+        'should_speak': should_speak
+    }
 
 # --- Main Processing Functions for the API ---
 
-def process_squat(frame):
-    """Processes a single frame for the Squat exercise."""
-    landmarks = _get_landmarks(frame)
-    if landmarks:
-        try:
-            # Process frame and get updated feedback
-            _ = squat_counter.process_frame(landmarks, frame)
+def process_squat(frame, squat_counter, order=None):
+    """Processes a single frame for the Squat exercise using the session's counter.
+
+    `order` (a FrameOrder) serializes the counter update, and the reads of the
+    counter's state that follow it, with the session's other frames and
+    supplies the capture time; pose detection runs outside it.
+    """
+    return update_squat(_get_landmarks(frame, 'squats'), squat_counter, order)
+
+def update_squat(landmarks, squat_counter, order=None):
+    """Apply one frame's landmarks (None if no body was found) to the Squat counter."""
+    order = order or FrameOrder()
+    with order:
+        if landmarks:
+            try:
+                # Update the counter (overlay drawing is left to the debug render endpoint)
+                with stage('counter'):
+                    squat_counter.update(landmarks, order.timestamp)
             
-            # Get feedback and count from the counter
-            feedback = getattr(squat_counter, 'feedback', 'Processing...')
-            count = getattr(squat_counter, 'counter', 0)
+                # Get feedback and count from the counter
+                feedback = getattr(squat_counter, 'feedback', 'Processing...')
+                count = getattr(squat_counter, 'counter', 0)
             
-            # Return formatted feedback
-            return f"Squats: {count} - {feedback}"
+                # Return formatted feedback with this frame's audio cue
+                return _result(f"Squats: {count} - {feedback}", squat_counter)
             
-        except Exception as e:
-            print(f"Error in process_squat: {e}")
-            return f"Error processing squat: {str(e)}"
+            except Exception as e:
+                logger.exception("Error in process_squat")
+                return _result(f"Error processing squat: {str(e)}")
         
-    return "No body detected - please step back so your full body is visible"
+        return _result("No body detected - please step back so your full body is visible")
+
+def process_pushup(frame, pushup_counter, order=None):
+    """Processes a single frame for the Push-up exercise; `order` as in process_squat."""
+    return update_pushup(_get_landmarks(frame, 'pushups'), pushup_counter, order)
 
-def process_pushup(frame):
-    """Processes a single frame for the Push-up exercise."""
-    landmarks = _get_landmarks(frame)
-    if landmarks:
-        try:
-            # Process frame and get updated feedback
-            _ = pushup_counter.process_frame(landmarks, frame)
+def update_pushup(landmarks, pushup_counter, order=None):
+    """Apply one frame's landmarks (None if no body was found) to the Push-up counter."""
+    order = order or FrameOrder()
+    with order:
+        if landmarks:
+            try:
+                # Update the counter (overlay drawing is left to the debug render endpoint)
+                with stage('counter'):
+                    pushup_counter.update(landmarks, order.timestamp)
             
-            # Get feedback and count from the counter
-            feedback = getattr(pushup_counter, 'feedback', 'Processing...')
-            count = getattr(pushup_counter, 'counter', 0)
+                # Get feedback and count from the counter
+                feedback = getattr(pushup_counter, 'feedback', 'Processing...')
+                count = getattr(pushup_counter, 'counter', 0)
             
-            # Return formatted feedback
-            return f"Push-ups: {count} - {feedback}"
+                # Return formatted feedback with this frame's audio cue
+                return _result(f"Push-ups: {count} - {feedback}", pushup_counter)
             
-        except Exception as e:
-            print(f"Error in process_pushup: {e}")
-            return f"Error processing pushup: {str(e)}"
+            except Exception as e:
+                logger.exception("Error in process_pushup")
+                return _result(f"Error processing pushup: {str(e)}")
         
-    return "No body detected - please step back so your full body is visible"
\ No newline at end of file
+        return _result("No body detected - please step back so your full body is visible")
+
+# Used by burst uploads, which detect a whole batch of frames before updating.
+LANDMARK_UPDATERS = {'squats': update_squat, 'pushups': update_pushup}
@@ -1,5 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { getAuthToken } from './authUtils';
+import { API_BASE, captureFrameBlob, stampFrame, STALE_FRAME_STATUS, uploadFrame, fetchAudio, openFrameStream, STREAM_INTERVAL_MS, HTTP_INTERVAL_MS } from './frameUtils';
 
 const DANCE_OPTIONS = [
     { label: "Aramandi", value: "araimandi" },
@@ -57,6 +58,13 @@ const Dance = () => {
     const [lastAudioTime, setLastAudioTime] = useState(0); // Rate limiting
     const currentAudio = useRef(null); // Track current playing audio
 
+    // Identifies this page visit so the server keeps separate counters per session
+    const sessionId = useRef(crypto.randomUUID());
+
+    // WebSocket frame stream (falls back to HTTP uploads while it is not connected)
+    const frameStream = useRef(null);
+    const lastHttpFrameTime = useRef(0);
+
     const startCamera = async () => {
         if (navigator.mediaDevices && navigator.mediaDevices.getUserMedia) {
             try {
@@ -77,7 +85,7 @@ const Dance = () => {
         }
 
         try {
-            const response = await fetch('http://127.0.0.1:5000/api/log_dance_completion', {
+            const response = await fetch(`${API_BASE}/api/log_dance_completion`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -101,7 +109,7 @@ const Dance = () => {
     }, []);
 
     // Function to play audio immediately
-    const playAudio = (audioBase64) => {
+    const playAudio = (audioBase64, audioMime = 'audio/mp3') => {
         // Stop any currently playing audio
         if (currentAudio.current) {
             currentAudio.current.pause();
@@ -110,7 +118,7 @@ const Dance = () => {
         
         setIsAudioPlaying(true);
         
-        const audioSrc = `data:audio/mp3;base64,${audioBase64}`;
+        const audioSrc = `data:${audioMime};base64,${audioBase64}`;
         const audio = new Audio(audioSrc);
         currentAudio.current = audio;
         
@@ -138,9 +146,63 @@ const Dance = () => {
         });
     };
 
+    // Play a clip with strict rate limiting
+    const speakClip = (audioBase64, audioMime) => {
+        if (audioBase64 && audioBase64.length > 0 && !isAudioPlaying) {
+            const currentTime = Date.now();
+            const audioHash = audioBase64.substring(0, 50); // Use first 50 chars as hash
+            
+            // Rate limit: minimum 2 seconds between audio, and must be different content
+            if (audioHash !== lastAudioMessage && (currentTime - lastAudioTime) > 2000) {
+                playAudio(audioBase64, audioMime);
+                setLastAudioMessage(audioHash);
+                setLastAudioTime(currentTime);
+            }
+        }
+    };
+
+    const handleFrameResult = (data) => {
+        const { feedback: feedbackText, audio: audioBase64, audio_mime: audioMime, audio_ticket, should_speak } = data;
+        setFeedback(feedbackText);
+        
+        if (feedbackText === "Hold!") {
+            if (!holdStartTime) {
+                setHoldStartTime(Date.now());
+            } else {
+                const elapsedTime = Date.now() - holdStartTime;
+                if (elapsedTime >= 30000) { // 30 seconds
+                    setFeedback("Congratulations! Challenge completed.");
+                    setIsCompleted(true);
+                    logCompletion();
+                }
+            }
+        } else {
+            setHoldStartTime(null);
+        }
+        
+        // Cached clips arrive inline; others are collected by ticket (the stream pushes them itself)
+        if (audioBase64 && audioBase64.length > 0 && should_speak) {
+            speakClip(audioBase64, audioMime);
+        } else if (audio_ticket && should_speak && !data.audio_pushed) {
+            fetchAudio(audio_ticket)
+            .then(clip => speakClip(clip.audio, clip.audio_mime))
+            .catch(error => console.error('Error fetching audio:', error));
+        }
+    };
+
     const sendFrameToServer = () => {
         if (!videoRef.current || !canvasRef.current || !selectedExercise || isCompleted) return;
 
+        // On the stream, wait for the previous frame's feedback before sending the next;
+        // without it, fall back to HTTP uploads at the old pace
+        const stream = frameStream.current;
+        const useStream = stream && stream.ready;
+        if (useStream && stream.inFlight) return;
+        if (!useStream) {
+            if (Date.now() - lastHttpFrameTime.current < HTTP_INTERVAL_MS) return;
+            lastHttpFrameTime.current = Date.now();
+        }
+
         const video = videoRef.current;
         const canvas = canvasRef.current;
         const context = canvas.getContext('2d');
@@ -148,7 +210,13 @@ const Dance = () => {
         canvas.width = video.videoWidth;
         canvas.height = video.videoHeight;
         context.drawImage(video, 0, 0, canvas.width, canvas.height);
-        const imageData = canvas.toDataURL('image/jpeg');
+        const stamp = stampFrame();
+
+        if (useStream) {
+            stream.inFlight = true;
+            captureFrameBlob(canvas).then(blob => stream.sendFrame(blob, stamp));
+            return;
+        }
 
         const token = getAuthToken();
         if (!token) {
@@ -156,55 +224,23 @@ const Dance = () => {
             return;
         }
 
-        fetch('http://127.0.0.1:5000/process_dance_frame', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${token}`,
-            },
-            body: JSON.stringify({
-                exercise: selectedExercise,
-                image: imageData,
-            })
-        })
+        // Send the JPEG bytes directly; the server decodes them without base64/JSON
+        captureFrameBlob(canvas)
+        .then(blob => uploadFrame(blob, {
+            exercise: selectedExercise,
+            sessionId: sessionId.current,
+            token,
+            stamp,
+        }))
         .then(response => {
+            // A newer frame already updated the feedback; skip this one
+            if (response.status === STALE_FRAME_STATUS) return null;
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             return response.json();
         })
-        .then(data => {
-            const { feedback: feedbackText, audio: audioBase64, should_speak } = data;
-            setFeedback(feedbackText);
-            
-            if (feedbackText === "Hold!") {
-                if (!holdStartTime) {
-                    setHoldStartTime(Date.now());
-                } else {
-                    const elapsedTime = Date.now() - holdStartTime;
-                    if (elapsedTime >= 30000) { // 30 seconds
-                        setFeedback("Congratulations! Challenge completed.");
-                        setIsCompleted(true);
-                        logCompletion();
-                    }
-                }
-            } else {
-                setHoldStartTime(null);
-            }
-            
-            // Immediate audio playback with strict rate limiting
-            if (audioBase64 && audioBase64.length > 0 && should_speak && !isAudioPlaying) {
-                const currentTime = Date.now();
-                const audioHash = audioBase64.substring(0, 50); // Use first 50 chars as hash
-                
-                // Rate limit: minimum 2 seconds between audio, and must be different content
-                if (audioHash !== lastAudioMessage && (currentTime - lastAudioTime) > 2000) {
-                    playAudio(audioBase64);
-                    setLastAudioMessage(audioHash);
-                    setLastAudioTime(currentTime);
-                }
-            }
-        })
+        .then(data => data && handleFrameResult(data))
         .catch(error => {
             console.error("Error sending frame to server:", error);
             setFeedback(`Error: ${error.message}`);
@@ -218,8 +254,25 @@ const Dance = () => {
         setIsCompleted(false);
         setFeedback("Hold the pose for 10 seconds!");
         
-        const interval = setInterval(sendFrameToServer, 1500); // 1.5 seconds
-        return () => clearInterval(interval);
+        const token = getAuthToken();
+        if (token) {
+            frameStream.current = openFrameStream({
+                exercise: selectedExercise,
+                sessionId: sessionId.current,
+                token,
+                onFeedback: handleFrameResult,
+                onAudio: clip => speakClip(clip.audio, clip.audio_mime),
+            });
+        }
+
+        const interval = setInterval(sendFrameToServer, STREAM_INTERVAL_MS);
+        return () => {
+            clearInterval(interval);
+            if (frameStream.current) {
+                frameStream.current.close();
+                frameStream.current = null;
+            }
+        };
     }, [selectedExercise]);
 
     // Cleanup audio on unmount
@@ -0,0 +1,142 @@
+export const API_BASE = 'http://127.0.0.1:5000';
+
+// Encode the current canvas contents as a JPEG Blob (raw bytes, no base64).
+export const captureFrameBlob = (canvas, quality = 0.8) =>
+    new Promise((resolve) => canvas.toBlob(resolve, 'image/jpeg', quality));
+
+// Stamp a frame when it is captured: a page-wide increasing sequence number and
+// the capture time in milliseconds. The server uses them to drop frames that
+// were overtaken in flight and to time holds by capture rather than arrival.
+let lastFrameSeq = 0;
+export const stampFrame = () => ({
+    seq: ++lastFrameSeq,
+    captureTs: Math.round(performance.timeOrigin + performance.now()),
+});
+
+// The server answers 409 for a frame that arrived after a newer one; callers skip it.
+export const STALE_FRAME_STATUS = 409;
+
+// POST a raw JPEG frame to the binary frame endpoint; metadata goes in the query string.
+export const uploadFrame = (blob, { exercise, sessionId, isChallenge = false, token, stamp }) => {
+    const params = new URLSearchParams({ exercise, session_id: sessionId });
+    if (isChallenge) params.set('is_challenge', '1');
+    if (stamp) {
+        params.set('seq', stamp.seq);
+        params.set('capture_ts', stamp.captureTs);
+    }
+
+    return fetch(`${API_BASE}/process_frame?${params}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'image/jpeg',
+            'Authorization': `Bearer ${token}`,
+        },
+        body: blob,
+    });
+};
+
+// Clients that run pose estimation on-device can send landmarks instead of JPEGs.
+// Each frame is 33 landmarks of x, y, z, visibility packed as little-endian int16
+// scaled by 10000 (the format in backend-fitness/pose_engine.py); a frame with no
+// body (null) is sent as zeros.
+const LANDMARK_COUNT = 33;
+const LANDMARK_SCALE = 10000;
+
+export const packLandmarks = (frames) => {
+    const data = new DataView(new ArrayBuffer(frames.length * LANDMARK_COUNT * 4 * 2));
+    let offset = 0;
+    for (const landmarks of frames) {
+        for (let i = 0; i < LANDMARK_COUNT; i++) {
+            const point = landmarks ? landmarks[i] : null;
+            const values = point ? [point.x, point.y, point.z, point.visibility ?? 0] : [0, 0, 0, 0];
+            for (const value of values) {
+                const quantized = Math.round(value * LANDMARK_SCALE);
+                data.setInt16(offset, Math.max(-32768, Math.min(32767, quantized)), true);
+                offset += 2;
+            }
+        }
+    }
+    return data.buffer;
+};
+
+// POST one or more frames of landmarks; `stamps` holds each frame's stampFrame() result.
+export const uploadLandmarks = (frames, { exercise, sessionId, isChallenge = false, token, stamps = [] }) => {
+    const params = new URLSearchParams({ exercise, session_id: sessionId });
+    if (isChallenge) params.set('is_challenge', '1');
+    if (stamps.length === frames.length && stamps.length > 0) {
+        params.set('seq', stamps[0].seq);
+        params.set('capture_ts', stamps.map(stamp => stamp.captureTs).join(','));
+    }
+
+    return fetch(`${API_BASE}/process_landmarks?${params}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/octet-stream',
+            'Authorization': `Bearer ${token}`,
+        },
+        body: packLandmarks(frames),
+    });
+};
+
+// Collect a clip promised by a frame response's audio_ticket. The server holds
+// the request until synthesis finishes, so one fetch is normally enough.
+export const fetchAudio = (ticket) =>
+    fetch(`${API_BASE}/audio/${ticket}`).then(response => {
+        if (response.status !== 200) throw new Error(`Audio not available (status ${response.status})`);
+        return response.json();
+    });
+
+// Frame pacing: the WebSocket stream runs at ~10 fps, the HTTP fallback at the old 1.5 s.
+export const STREAM_INTERVAL_MS = 100;
+export const HTTP_INTERVAL_MS = 1500;
+
+// Open the persistent /ws/frames channel. The token is sent once, then every
+// binary message is a JPEG frame and every 'feedback' message is the result.
+// Clips that were not cached arrive later as separate 'audio' messages.
+export const openFrameStream = ({ exercise, sessionId, isChallenge = false, token, onFeedback, onAudio }) => {
+    const socket = new WebSocket(`${API_BASE.replace(/^http/, 'ws')}/ws/frames`);
+    const stream = { ready: false, inFlight: false };
+
+    socket.onopen = () => socket.send(JSON.stringify({ type: 'auth', token }));
+
+    socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'auth_ok') {
+            socket.send(JSON.stringify({
+                type: 'start',
+                exercise,
+                session_id: sessionId,
+                is_challenge: isChallenge,
+            }));
+        } else if (message.type === 'started') {
+            stream.ready = true;
+        } else if (message.type === 'feedback') {
+            stream.inFlight = false;
+            onFeedback({ ...message, audio_pushed: true });
+        } else if (message.type === 'audio') {
+            if (onAudio) onAudio(message);
+        } else {
+            // 'busy' and 'stale' mean the server dropped the frame; 'error' is logged and we move on
+            stream.inFlight = false;
+            if (message.type === 'error') console.error('Frame stream error:', message.error);
+        }
+    };
+
+    socket.onclose = () => {
+        stream.ready = false;
+        stream.inFlight = false;
+    };
+
+    stream.sendFrame = (blob, stamp) => {
+        stream.inFlight = true;
+        if (stamp) socket.send(JSON.stringify({ type: 'frame', seq: stamp.seq, capture_ts: stamp.captureTs }));
+        socket.send(blob);
+    };
+
+    stream.close = () => {
+        if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify({ type: 'stop' }));
+        socket.close();
+    };
+
+    return stream;
+};
@@ -1,5 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { getAuthToken } from './authUtils';
+import { captureFrameBlob, stampFrame, STALE_FRAME_STATUS, uploadFrame, fetchAudio, openFrameStream, STREAM_INTERVAL_MS, HTTP_INTERVAL_MS } from './frameUtils';
 
 const WORKOUT_OPTIONS = [
     { label: "Squats", value: "squats" },
@@ -54,6 +55,13 @@ const Work = () => {
     const [lastAudioTime, setLastAudioTime] = useState(0);
     const currentAudio = useRef(null);
 
+    // Identifies this page visit so the server keeps separate counters per session
+    const sessionId = useRef(crypto.randomUUID());
+
+    // WebSocket frame stream (falls back to HTTP uploads while it is not connected)
+    const frameStream = useRef(null);
+    const lastHttpFrameTime = useRef(0);
+
     const startCamera = async () => {
         if (navigator.mediaDevices && navigator.mediaDevices.getUserMedia) {
             try {
@@ -71,7 +79,7 @@ const Work = () => {
     }, []);
 
     // Function to play audio immediately
-    const playAudio = (audioBase64) => {
+    const playAudio = (audioBase64, audioMime = 'audio/mp3') => {
         // Stop any currently playing audio
         if (currentAudio.current) {
             currentAudio.current.pause();
@@ -80,7 +88,7 @@ const Work = () => {
         
         setIsAudioPlaying(true);
         
-        const audioSrc = `data:audio/mp3;base64,${audioBase64}`;
+        const audioSrc = `data:${audioMime};base64,${audioBase64}`;
         const audio = new Audio(audioSrc);
         currentAudio.current = audio;
         
@@ -108,9 +116,55 @@ const Work = () => {
         });
     };
 
+    // Play a clip with strict rate limiting
+    const speakClip = (audioBase64, audioMime) => {
+        if (audioBase64 && audioBase64.length > 0 && !isAudioPlaying) {
+            const currentTime = Date.now();
+            const audioHash = audioBase64.substring(0, 50); // Use first 50 chars as hash
+            
+            // Rate limit: minimum 2 seconds between audio, and must be different content
+            if (audioHash !== lastAudioMessage && (currentTime - lastAudioTime) > 2000) {
+                console.log('Playing immediate audio, length:', audioBase64.length);
+                playAudio(audioBase64, audioMime);
+                setLastAudioMessage(audioHash);
+                setLastAudioTime(currentTime);
+            } else {
+                console.log('Skipping audio - rate limited or duplicate');
+            }
+        } else {
+            console.log('No audio or already playing');
+        }
+    };
+
+    const handleFrameResult = (data) => {
+        console.log('Server response:', data);
+        
+        const { feedback: feedbackText, audio: audioBase64, audio_mime: audioMime, audio_ticket, should_speak } = data;
+        setFeedback(feedbackText);
+        
+        // Cached clips arrive inline; others are collected by ticket (the stream pushes them itself)
+        if (audioBase64 && audioBase64.length > 0 && should_speak) {
+            speakClip(audioBase64, audioMime);
+        } else if (audio_ticket && should_speak && !data.audio_pushed) {
+            fetchAudio(audio_ticket)
+            .then(clip => speakClip(clip.audio, clip.audio_mime))
+            .catch(error => console.error('Error fetching audio:', error));
+        }
+    };
+
     const sendFrameToServer = () => {
         if (!videoRef.current || !canvasRef.current || !selectedExercise) return;
 
+        // On the stream, wait for the previous frame's feedback before sending the next;
+        // without it, fall back to HTTP uploads at the old pace
+        const stream = frameStream.current;
+        const useStream = stream && stream.ready;
+        if (useStream && stream.inFlight) return;
+        if (!useStream) {
+            if (Date.now() - lastHttpFrameTime.current < HTTP_INTERVAL_MS) return;
+            lastHttpFrameTime.current = Date.now();
+        }
+
         const video = videoRef.current;
         const canvas = canvasRef.current;
         const context = canvas.getContext('2d');
@@ -118,7 +172,13 @@ const Work = () => {
         canvas.width = video.videoWidth;
         canvas.height = video.videoHeight;
         context.drawImage(video, 0, 0, canvas.width, canvas.height);
-        const imageData = canvas.toDataURL('image/jpeg');
+        const stamp = stampFrame();
+
+        if (useStream) {
+            stream.inFlight = true;
+            captureFrameBlob(canvas).then(blob => stream.sendFrame(blob, stamp));
+            return;
+        }
 
         console.log(`Sending ${selectedExercise} frame to server...`);
 
@@ -130,48 +190,23 @@ const Work = () => {
             return;
         }
 
-        // Using fetch for better error handling, connecting to the NEW workout endpoint
-        fetch('http://127.0.0.1:5000/process_workout_frame', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${authToken}` // ADDED: Authorization header
-            },
-            body: JSON.stringify({
-                exercise: selectedExercise,
-                image: imageData,
-            })
-        })
+        // Send the JPEG bytes directly; the server decodes them without base64/JSON
+        captureFrameBlob(canvas)
+        .then(blob => uploadFrame(blob, {
+            exercise: selectedExercise,
+            sessionId: sessionId.current,
+            token: authToken,
+            stamp,
+        }))
         .then(response => {
+            // A newer frame already updated the feedback; skip this one
+            if (response.status === STALE_FRAME_STATUS) return null;
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             return response.json();
         })
-        .then(data => {
-            console.log('Server response:', data);
-            
-            const { feedback: feedbackText, audio: audioBase64, should_speak } = data;
-            setFeedback(feedbackText);
-            
-            // Immediate audio playback with strict rate limiting
-            if (audioBase64 && audioBase64.length > 0 && should_speak && !isAudioPlaying) {
-                const currentTime = Date.now();
-                const audioHash = audioBase64.substring(0, 50); // Use first 50 chars as hash
-                
-                // Rate limit: minimum 2 seconds between audio, and must be different content
-                if (audioHash !== lastAudioMessage && (currentTime - lastAudioTime) > 2000) {
-                    console.log('Playing immediate audio, length:', audioBase64.length);
-                    playAudio(audioBase64);
-                    setLastAudioMessage(audioHash);
-                    setLastAudioTime(currentTime);
-                } else {
-                    console.log('Skipping audio - rate limited or duplicate');
-                }
-            } else {
-                console.log('No audio or already playing');
-            }
-        })
+        .then(data => data && handleFrameResult(data))
         .catch(error => {
             console.error("Error sending frame to server:", error);
             setFeedback(`Error: ${error.message}`);
@@ -192,8 +227,25 @@ const Work = () => {
             currentAudio.current = null;
         }
         
-        const interval = setInterval(sendFrameToServer, 1500); // 1.5 seconds
-        return () => clearInterval(interval);
+        const token = getAuthToken();
+        if (token) {
+            frameStream.current = openFrameStream({
+                exercise: selectedExercise,
+                sessionId: sessionId.current,
+                token,
+                onFeedback: handleFrameResult,
+                onAudio: clip => speakClip(clip.audio, clip.audio_mime),
+            });
+        }
+
+        const interval = setInterval(sendFrameToServer, STREAM_INTERVAL_MS);
+        return () => {
+            clearInterval(interval);
+            if (frameStream.current) {
+                frameStream.current.close();
+                frameStream.current = null;
+            }
+        };
     }, [selectedExercise]);
 
     // Cleanup audio on unmount